@@ -15,78 +15,72 @@ import sys
 import re
 import string
 import math
+import shutil
+import tempfile
 import numpy
-import pyfits
 import unittest
 #
-#--- from ska
+#--- the directory list is read and the mta modules are imported when they are first used,
+#--- so that the data functions can be imported without the directory list or matplotlib
 #
-from Ska.Shell import getenv, bash
-
-ascdsenv = getenv('source /home/ascds/.ascrc -r release', shell='tcsh')
-
-
-import matplotlib as mpl
-
-if __name__ == '__main__':
-
-    mpl.use('Agg')
-
-from pylab import *
-import matplotlib.pyplot       as plt
-import matplotlib.font_manager as font_manager
-import matplotlib.lines        as lines
+import sim_config
+tcnv = sim_config.lazy_import('convertTimeFormat')     #--- MTA time conversion routines
+import product_cache        as pcache
+import sim_render           as srender
+import month_store          as mstore
+import stage_monitor        as smon
 #
-#--- reading directory list
+#--- the telemetry is read from dataseeker or a local archive; see telemetry_source
 #
-path = '/data/mta/Script/Month/SIM/house_keeping/dir_list_py'
-
-f    = open(path, 'r')
-data = [line.strip() for line in f.readlines()]
-f.close()
-
-for ent in data:
-    atemp = re.split(':', ent)
-    var  = atemp[1].strip()
-    line = atemp[0].strip()
-    exec "%s = %s" %(var, line)
+import telemetry_source     as tsrc
 
 #
-#--- append a path to a private folder to python directory
+#--- monthly values are kept in a sqlite table keyed by year and month (see month_store);
+#--- datafile is its text copy
 #
-sys.path.append(bin_dir)
-sys.path.append(mta_dir)
+dbfile    = '/data/mta/Script/Month/SIM/house_keeping/monthly_avg.db'
+datafile  = '/data/mta/Script/Month/SIM/house_keeping/monthly_avg'
 #
-#--- converTimeFormat contains MTA time conversion routines
+#--- schema version and columns of the saved monthly data; see product_cache
 #
-import convertTimeFormat    as tcnv
-import mta_common_functions as mcf
+product_schema = 1
+product_cols   = ['time', 'aw1', 'aw2', 'aw3', 'aw4', 'aw5', 'aw6']
 #
-#--- temp writing file name
+#--- telemetry values this large (or nan) are fill values and not counted
 #
-import random
-rtail  = int(10000 * random.random())   
-zspace = '/tmp/zspace' + str(rtail)
-
-loginfile = '/data/mta/Script/Month/SIM/house_keeping/loginfile'
-datafile  = '/data/mta/Script/Month/SIM/house_keeping/monthly_avg'
+fill_limit     = 1.0e20
 
 
 #-----------------------------------------------------------------------------------------
-#-- plot_sim_movement: read tsc and fa data and plot their cummulatinve movement        --
+#-- plot_aorwspd: read aorwspd data and plot their monthly values                      ---
 #-----------------------------------------------------------------------------------------
 
-def plot_aorwspd(year, month):
+def plot_aorwspd(year, month, replot=0):
 
     """
     read tsc and fa data and plot their cummulatinve movement
-    input: none
-    output: monthly_sim.png
+    input:  year/month  --- the month to be added to the database
+            replot      --- if 1, plot the data saved by the last run, if there is
+    output: rotation.png
+            the computed data are saved in the product file (see product_cache)
     """
 #
+#--- read the saved data
+#
+    data = None
+    if replot == 1:
+        data = pcache.read_product('aorwspd', product_schema)
+
+    if data is not None:
+        [time, aw1, aw2, aw3, aw4, aw5, aw6] = [data[x] for x in product_cols]
+    else:
+#
 #--- read data and add to the database
 #
-    [time, aw1, aw2, aw3, aw4, aw5, aw6] = read_data(year, month)
+        [time, aw1, aw2, aw3, aw4, aw5, aw6] = read_data(year, month)
+
+        out = [time, aw1, aw2, aw3, aw4, aw5, aw6]
+        pcache.write_product('aorwspd', product_schema, dict(zip(product_cols, out)))
 #
 #--- plot data
 #
@@ -105,21 +99,25 @@ def read_data(year, month):
     output: [time, aw1, aw2, aw3, aw4, aw5, aw6]
     """
 #
-#--- change data format
+#--- if the month is not in the database yet, extract data and add. a month which could
+#--- not be read is left for the next run
 #
-    lyear = str(year)
-    lmon  = str(month)
-    if month < 10:
-        lmon = '0' + lmon
-    ltime = lyear + '.' + lmon
-    ctime = float(year) + float(month) / 12
-
+    store = get_store()
+    try:
+        if not store.has(year, month):
+            vals = get_new_value(year, month)
+            if vals is not None:
+                store.upsert([[year, month, vals]])
+            else:
+                print('aorwspd data of ' + str(year) + '/' + str(month) + ' could not be read')
 #
 #--- get data
 #
-    f    = open(datafile, 'r')
-    data = [line.strip() for line in f.readlines()]
-    f.close()
+        token  = smon.start('read')
+        months = store.months()
+        smon.stop(token, len(months))
+    finally:
+        store.close()
 
     time = []
     aw1  = []
@@ -128,77 +126,163 @@ def read_data(year, month):
     aw4  = []
     aw5  = []
     aw6  = []
-    for ent in data:
-        atemp = re.split('\s+', ent)
-        try:
-            btemp = re.split('\.', atemp[0])
-            val   = float(btemp[0]) + float(btemp[1]) / 12.0
-            time.append(val)
+    alist = [aw1, aw2, aw3, aw4, aw5, aw6]
+    for [lyear, lmon, vals] in months:
+        time.append(float(lyear) + float(lmon) / 12.0)
 
-            for i in range(1, 7):
-                val = 1.375056e-3 * float(atemp[i])     #---- 1.375066e-3 = 1440 * 9.549 /1e7
-                if val > 12:
-                    val = 12
-
-                exec "aw%s.append(float(%s))" % (i, val)
-        except:
-            pass
+        for i in range(0, 6):
+            val = 1.375056e-3 * vals[i]         #---- 1.375066e-3 = 1440 * 9.549 /1e7
+            if val > 12:
+                val = 12
 #
-#--- check whether this time period is already extracted or not
+#--- the values are kept to 12 digits as before
 #
-    chk = 0
-    for ent in time:
-        if ctime == ent:
-            chk = 1
-            break
-#
-#--- if it is not extract data and append
-#
-    if chk == 0:
-        [av1, av2, av3, av4, av5, av6] = get_new_value(year, month)
-        time.append(ctime)
-        aw1.append(av1 *  1.375056e-3)
-        aw2.append(av2 *  1.375056e-3)
-        aw3.append(av3 *  1.375056e-3)
-        aw4.append(av4 *  1.375056e-3)
-        aw5.append(av5 *  1.375056e-3)
-        aw6.append(av6 *  1.375056e-3)
-#
-#--- add the new data into the database
-#
-        file = '/data/mta/Script/Month/SIM/house_keeping/monthly_avg'
-        fo = open(file, 'a')
-        line = ltime + '\t' 
-        line = line  + str(av1) + '\t' 
-        line = line  + str(av2) + '\t'
-        line = line  + str(av3) + '\t'
-        line = line  + str(av4) + '\t'
-        line = line  + str(av5) + '\t'
-        line = line  + str(av6) + '\n'
-        fo.write(line)
-        fo.close()
+            alist[i].append(float(str(val)))
 
     return [time, aw1, aw2, aw3, aw4, aw5, aw6]
 
+#-----------------------------------------------------------------------------------------
+#-- backfill: extract and add all missing months between start and stop               ---
+#-----------------------------------------------------------------------------------------
+
+def backfill(start, stop):
+
+    """
+    extract and add all missing months between start and stop to the database. their
+    data are fetched together (see telemetry_source), and the database is updated at once
+    input:  start   --- [year, month] of the first month
+            stop    --- [year, month] of the last month
+    output: updated database
+            added   --- a list of [year, month] added
+    """
+
+    store = get_store()
+    try:
+#
+#--- find the months not in the database
+#
+        missing = []
+        [year, month] = start
+        while [year, month] <= list(stop):
+            if not store.has(year, month):
+                missing.append([year, month])
+            month += 1
+            if month > 12:
+                month = 1
+                year += 1
+
+        if len(missing) == 0:
+            return missing
+#
+#--- fetch the data of all missing months
+#
+        intervals = [month_interval(year, month) for [year, month] in missing]
+
+        token = smon.start('fetch')
+        dlist = tsrc.get_source().fetch_many(intervals)
+        smon.stop(token, sum([len(x) for x in dlist if x is not None]))
+
+        rows  = []
+        added = []
+        for k in range(0, len(missing)):
+#
+#--- a month which could not be read is left for the next run
+#
+            if dlist[k] is None:
+                continue
+
+            [year, month]   = missing[k]
+            [tstart, tstop] = intervals[k]
+            token = smon.start('bin')
+            [vals, counts]  = monthly_sums(dlist[k], expected_samples(tstart, tstop))
+            smon.stop(token, len(dlist[k]))
+
+            rows.append([year, month, vals])
+            added.append([year, month])
+#
+#--- update the database
+#
+        store.upsert(rows)
+    finally:
+        store.close()
+
+    return added
 
 #-----------------------------------------------------------------------------------------
-#-- get_new_value: extract aorwspd values from dataseeker                              ---
+#-- get_store: give the monthly database                                               ---
+#-----------------------------------------------------------------------------------------
+
+def get_store():
+
+    """
+    give the monthly database
+    input:  none
+    output: MonthStore object of dbfile; datafile is kept as its text copy. the caller
+            closes it
+    """
+
+    return mstore.MonthStore(dbfile, datafile)
+
+#-----------------------------------------------------------------------------------------
+#-- get_new_value: extract aorwspd values of the month                                 ---
 #-----------------------------------------------------------------------------------------
 
 def get_new_value(year, month):
 
     """
-    extract aorwspd values from dataseeker
+    extract aorwspd values of the month from the telemetry source (see telemetry_source)
     input: year/month
-    output: [av1, av2, av3, av4, av5, av6] --- six values of aorwspd(1-6)
+    output: [av1, av2, av3, av4, av5, av6] --- six values of aorwspd(1-6); None if the
+            data could not be read
     """
-#
-#--- set month long time interval in sec from 1998.1.1
-#
+
+    [tstart, tstop] = month_interval(year, month)
+
+    token = smon.start('fetch')
+    data  = tsrc.get_source().fetch(tstart, tstop)
+    if data is None:
+        smon.stop(token)
+        return None
+    smon.stop(token, len(data))
+
+    token = smon.start('bin')
+    [vals, counts] = monthly_sums(data, expected_samples(tstart, tstop))
+    smon.stop(token, len(data))
+
+    return vals
+
+#-----------------------------------------------------------------------------------------
+#-- expected_samples: give the number of 5 min samples in a time interval              ---
+#-----------------------------------------------------------------------------------------
+
+def expected_samples(tstart, tstop):
+
+    """
+    give the number of 5 min samples in a time interval
+    input:  tstart  --- start time in seconds from 1998.1.1
+            tstop   --- stop time in seconds from 1998.1.1
+    output: the number of 5 min samples
+    """
+
+    return int((tstop - tstart) / 300.0)
+
+#-----------------------------------------------------------------------------------------
+#-- month_interval: give the time interval of the month                                ---
+#-----------------------------------------------------------------------------------------
+
+def month_interval(year, month):
+
+    """
+    give the time interval of the month: from the 15th of the previous month to
+    the 15th of the month
+    input:  year/month
+    output: [tstart, tstop] --- time in seconds from 1998.1.1
+    """
+
     year2 = year
     month2 = month -1
     if month2 < 1:
-        mont2  = 12
+        month2 = 12
         year2 -= 1
 
     ydate = tcnv.findYearDate(year,  month,  15)
@@ -207,70 +291,41 @@ def get_new_value(year, month):
     ydate = tcnv.findYearDate(year2, month2, 15)
     t_in  = str(year2) + ':' + str(ydate) + ':00:00:00'
     time2 = tcnv.axTimeMTA(t_in)
-#
-#--- set command to call dataseeker
-#
-    f    = open('./test', 'w')      #-- we need an empty "test" file to run dataseeker
-    f.close()
-    mcf.mk_empty_dir('param')       #-- make empty param directory
 
-    line = 'columns=_aorwspd1_avg,'
-    line = line + '_aorwspd2_avg,'
-    line = line + '_aorwspd3_avg,'
-    line = line + '_aorwspd4_avg,'
-    line = line + '_aorwspd5_avg,'
-    line = line + '_aorwspd6_avg'
-    line = line + ' timestart=' + str(time2)
-    line = line + ' timestop='  + str(time1)
+    return [time2, time1]
+
+#-----------------------------------------------------------------------------------------
+#-- monthly_sums: create monthly "sum" of the reaction wheel rotations                 ---
+#-----------------------------------------------------------------------------------------
 
-    cmd = 'punlearn dataseeker;  dataseeker.pl infile=test outfile=ztemp.fits search_crit=\''
-    cmd = 'dataseeker.pl infile=test outfile=ztemp.fits search_crit="'
-    cmd = cmd + line + '"  loginFile="' + loginfile + '"'
+def monthly_sums(data, nexpect=0):
+
+    """
+    create monthly "sum" of the reaction wheel rotations
+    input:  data    --- numpy array of (N, 6) of 5 min averages of aorwspd1-6
+            nexpect --- the number of 5 min samples expected in the month. if a wheel
+                        has fewer valid samples, its sum is scaled up to nexpect
+                        samples; 0 for no correction
+    output: [av1, av2, av3, av4, av5, av6] --- six values of aorwspd(1-6)
+            counts  --- the number of valid samples of each wheel
+    """
 
+    vals  = numpy.asarray(data, dtype=numpy.float64).reshape(-1, 6)
 #
-#--- run dataseeker
+#--- nan and fill values are not counted
 #
-    bash("/usr/bin/env PERL5LIB='' " + cmd, env=ascdsenv)
-
-    mcf.rm_file(zspace)
-    mcf.rm_file('./test')
-    os.system('rm -rf ./param')
+    good  = numpy.isfinite(vals) & (numpy.abs(vals) < fill_limit)
+    asum  = numpy.where(good, numpy.abs(vals), 0.0).sum(axis=0)
+    count = good.sum(axis=0)
 #
-#--- read fits file
+#--- the data are 5 min avg of the value; one day is 24 hr x 60 min / 5min =  288.
+#--- for a wheel with data gaps, the mean of the valid samples is used for the gaps
 #
-    try:
-        dout = pyfits.getdata('./ztemp.fits')
-        aw1  = dout.field('AORWSPD1_AVG')
-        aw2  = dout.field('AORWSPD2_AVG')
-        aw3  = dout.field('AORWSPD3_AVG')
-        aw4  = dout.field('AORWSPD4_AVG')
-        aw5  = dout.field('AORWSPD5_AVG')
-        aw6  = dout.field('AORWSPD6_AVG')
-    except:
-        aw1 = aw2 = aw3 = aw4 = aw5 = aw6 = []
-
-    mcf.rm_file("./ztemp.fits")
-#
-#--- create monthly "sum" of the reaction wheel rotations
-#--- dataseeker gives 5 min avg of the value; one day is 24 hr x 60 min / 5min =  288.
-#
-    sum1 = sum2 = sum3 = sum4 = sum5 = sum6 = 0.0
-    for i in range(0, len(aw1)):
-        sum1 += abs(aw1[i])
-        sum2 += abs(aw2[i])
-        sum3 += abs(aw3[i])
-        sum4 += abs(aw4[i])
-        sum5 += abs(aw5[i])
-        sum6 += abs(aw6[i])
-
-    av1 = sum1 / 288
-    av2 = sum2 / 288
-    av3 = sum3 / 288
-    av4 = sum4 / 288
-    av5 = sum5 / 288
-    av6 = sum6 / 288
-
-    return [av1, av2, av3, av4, av5, av6]
+    out   = asum / 288
+    short = (count > 0) & (count < nexpect)
+    out[short] = asum[short] / count[short] * nexpect / 288
+
+    return [out.tolist(), count.tolist()]
 
 #-----------------------------------------------------------------------------------------
 #-- plot_data: create six aw value history plots                                       ---
@@ -306,89 +361,24 @@ def plot_data(time, aw1, aw2, aw3, aw4, aw5, aw6):
     color  = 'red'
     marker = 'o'
     msize  = 3
-    plt.close("all")
-    mpl.rcParams['font.size'] = fsize
-    props = font_manager.FontProperties(size=fsize)
-    plt.subplots_adjust(hspace=0.06, wspace=0.06)
 #
-    a1 = plt.subplot(321)
-    plot_sub(a1, time, aw1, xmin, xmax, ymin, ymax, color, lsize, marker, msize, tline='AORWDAY1')
-
-    a2 = plt.subplot(323)
-    plot_sub(a2, time, aw3, xmin, xmax, ymin, ymax, color, lsize, marker, msize, tline='AORWDAY3')
-    a2.set_ylabel('Counts (x10**7)', size=fsize)
-
-    a3 = plt.subplot(325)
-    plot_sub(a3, time, aw5, xmin, xmax, ymin, ymax, color, lsize, marker, msize, tline='AORWDAY5')
-    a3.set_xlabel('Time (year)', size=fsize)
+#--- six panels; x ticks label only on the bottom panels, y ticks label only on the left panels
 #
-    a4 = plt.subplot(322)
-    plot_sub(a4, time, aw1, xmin, xmax, ymin, ymax, color, lsize, marker, msize, tline='AORWDAY2')
-
-    a5 = plt.subplot(324)
-    plot_sub(a5, time, aw3, xmin, xmax, ymin, ymax, color, lsize, marker, msize, tline='AORWDAY4')
-
-    a6 = plt.subplot(326)
-    plot_sub(a6, time, aw5, xmin, xmax, ymin, ymax, color, lsize, marker, msize, tline='AORWDAY6')
-    a6.set_xlabel('Time (year)', size=fsize)
+    spec = {'x': time, 'xrange': [xmin, xmax], 'yrange': [ymin, ymax], 'hspace': 0.06,  \
+            'wspace': 0.06, 'fsize': fsize, 'lsize': lsize, 'color': color, 'marker': marker,\
+            'msize': msize, 'label_pos': 'bottom',                                      \
+            'panels': [
+            {'pos': 321, 'y': aw1, 'label': 'AORWDAY1', 'xticks': 0},
+            {'pos': 323, 'y': aw3, 'label': 'AORWDAY3', 'xticks': 0, 'ylabel': 'Counts (x10**7)'},
+            {'pos': 325, 'y': aw5, 'label': 'AORWDAY5', 'xlabel': 'Time (year)'},
+            {'pos': 322, 'y': aw2, 'label': 'AORWDAY2', 'xticks': 0, 'yticks': 0},
+            {'pos': 324, 'y': aw4, 'label': 'AORWDAY4', 'xticks': 0, 'yticks': 0},
+            {'pos': 326, 'y': aw6, 'label': 'AORWDAY6', 'yticks': 0, 'xlabel': 'Time (year)'}]}
 #
-#--- x ticks label only on the bottom panels
-#--- y ticks label only on the left panels
+#--- create the plot
 #
-    for i in range(0, 6):
-        ax = 'a' + str(i+1)
-        if i != 2 and i != 5:
-            exec "line = %s.get_xticklabels()" % (ax)
-            for label in  line:
-                label.set_visible(False)
-        if i != 0 and i != 1 and i != 2:
-            exec "line = %s.get_yticklabels()" % (ax)
-            for label in  line:
-                label.set_visible(False)
-        else:
-            pass
-#
-#--- save the plot
-#
-    fig = matplotlib.pyplot.gcf()
-    fig.set_size_inches(10.0, 5.0)
-
     outname = 'rotation.png'
-    plt.savefig(outname, format='png', dpi=100)
-
-#-----------------------------------------------------------------------------------------
-#-- plot_sub: plotting each panel                                                       --
-#-----------------------------------------------------------------------------------------
-
-def plot_sub(ap, x, y, xmin, xmax, ymin, ymax, color, lsize, marker, msize, tline=''):
-    """
-    plotting each panel
-    input   ap      --- panel name
-            x       --- x data list
-            y       --- y data list
-            xmin    --- xmin
-            xmax    --- xmax
-            ymin    --- ymin
-            ymax    --- ymax
-            color   --- color of data point
-            lsize   --- line size
-            marker  --- marker shape
-            msize   --- size of the marker
-            tlime   --- extra text line
-    """
-
-    ap.set_autoscale_on(False)
-    ap.set_xbound(xmin,xmax)
-    ap.set_xlim(xmin=xmin, xmax=xmax, auto=False)
-    ap.set_ylim(ymin=ymin, ymax=ymax, auto=False)
-
-    plt.plot(x, y , color=color, lw=lsize, marker=marker, markersize=msize)
-
-    if tline != '':
-        xpos = 0.05 * (xmax - xmin) + xmin
-        ypos = ymin +0.15 * (ymax - ymin)
-        text(xpos, ypos, tline, fontsize=11,style='italic', weight='bold')
-
+    srender.render_panels(spec, outname)
 
 #-----------------------------------------------------------------------------------------
 #-- TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST    ---
@@ -427,34 +417,131 @@ class TestFunctions(unittest.TestCase):
         tlist = [5146.0085192338256, 6649.7235161736608, 5646.532719382395, 5662.6181798718044, 6145.2843457273102, 6131.2501007893843]
 
         self.assertEquals(get_new_value(2014, 3), tlist)
-        
+
 #------------------------------------------------------------
 
+    def test_monthly_sums(self):
 
-#-----------------------------------------------------------------------------------------
+        data = numpy.array([[288.0, -288.0, 0.0, 1.0, 2.0, 3.0],\
+                            [288.0,  288.0, 0.0, 1.0, 2.0, 3.0]])
+
+        [vals, counts] = monthly_sums(data)
+        self.assertEquals(vals, [2.0, 2.0, 0.0, 2.0/288, 4.0/288, 6.0/288])
+        self.assertEquals(counts, [2, 2, 2, 2, 2, 2])
 #
-#--- pylab plotting routine related modules
+#--- nan and fill values are masked; the sums of the wheels with gaps are scaled
 #
+        data[0, 0] = numpy.nan
+        data[1, 1] = 1.0e30
+        [vals, counts] = monthly_sums(data, nexpect=2)
+        self.assertEquals(vals, [2.0, 2.0, 0.0, 2.0/288, 4.0/288, 6.0/288])
+        self.assertEquals(counts, [1, 1, 2, 2, 2, 2])
 
-from pylab import *
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as font_manager
-import matplotlib.lines as lines
+#------------------------------------------------------------
 
-chk = 0
-if len(sys.argv) == 3:
-    year  = sys.argv[1]
-    month = sys.argv[2]
-    year  = int(float(year))
-    month = int(float(month))
-    chk = 1
+    def test_backfill(self):
+
+        class FixedSource(tsrc.TelemetrySource):
+            def fetch(self, tstart, tstop):
+                return numpy.zeros((2, 6)) + 288.0
+
+        global datafile, dbfile
+        save = [datafile, dbfile]
+        wdir = tempfile.mkdtemp()
+        try:
+            datafile = os.path.join(wdir, 'monthly_avg')
+            dbfile   = os.path.join(wdir, 'monthly_avg.db')
+            fo = open(datafile, 'w')
+            fo.write(mstore.format_line(2013, 12, [1, 1, 1, 1, 1, 1]))
+            fo.write(mstore.format_line(2014,  2, [1, 1, 1, 1, 1, 1]))
+            fo.close()
+
+            tsrc.set_source(FixedSource())
+            missing = backfill([2013, 11], [2014, 3])
+
+            self.assertEquals(missing, [[2013, 11], [2014, 1], [2014, 3]])
+
+            data = mstore.read_text(datafile)
+            self.assertEquals([x[:2] for x in data], [[2013, 11], [2013, 12], [2014, 1], [2014, 2], [2014, 3]])
+#
+#--- two samples of 288 are scaled to the full month
+#
+            val = float(expected_samples(*month_interval(2013, 11)))
+            self.assertEquals(data[0][2:], [val] * 6)
+        finally:
+            tsrc.set_source(None)
+            [datafile, dbfile] = save
+            shutil.rmtree(wdir)
+
+#------------------------------------------------------------
+
+    def test_read_data_unread(self):
+#
+#--- a month which the source could not read is not added to the database
+#
+        class EmptySource(tsrc.TelemetrySource):
+            def fetch(self, tstart, tstop):
+                return None
+
+        global datafile, dbfile
+        save = [datafile, dbfile]
+        wdir = tempfile.mkdtemp()
+        try:
+            datafile = os.path.join(wdir, 'monthly_avg')
+            dbfile   = os.path.join(wdir, 'monthly_avg.db')
+            fo = open(datafile, 'w')
+            fo.write(mstore.format_line(2014, 2, [1, 1, 1, 1, 1, 1]))
+            fo.close()
+
+            tsrc.set_source(EmptySource())
+            [time, aw1, aw2, aw3, aw4, aw5, aw6] = read_data(2014, 3)
+
+            store = get_store()
+            try:
+                self.assertEquals(len(time), 1)
+                self.assertEquals(store.has(2014, 3), False)
+            finally:
+                store.close()
+        finally:
+            tsrc.set_source(None)
+            [datafile, dbfile] = save
+            shutil.rmtree(wdir)
+
+#------------------------------------------------------------
+
+
+#-----------------------------------------------------------------------------------------
 
 if __name__ == '__main__':
 
+    chk = 0
+    if len(sys.argv) == 3:
+        year  = sys.argv[1]
+        month = sys.argv[2]
+        year  = int(float(year))
+        month = int(float(month))
+        chk = 1
+    elif len(sys.argv) == 4 and sys.argv[1] == 'backfill':
+        start = [int(x) for x in re.split('\.', sys.argv[2])]
+        stop  = [int(x) for x in re.split('\.', sys.argv[3])]
+        chk = 3
+    elif len(sys.argv) == 2 and sys.argv[1] == 'replot':
+#
+#--- if there is no saved data, the last month is used as in run_all_sim_script
+#
+        [year, month, day, hours, min, sec, weekday, yday, dst] = tcnv.currentTime()
+        month -= 1
+        if month < 1:
+            month = 12
+            year -= 1
+        chk = 2
+
     if chk == 1:
         plot_aorwspd(year, month)
+    elif chk == 2:
+        plot_aorwspd(year, month, replot=1)
+    elif chk == 3:
+        print(backfill(start, stop))
     else:
         unittest.main()
 
-
-
@@ -0,0 +1,396 @@
+#!/usr/bin/env /proj/sot/ska/bin/python
+
+#############################################################################################
+#                                                                                           #
+#       day_rollup.py:  per-day sums of tsc and fa movement kept in a sqlite table          #
+#                                                                                           #
+#           author: t. isobe (tisobe@cfa.harvard.edu)                                       #
+#                                                                                           #
+#           last update: Oct 18, 2026                                                       #
+#                                                                                           #
+#############################################################################################
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import numpy
+import unittest
+
+import frac_year            as fyr
+import time_bins            as tbin
+#
+#--- sqlite locks the database while a transaction is open; other runs wait this long (sec)
+#
+lock_wait = 600
+#
+#--- columns of the day table
+#
+day_cols  = ['day', 'tstart', 'tstop', 'tsc_sum', 'fa_sum', 'count', \
+             'tsc_first', 'fa_first', 'tsc_last', 'fa_last']
+
+#-----------------------------------------------------------------------------------------
+#-- DayRollup: per-day sums of tsc and fa movement                                      --
+#-----------------------------------------------------------------------------------------
+
+class DayRollup(object):
+    """
+    per-day sums of tsc and fa movement kept in a sqlite table keyed by day (<yyyy><ddd>).
+    each day has tstart/tstop (fractional year), tsc_sum/fa_sum (summed |delta| in mm of
+    the samples in the day, each measured from the sample before it), count (the number
+    of samples), and the first and last tsc and fa positions (mm) of the day. the number
+    of samples already added and the last sample are kept with it, so that only new
+    samples are added on each run. any bins made of whole days can be built from it;
+    see bin_days
+    """
+
+    def __init__(self, dbfile):
+
+        self.dbfile = dbfile
+        self.conn   = None
+
+#------------------------------------------------------------
+
+    def connect(self):
+        """
+        open the database; create the tables if they are new
+        input:  none
+        output: self.conn   --- sqlite3 connection
+        """
+
+        if self.conn is not None:
+            return self.conn
+
+        self.conn = sqlite3.connect(self.dbfile, timeout=lock_wait, isolation_level=None)
+        self.conn.execute('create table if not exists day_rollup (day integer primary key, '  \
+                        + 'tstart real, tstop real, tsc_sum real, fa_sum real, count integer, '\
+                        + 'tsc_first real, fa_first real, tsc_last real, fa_last real)')
+        self.conn.execute('create table if not exists rollup_state (id integer primary key, ' \
+                        + 'rows integer, time real, tsc real, fa real)')
+
+        return self.conn
+
+#------------------------------------------------------------
+
+    def state(self):
+        """
+        give the number of samples already added and the last of them
+        input:  none
+        output: [rows, last]
+                    rows    --- the number of samples added
+                    last    --- [time, tsc, fa] of the last sample; [] if none
+        """
+
+        out = self.connect().execute('select rows, time, tsc, fa from rollup_state where id = 0')\
+                            .fetchone()
+        if out is None:
+            return [0, []]
+
+        return [out[0], list(out[1:])]
+
+#------------------------------------------------------------
+
+    def add(self, time, tsc_mm, fa_mm, last, rows):
+        """
+        add samples which follow the last sample added
+        input:  time    --- numpy array of time in fractional year (sorted)
+                tsc_mm  --- numpy array of tsc position in mm
+                fa_mm   --- numpy array of fa position in mm
+                last    --- [time, tsc, fa] of the sample just before them; [] if none
+                rows    --- the number of samples added, including these
+        output: updated database
+        """
+
+        if len(time) == 0:
+            return
+
+        sums = day_sums(time, tsc_mm, fa_mm, last)
+
+        conn = self.connect()
+        conn.execute('begin immediate')
+        try:
+#
+#--- the first day may already have samples from the last run
+#
+            old = conn.execute('select * from day_rollup where day = ?', (int(sums['day'][0]),))\
+                      .fetchone()
+
+            out = [list(ent) for ent in zip(*[sums[x].tolist() for x in day_cols])]
+            if old is not None:
+                out[0] = merge_day(list(old), out[0])
+
+            conn.executemany('insert or replace into day_rollup values (?,?,?,?,?,?,?,?,?,?)', out)
+            conn.execute('insert or replace into rollup_state values (0, ?, ?, ?, ?)', \
+                         (rows, float(time[-1]), float(tsc_mm[-1]), float(fa_mm[-1])))
+            conn.execute('commit')
+        except:
+            conn.execute('rollback')
+            raise
+
+#------------------------------------------------------------
+
+    def days(self, tstart=None, tstop=None):
+        """
+        give the days in time order
+        input:  tstart  --- fractional year; only the days starting at or after it
+                tstop   --- fractional year; only the days starting before it
+        output: a dictionary of column name: numpy array; see day_cols
+        """
+
+        query = 'select * from day_rollup'
+        cond  = []
+        args  = []
+        if tstart is not None:
+            cond.append('tstart >= ?')
+            args.append(tstart)
+        if tstop is not None:
+            cond.append('tstart < ?')
+            args.append(tstop)
+        if len(cond) > 0:
+            query = query + ' where ' + ' and '.join(cond)
+
+        out = self.connect().execute(query + ' order by day', args).fetchall()
+        if len(out) == 0:
+            return dict([[x, numpy.zeros(0)] for x in day_cols])
+
+        cols = zip(*out)
+
+        return dict(zip(day_cols, [numpy.array(x) for x in cols]))
+
+#------------------------------------------------------------
+
+    def clear(self):
+        """
+        remove all days and the state, e.g. when the data are rewritten
+        input:  none
+        output: emptied database
+        """
+
+        conn = self.connect()
+        conn.execute('begin immediate')
+        conn.execute('delete from day_rollup')
+        conn.execute('delete from rollup_state')
+        conn.execute('commit')
+
+#------------------------------------------------------------
+
+    def close(self):
+
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+#-----------------------------------------------------------------------------------------
+#-- day_sums: sum the movement of the samples of each day                              ---
+#-----------------------------------------------------------------------------------------
+
+def day_sums(time, tsc_mm, fa_mm, last=[]):
+
+    """
+    sum the movement of the samples of each day
+    input:  time    --- numpy array of time in fractional year (sorted)
+            tsc_mm  --- numpy array of tsc position in mm
+            fa_mm   --- numpy array of fa position in mm
+            last    --- [time, tsc, fa] of the sample just before them; [] if none.
+                        the first sample does not move if there is none
+    output: a dictionary of column name: numpy array of the days with samples; see day_cols
+    """
+
+    time   = numpy.asarray(time,   dtype=numpy.float64)
+    tsc_mm = numpy.asarray(tsc_mm, dtype=numpy.float64)
+    fa_mm  = numpy.asarray(fa_mm,  dtype=numpy.float64)
+#
+#--- the movement of each sample is measured from the sample before it
+#
+    if len(last) > 0:
+        tsc_step = numpy.abs(numpy.diff(numpy.concatenate([[last[1]], tsc_mm])))
+        fa_step  = numpy.abs(numpy.diff(numpy.concatenate([[last[2]], fa_mm])))
+    else:
+        tsc_step = numpy.concatenate([[0.0], numpy.abs(numpy.diff(tsc_mm))])
+        fa_step  = numpy.concatenate([[0.0], numpy.abs(numpy.diff(fa_mm))])
+#
+#--- the samples are in time order, so the samples of a day are next to each other
+#
+    [day, tstart, tstop] = day_index(time)
+
+    first = numpy.concatenate([[0], numpy.nonzero(numpy.diff(day))[0] + 1])
+    end   = numpy.concatenate([first[1:], [len(day)]]) - 1
+
+    out = {}
+    out['day']       = day[first]
+    out['tstart']    = tstart[first]
+    out['tstop']     = tstop[first]
+    out['tsc_sum']   = numpy.add.reduceat(tsc_step, first)
+    out['fa_sum']    = numpy.add.reduceat(fa_step,  first)
+    out['count']     = end - first + 1
+    out['tsc_first'] = tsc_mm[first]
+    out['fa_first']  = fa_mm[first]
+    out['tsc_last']  = tsc_mm[end]
+    out['fa_last']   = fa_mm[end]
+
+    return out
+
+#-----------------------------------------------------------------------------------------
+#-- merge_day: merge the new samples of a day to the saved values of the day           ---
+#-----------------------------------------------------------------------------------------
+
+def merge_day(old, new):
+
+    """
+    merge the new samples of a day to the saved values of the day
+    input:  old     --- the saved row of the day; see day_cols
+            new     --- the row of the new samples of the day
+    output: the merged row
+    """
+
+    out    = list(old)
+    out[3] = old[3] + new[3]
+    out[4] = old[4] + new[4]
+    out[5] = old[5] + new[5]
+    out[8] = new[8]
+    out[9] = new[9]
+
+    return out
+
+#-----------------------------------------------------------------------------------------
+#-- day_index: find the day of each time                                               ---
+#-----------------------------------------------------------------------------------------
+
+def day_index(time):
+
+    """
+    find the day of each time
+    input:  time    --- numpy array of time in fractional year
+    output: [day, tstart, tstop]
+                day     --- numpy array of <yyyy><ddd> (ddd: day of year from 1)
+                tstart  --- numpy array of the start time of the day in fractional year
+                tstop   --- numpy array of the stop time of the day in fractional year
+            the day boundaries are <year> + <days>/<365 or 366>, same as the daily
+            edges of time_bins
+    """
+
+    time  = numpy.asarray(time, dtype=numpy.float64)
+    year  = numpy.floor(time).astype(numpy.int64)
+    base  = fyr.year_base[year]
+    yday  = numpy.floor((time - year) * base)
+#
+#--- the rounding of (time - year) * base can move a time next to a boundary to the
+#--- next or the previous day; the boundaries themselves decide
+#
+    yday  = yday - (year + yday / base > time)
+    nxt   = (year + (yday + 1) / base <= time) & (yday + 1 < base)
+    yday  = yday + nxt
+
+    tstart = year + yday / base
+    tstop  = year + (yday + 1) / base
+    tstop  = numpy.where(yday + 1 >= base, year + 1.0, tstop)
+
+    day    = year * 1000 + yday.astype(numpy.int64) + 1
+
+    return [day, tstart, tstop]
+
+#-----------------------------------------------------------------------------------------
+#-- bin_days: build cumulative tsc and fa movement of bins from the days               ---
+#-----------------------------------------------------------------------------------------
+
+def bin_days(days, blist, elist, base=[0.0, 0.0]):
+
+    """
+    build cumulative tsc and fa movement of bins from the days; the same as
+    bin_cumulative in sim_plot, but from a few thousand days instead of all samples
+    input:  days    --- a dictionary of the day columns; see DayRollup.days
+            blist   --- a list of bin starting time; the bins are contiguous and each
+                        boundary is a day boundary
+            elist   --- a list of bin stopping time
+            base    --- [tsc, fa] cumulative values before the first day
+    output: [avg_time, bin_tsc_mm, bin_fa_mm]
+                avg_time    --- a list of the mid point of each bin; 0 for the first bin
+                bin_tsc_mm  --- cumulative TSC movement in 1.0e4 mm
+                bin_fa_mm   --- cumulative FA movement in mm
+    note:   the first bin is used only as a starting point and never gets any movement
+    """
+
+    blen     = len(blist)
+    avg_time = [0 for x in range(0, blen)]
+    for j in range(1, blen):
+        avg_time[j] = 0.5 *  (blist[j] + elist[j])
+
+    if blen == 0:
+        return [avg_time, [], []]
+#
+#--- a day falls in the bin its start time is in
+#
+    edges    = numpy.array(list(blist) + [elist[-1]], dtype=numpy.float64)
+    tsc_sum  = tbin.bin_sums(edges, days['tstart'], days['tsc_sum'] / 1.0e4, first=1)
+    fa_sum   = tbin.bin_sums(edges, days['tstart'], days['fa_sum'], first=1)
+
+    bin_tsc_mm = base[0] + numpy.cumsum(tsc_sum)
+    bin_fa_mm  = base[1] + numpy.cumsum(fa_sum)
+
+    return [avg_time, bin_tsc_mm.tolist(), bin_fa_mm.tolist()]
+
+#-----------------------------------------------------------------------------------------
+#-- TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST    ---
+#-----------------------------------------------------------------------------------------
+
+class TestFunctions(unittest.TestCase):
+    """
+    testing functions
+    """
+#------------------------------------------------------------
+
+    def test_day_index(self):
+
+        time = numpy.array([2000.0, 2000.5, 2001.0 + 31.0 / 365.0, 2001.0 - 1.0e-9])
+        [day, tstart, tstop] = day_index(time)
+
+        self.assertEquals(day.tolist(), [2000001, 2000184, 2001032, 2000366])
+        self.assertEquals(tstart[2], 2001.0 + 31.0 / 365.0)
+        self.assertEquals(tstop[3], 2001.0)
+
+#------------------------------------------------------------
+
+    def test_day_rollup(self):
+
+        wdir   = tempfile.mkdtemp()
+        dbfile = os.path.join(wdir, 'day_rollup.db')
+
+        time   = numpy.array([2000.001, 2000.002, 2000.004, 2000.0041, 2000.0042])
+        tsc_mm = numpy.array([0.0, 1.0e4, 3.0e4, 2.0e4, 6.0e4])
+        fa_mm  = numpy.array([0.0, 1.0, 0.5, 2.5, 2.0])
+#
+#--- add the samples in two parts; the second part starts in the middle of a day
+#
+        store = DayRollup(dbfile)
+        try:
+            store.add(time[:4], tsc_mm[:4], fa_mm[:4], [], 4)
+            [rows, last] = store.state()
+            store.add(time[4:], tsc_mm[4:], fa_mm[4:], last, rows + 1)
+
+            days = store.days()
+            self.assertEquals(days['day'].tolist(),     [2000001, 2000002])
+            self.assertEquals(days['tsc_sum'].tolist(), [1.0e4, 7.0e4])
+            self.assertEquals(days['fa_sum'].tolist(),  [1.0, 3.0])
+            self.assertEquals(days['count'].tolist(),   [2, 3])
+            self.assertEquals(days['tsc_last'][1],      6.0e4)
+            self.assertEquals(store.state(), [5, [2000.0042, 6.0e4, 2.0]])
+#
+#--- the second bin starts on day 2
+#
+            blist = [2000.0, 2000.0 + 1.0 / 366.0]
+            elist = [2000.0 + 1.0 / 366.0, 2000.1]
+            [avg_time, tsc, fa] = bin_days(days, blist, elist, [1.0, 1.0])
+            self.assertEquals(tsc, [1.0, 8.0])
+            self.assertEquals(fa,  [1.0, 4.0])
+
+            store.clear()
+            self.assertEquals(store.state(), [0, []])
+        finally:
+            store.close()
+            shutil.rmtree(wdir)
+
+#-----------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    unittest.main()
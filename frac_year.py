@@ -0,0 +1,312 @@
+#!/usr/bin/env /proj/sot/ska/bin/python
+
+#############################################################################################
+#                                                                                           #
+#       frac_year.py:   convert arrays of time strings to fractional year                   #
+#                                                                                           #
+#           author: t. isobe (tisobe@cfa.harvard.edu)                                       #
+#                                                                                           #
+#           last update: Oct 18, 2026                                                       #
+#                                                                                           #
+#############################################################################################
+
+import re
+import numpy
+import unittest
+
+#
+#--- the length of each year in days; index is the year
+#
+years     = numpy.arange(0, 10000)
+leap      = ((years % 4 == 0) & (years % 100 != 0)) | (years % 400 == 0)
+year_base = numpy.where(leap, 366.0, 365.0)
+
+#-----------------------------------------------------------------------------------------
+#-- convert_time_batch: convert an array of time strings to fractional year            ---
+#-----------------------------------------------------------------------------------------
+
+def convert_time_batch(tlist):
+
+    """
+    convert an array of time strings to fractional year. the format is decided from
+    the first entry
+    input:  tlist   --- a list/array of time in either
+                        <year>:<ydate>:<hours>:<mins>:<sec> (with or without leading ':')
+                        or <year><ydate>.<hh><mm><ss>
+    output: fyear   --- numpy float64 array of fractional year; nan if not convertible
+    """
+
+    arr = to_bytes_array(tlist)
+    if len(arr) == 0:
+        return numpy.zeros(0)
+
+    if b':' in arr[0]:
+        return colon_time_batch(arr)
+    else:
+        return compact_time_batch(arr)
+
+#-----------------------------------------------------------------------------------------
+#-- colon_time_batch: convert <year>:<ydate>:<hours>:<mins>:<sec> to fractional year   ---
+#-----------------------------------------------------------------------------------------
+
+def colon_time_batch(tlist):
+
+    """
+    convert an array of <year>:<ydate>:<hours>:<mins>:<sec> to fractional year
+    input:  tlist   --- a list/array of time e.g. 2014:059:12:23:33.1 or :2014:059:12:23:33.1
+    output: fyear   --- numpy float64 array of fractional year; nan if not convertible
+    note:   the fixed width entries (yyyy:ddd:hh:mm:ss...) are converted by slicing;
+            others are converted one by one
+    """
+
+    arr   = to_bytes_array(tlist)
+    fyear = numpy.zeros(len(arr)) + numpy.nan
+    if len(arr) == 0:
+        return fyear
+
+    chars = char_matrix(arr, 17)
+#
+#--- input data sometime comes with an extra ":" at the front; shift those rows
+#
+    lead  = chars[:, 0] == ord(':')
+    if lead.any():
+        chars[lead, :-1] = chars[lead, 1:]
+        chars[lead, -1]  = 0
+
+    ok    = (chars[:, 4] == ord(':')) & (chars[:, 8] == ord(':'))  \
+          & (chars[:, 11] == ord(':')) & (chars[:, 14] == ord(':'))
+    for k in [0, 1, 2, 3, 5, 6, 7, 9, 10, 12, 13]:
+        ok &= is_digit(chars[:, k])
+
+    if ok.any():
+        sub   = chars[ok]
+        year  = digits(sub, 0, 4)
+        ydate = digits(sub, 5, 8)
+        hours = digits(sub, 9, 11)
+        mins  = digits(sub, 12, 14)
+        secs  = numpy.ascontiguousarray(sub[:, 15:]).view('S%d' % (sub.shape[1] - 15))
+        secs  = to_float(secs.ravel())
+
+        fyear[ok] = combine(year, ydate, hours, mins, secs)
+#
+#--- the rest is converted one by one
+#
+    for i in numpy.nonzero(numpy.isnan(fyear))[0]:
+        try:
+            otime = arr[i].decode('ascii')
+            k     = 0
+            if otime[0] == ':':
+                k = 1
+            atemp = re.split(':', otime)
+            vals  = [float(atemp[k+m]) for m in range(0, 5)]
+            fyear[i] = combine(*[numpy.array([x]) for x in vals])[0]
+        except:
+            pass
+
+    return fyear
+
+#-----------------------------------------------------------------------------------------
+#-- compact_time_batch: convert <year><ydate>.<hh><mm><ss> to fractional year          ---
+#-----------------------------------------------------------------------------------------
+
+def compact_time_batch(tlist):
+
+    """
+    convert an array of <year><ydate>.<hh><mm><ss> to fractional year
+    input:  tlist   --- a list/array of time e.g. 2014059.122333
+    output: fyear   --- numpy float64 array of fractional year; nan if not convertible
+    note:   as in grating_plot.convert_time, digits after <ss> are ignored
+    """
+
+    arr   = to_bytes_array(tlist)
+    fyear = numpy.zeros(len(arr)) + numpy.nan
+    if len(arr) == 0:
+        return fyear
+
+    chars = char_matrix(arr, 14)
+    ok    = numpy.ones(len(arr), dtype=bool)
+    for k in [0, 1, 2, 3, 4, 5, 6, 8, 9, 10, 11, 12, 13]:
+        ok &= is_digit(chars[:, k])
+
+    if ok.any():
+        sub   = chars[ok]
+        year  = digits(sub, 0, 4)
+        ydate = digits(sub, 4, 7)
+        hours = digits(sub, 8, 10)
+        mins  = digits(sub, 10, 12)
+        secs  = digits(sub, 12, 14)
+
+        fyear[ok] = combine(year, ydate, hours, mins, secs)
+#
+#--- the rest is converted one by one
+#
+    for i in numpy.nonzero(numpy.isnan(fyear))[0]:
+        otime = arr[i].decode('ascii')
+        try:
+            vals  = [float(otime[0:4]),   float(otime[4:7]), float(otime[8:10]), \
+                     float(otime[10:12]), float(otime[12:14])]
+            fyear[i] = combine(*[numpy.array([x]) for x in vals])[0]
+        except:
+            pass
+
+    return fyear
+
+#-----------------------------------------------------------------------------------------
+#-- combine: compute fractional year from year, ydate, hours, mins and secs            ---
+#-----------------------------------------------------------------------------------------
+
+def combine(year, ydate, hours, mins, secs):
+
+    """
+    compute fractional year from year, ydate, hours, mins and secs
+    input:  year, ydate, hours, mins, secs  --- numpy float64 arrays
+    output: fyear   --- numpy float64 array of fractional year
+    note:   the operations are in the same order as convert_time of sim_plot and
+            grating_plot so that the results are identical
+    """
+
+    base  = year_base[numpy.clip(year, 0, len(year_base) - 1).astype(int)]
+
+    fday  = hours / 24.0 + mins / 1440.0 + secs / 86400.0
+    fyear = year + (ydate + fday) / base
+
+    return fyear
+
+#-----------------------------------------------------------------------------------------
+#-- to_bytes_array: make a flat byte string array from a list of strings               ---
+#-----------------------------------------------------------------------------------------
+
+def to_bytes_array(tlist):
+
+    """
+    make a flat byte string array from a list of strings
+    input:  tlist   --- a list/array of str, unicode or bytes
+    output: numpy 'S' array
+    """
+
+    arr = numpy.asarray(tlist)
+    if arr.dtype.kind == 'U':
+        arr = numpy.char.encode(arr, 'ascii')
+    elif arr.dtype.kind != 'S':
+        arr = numpy.array([str(x) for x in arr.ravel()], dtype='S')
+
+    return arr.ravel()
+
+#-----------------------------------------------------------------------------------------
+#-- char_matrix: view a byte string array as a 2D array of character codes             ---
+#-----------------------------------------------------------------------------------------
+
+def char_matrix(arr, width):
+
+    """
+    view a byte string array as a 2D array of character codes
+    input:  arr     --- numpy 'S' array
+            width   --- the minimum number of columns; short strings are padded with 0
+    output: numpy uint8 array of (len(arr), max(width, itemsize))
+    """
+
+    size = max(width, arr.dtype.itemsize)
+    arr  = numpy.ascontiguousarray(arr.astype('S%d' % size))
+
+    return arr.view(numpy.uint8).reshape(len(arr), size)
+
+#-----------------------------------------------------------------------------------------
+#-- is_digit: check whether character codes are digits                                 ---
+#-----------------------------------------------------------------------------------------
+
+def is_digit(col):
+
+    """
+    check whether character codes are digits
+    input:  col     --- numpy uint8 array of character codes
+    output: numpy bool array
+    """
+
+    return (col >= ord('0')) & (col <= ord('9'))
+
+#-----------------------------------------------------------------------------------------
+#-- digits: convert columns of digit characters to numbers                             ---
+#-----------------------------------------------------------------------------------------
+
+def digits(chars, start, stop):
+
+    """
+    convert columns of digit characters to numbers
+    input:  chars   --- numpy uint8 array of character codes (2D)
+            start   --- the first column
+            stop    --- the column after the last one
+    output: numpy float64 array of the numbers
+    """
+
+    val = numpy.zeros(len(chars))
+    for k in range(start, stop):
+        val = val * 10 + (chars[:, k] - ord('0'))
+
+    return val
+
+#-----------------------------------------------------------------------------------------
+#-- to_float: convert a byte string array to float with nan for bad entries            ---
+#-----------------------------------------------------------------------------------------
+
+def to_float(arr):
+
+    """
+    convert a byte string array to float with nan for bad entries
+    input:  arr     --- numpy 'S' array
+    output: numpy float64 array
+    """
+
+    try:
+        return arr.astype(numpy.float64)
+    except ValueError:
+        out = numpy.zeros(len(arr)) + numpy.nan
+        for i in range(0, len(arr)):
+            try:
+                out[i] = float(arr[i])
+            except:
+                pass
+        return out
+
+#-----------------------------------------------------------------------------------------
+#-- TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST    ---
+#-----------------------------------------------------------------------------------------
+
+class TestFunctions(unittest.TestCase):
+    """
+    testing functions
+    """
+#------------------------------------------------------------
+
+    def test_colon_time_batch(self):
+
+        tlist = ['2014:059:12:23:33.1', ':2014:059:12:23:33.1', '2014:59:12:23:33.1', 'xx']
+        out   = convert_time_batch(tlist)
+
+        for i in range(0, 3):
+            self.assertEquals(round(out[i], 7), 2014.1630585)
+        self.assertTrue(numpy.isnan(out[3]))
+
+#------------------------------------------------------------
+
+    def test_compact_time_batch(self):
+
+        tlist = ['2014059.122333.1', '2014059.122333', '2014059.1223']
+        out   = convert_time_batch(tlist)
+
+        self.assertEquals(round(out[0], 7), 2014.1630585)
+        self.assertEquals(round(out[1], 7), 2014.1630585)
+        self.assertTrue(numpy.isnan(out[2]))
+
+#------------------------------------------------------------
+
+    def test_year_base(self):
+
+        self.assertEquals(year_base[2000], 366.0)
+        self.assertEquals(year_base[2014], 365.0)
+        self.assertEquals(year_base[2100], 365.0)
+
+#-----------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    unittest.main()
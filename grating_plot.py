@@ -15,61 +15,78 @@ import sys
 import re
 import string
 import math
+import hashlib
+import shutil
+import tempfile
+import numpy
 import unittest
-
-import matplotlib as mpl
-
-if __name__ == '__main__':
-
-    mpl.use('Agg')
-
-from pylab import *
-import matplotlib.pyplot       as plt
-import matplotlib.font_manager as font_manager
-import matplotlib.lines        as lines
 #
-#--- reading directory list
+#--- the directory list is read and the mta modules are imported when they are first used,
+#--- so that the data functions can be imported without the directory list or matplotlib
 #
-path = '/data/mta/Script/Month/SIM/house_keeping/dir_list_py'
-
-f    = open(path, 'r')
-data = [line.strip() for line in f.readlines()]
-f.close()
-
-for ent in data:
-    atemp = re.split(':', ent)
-    var  = atemp[1].strip()
-    line = atemp[0].strip()
-    exec "%s = %s" %(var, line)
+import sim_config
+tcnv = sim_config.lazy_import('convertTimeFormat')     #--- MTA time conversion routines
+mcf  = sim_config.lazy_import('mta_common_functions')
+import frac_year            as fyr
+import product_cache        as pcache
+import sim_render           as srender
+import stage_monitor        as smon
+import time_bins            as tbin
 
+datafile = "/data/mta/www/mta_otg/OTG_sorted.rdb"
 #
-#--- append a path to a private folder to python directory
+#--- monthly sums of the database rows read so far
 #
-sys.path.append(bin_dir)
-sys.path.append(mta_dir)
+storefile = '/data/mta/Script/Month/SIM/house_keeping/grat_store'
 #
-#--- converTimeFormat contains MTA time conversion routines
+#--- the columns of the database used here, kept in a numpy .npz file. direction and
+#--- grating are stored as integer codes. the angles are kept in float64 so that the 
+#--- monthly means do not change.
 #
-import convertTimeFormat    as tcnv
-import mta_common_functions as mcf
-
-datafile = "/data/mta/www/mta_otg/OTG_sorted.rdb"
+cachefile     = '/data/mta/Script/Month/SIM/house_keeping/grat_cache.npz'
+direct_codes  = {'INSR': 1, 'RETR': 2}
+grating_codes = {'HETG': 1, 'LETG': 2}
+cache_cols    = [['direct',  numpy.int8],    ['grating', numpy.int8],    \
+                 ['start',   numpy.float64], ['stop',    numpy.float64], \
+                 ['hposa',   numpy.float64], ['hposb',   numpy.float64], \
+                 ['fposa',   numpy.float64], ['fposb',   numpy.float64]]
+#
+#--- schema version and columns of the saved monthly data; see product_cache
+#
+product_schema = 1
+product_cols   = ['time', 'h_in_ang', 'h_out_ang', 'l_in_ang', 'l_out_ang', \
+                  'h_in', 'h_out', 'l_in', 'l_out']
 
 #-----------------------------------------------------------------------------------------
 #-- plot_grat_movement: create grating movement plots                                  ---
 #-----------------------------------------------------------------------------------------
 
-def plot_grat_movement():
+def plot_grat_movement(replot=0):
 
     """
     create grating movement plots
-    input:  none, but read from database
+    input:  replot  --- if 1, plot the data saved by the last run, if there is
     outupu: monthly_grat.png and monthly_grat_ang.png
+            the computed data are saved in the product file (see product_cache)
     """
 #
+#--- read the saved data
+#
+    data = None
+    if replot == 1:
+        data = pcache.read_product('grat', product_schema)
+
+    if data is not None:
+        [time, h_in_ang, h_out_ang, l_in_ang, l_out_ang, h_in, h_out, l_in, l_out] \
+                = [data[x] for x in product_cols]
+    else:
+#
 #--- read data
 #
-    [time, h_in_ang, h_out_ang, l_in_ang, l_out_ang, h_in, h_out, l_in, l_out] = get_grat_data()
+        [time, h_in_ang, h_out_ang, l_in_ang, l_out_ang, h_in, h_out, l_in, l_out] = get_grat_data()
+
+        out = [time, h_in_ang, h_out_ang, l_in_ang, l_out_ang, h_in, h_out, l_in, l_out]
+        pcache.write_product('grat', product_schema, dict(zip(product_cols, out)))
 #
 #--- plot insertion/retraction angle plots
 #
@@ -85,7 +102,9 @@ def plot_grat_movement():
 
 def get_grat_data():
     """
-    read database and extract needed information, then create data
+    read database and extract needed information, then create data. the needed columns 
+    of the database are kept in cachefile, and the monthly sums in storefile; only 
+    the rows added after the last run are parsed and binned
     input: none but read from the database: "/data/mta/www/mta_otg/OTG_sorted.rdb"
     output: [time, h_in_ang, h_out_ang, l_in_ang, l_out_ang, h_in, h_out, l_in, l_out]
             where: time         --- time in fractional year
@@ -99,16 +118,105 @@ def get_grat_data():
                    l_out        --- hetig retraction cumm count
     """
 #
-#--- read data
+#--- find the current year. this will be used to remove iregular data
 #
-    f    = open(datafile, 'r')
-    data = [line.strip() for line in f.readlines()]
-    f.close()
+    [year, mon, day, hours, min, sec, weekday, yday, dst] = tcnv.currentTime()
 #
-#--- find the current year. this will be used to remove iregular data
+#--- create start and stop lists of data bin. the width is a month
+#
+    [blist, elist] = create_monthly_bins(2000, year, mon)
+#
+#--- bring the cache up to date with the database
 #
+    cache = update_grat_cache()
+    rows  = len(cache['start'])
+#
+#--- find out how many of the cached rows are already in the store
+#
+    [srows, sums] = read_grat_store()
+    if srows > rows:
+        [srows, sums] = [0, None]
+#
+#--- the rows are not in time order; the rows from the first one which starts at or after
+#--- the end of the last bin are left for the next run, so that the store never counts
+#--- a row twice nor misses one
+#
+    stop = rows
+    if len(elist) > 0:
+        late = numpy.nonzero(numpy.asarray(cache['start'][srows:]) >= elist[-1])[0]
+        if len(late) > 0:
+            stop = srows + int(late[0])
+
+    token = smon.start('bin')
+    sums  = sum_grat_data(cache['direct'][srows:stop], cache['grating'][srows:stop], \
+                          cache['start'][srows:stop],  cache['hposa'][srows:stop],   \
+                          cache['fposa'][srows:stop],  blist, elist, sums)
+    smon.stop(token, stop - srows)
+
+    if srows < stop:
+        write_grat_store(stop, sums)
+
+    return grat_means(sums, blist, elist)
+
+#-----------------------------------------------------------------------------------------
+#-- get_grat_bins: compute mean angles and cumulative counts in bins of a resolution   ---
+#-----------------------------------------------------------------------------------------
+
+def get_grat_bins(resolution):
+    """
+    compute mean angles and cumulative counts in bins of a resolution from 2000 to the
+    current month. the moves are binned from the cache; the monthly store is not used
+    input:  resolution  --- 'monthly', 'weekly', 'daily' or a bin width in days; 
+                            see time_bins
+    output: [time, h_in_ang, h_out_ang, l_in_ang, l_out_ang, h_in, h_out, l_in, l_out]
+            see get_grat_data for the descriptions
+    """
+
     [year, mon, day, hours, min, sec, weekday, yday, dst] = tcnv.currentTime()
 
+    [blist, elist] = tbin.edge_lists(tbin.bin_edges(resolution, 2000, year, mon))
+
+    cache = update_grat_cache()
+    sums  = sum_grat_data(cache['direct'], cache['grating'], cache['start'], \
+                          cache['hposa'],  cache['fposa'],   blist, elist)
+
+    return grat_means(sums, blist, elist)
+
+#-----------------------------------------------------------------------------------------
+#-- read_grat_data: read grating move data from the given position of the database     --
+#-----------------------------------------------------------------------------------------
+
+def read_grat_data(offset=0):
+    """
+    read grating move data from the given position of the database
+    input:  offset  --- byte position to start reading. if it is 0, the header is skipped
+    output: [direct, grating, start, stop, hposa, hposb, fposa, fposb, noffset]
+                direct  --- a list of move direction (INSR/RETR)
+                grating --- a list of grating name (HETG/LETG)
+                start   --- a list of move starting time in fractional year
+                stop    --- a list of move stopping time in fractional year
+                hposa   --- a list of hposa values
+                hposb   --- a list of hposb values
+                fposa   --- a list of fposa values
+                fposb   --- a list of fposb values
+                noffset --- byte position after the last complete line
+    """
+
+    token = smon.start('read')
+
+    f    = open(datafile, 'r')
+    f.seek(offset)
+    text = f.read()
+    f.close()
+
+    pos  = text.rfind('\n') + 1
+    data = [line.strip() for line in text[:pos].split('\n')]
+    if offset == 0:
+        data = data[1:]
+
+    smon.stop(token, len(data))
+    token = smon.start('parse')
+
     direct   = []
     grating  = []
     start    = []
@@ -118,8 +226,7 @@ def get_grat_data():
     fposa    = []
     fposb    = []
 
-    for i in range(1, len(data)):
-        ent   = data[i]
+    for ent in data:
         atemp = re.split('\s+', ent)
         try:
             test  = float(atemp[2])
@@ -128,90 +235,397 @@ def get_grat_data():
             continue
         direct.append(atemp[0].strip())
         grating.append(atemp[1].strip())
-        val = convert_time(atemp[2])
 
-        start.append(val)
-        stop.append(convert_time(atemp[4]))
+        start.append(atemp[2])
+        stop.append(atemp[4])
         hposa.append(float(atemp[18]))
         hposb.append(float(atemp[19]))
         fposa.append(float(atemp[20]))
         fposb.append(float(atemp[21]))
 #
-#--- create start and stop lists of data bin. the width is a month
+#--- converting time to fractional year, all at once
 #
-    [blist, elist] = create_monthly_bins(2000, year, mon)
+    start = fyr.compact_time_batch(start).tolist()
+    stop  = fyr.compact_time_batch(stop).tolist()
 
-    blen          = len(blist)
-    time          = [0 for x in range(0, blen)]
-    h_in          = [0 for x in range(0, blen)]     #--- hetg insertion cumm count rate
-    h_in_ang      = [0 for x in range(0, blen)]     #--- hetg insertion angle
-    h_out         = [0 for x in range(0, blen)]     #--- hetg retraction cumm count rate
-    h_out_ang     = [0 for x in range(0, blen)]     #--- hetg retraction angle
+    smon.stop(token, len(data))
 
-    l_in          = [0 for x in range(0, blen)]
-    l_in_ang      = [0 for x in range(0, blen)]
-    l_out         = [0 for x in range(0, blen)]
-    l_out_ang     = [0 for x in range(0, blen)]
+    return [direct, grating, start, stop, hposa, hposb, fposa, fposb, offset + pos]
 
-    for j in range(1, blen):
+#-----------------------------------------------------------------------------------------
+#-- update_grat_cache: add the new rows of the database to the cache                   --
+#-----------------------------------------------------------------------------------------
+
+def update_grat_cache():
+    """
+    add the new rows of the database to the cache. if the database is rewritten, not
+    appended to, the cache is rebuilt from the beginning and the store is removed
+    input:  none, but read from datafile and cachefile
+    output: cache   --- a dictionary of numpy arrays; see load_grat_cache. 
+                        cachefile is updated if the database is changed
+    """
+
+    [status, cache] = check_grat_cache()
+
+    if status == 'current':
+        return cache
+
+    if status == 'stale':
+        cache = empty_grat_cache()
+#
+#--- the monthly sums in the store are based on the old cache
+#
+        mcf.rm_file(storefile)
+
+    offset = int(cache['offset'])
+    out    = read_grat_data(offset)
+    noffset = out[-1]
+#
+#--- direction and grating are kept as small integer codes
+#
+    out[0] = encode_names(out[0], direct_codes)
+    out[1] = encode_names(out[1], grating_codes)
+
+    for k in range(0, len(cache_cols)):
+        [name, dtype] = cache_cols[k]
+        cache[name] = numpy.concatenate([cache[name], numpy.array(out[k], dtype=dtype)])
+
+    stat = os.stat(datafile)
+    cache['size']   = stat.st_size
+    cache['mtime']  = stat.st_mtime
+    cache['offset'] = noffset
+    cache['tail']   = tail_hash(noffset)
+
+    tmp = cachefile + '~'
+    fo  = open(tmp, 'wb')
+    numpy.savez(fo, **cache)
+    fo.close()
+    os.rename(tmp, cachefile)
+
+    return cache
+
+#-----------------------------------------------------------------------------------------
+#-- check_grat_cache: check whether the cache is up to date with the database          --
+#-----------------------------------------------------------------------------------------
+
+def check_grat_cache():
+    """
+    check whether the cache is up to date with the database
+    input:  none, but read from datafile and cachefile
+    output: [status, cache]
+                status  --- 'current': the cache has all the database
+                            'append' : the database has new rows after the cached part
+                            'stale'  : the database is rewritten; the cache must be rebuilt
+                cache   --- the cache; see load_grat_cache
+    """
+
+    cache = load_grat_cache()
+    if cache is None:
+        return ['stale', None]
+
+    stat = os.stat(datafile)
+    if int(cache['size']) == stat.st_size and float(cache['mtime']) == stat.st_mtime:
+        return ['current', cache]
+
+    offset = int(cache['offset'])
+    if stat.st_size < offset or str(cache['tail']) != tail_hash(offset):
+        return ['stale', cache]
+
+    return ['append', cache]
+
+#-----------------------------------------------------------------------------------------
+#-- load_grat_cache: read the cached columns of the database                            --
+#-----------------------------------------------------------------------------------------
+
+def load_grat_cache():
+    """
+    read the cached columns of the database
+    input:  none, but read from cachefile
+    output: cache   --- a dictionary of:
+                direct  --- int8 code of move direction; see direct_codes
+                grating --- int8 code of grating; see grating_codes
+                start   --- float64 move starting time in fractional year
+                stop    --- float64 move stopping time in fractional year
+                hposa, hposb, fposa, fposb  --- float64 angles
+                size, mtime, offset, tail   --- size, modification time, byte position
+                                                read so far and md5 of the 4096 bytes
+                                                before it, of the database
+            None if there is no usable cache
+    """
+
+    try:
+        npz   = numpy.load(cachefile)
+        cache = {}
+        for name in npz.files:
+            cache[name] = npz[name]
+        npz.close()
+
+        for [name, dtype] in cache_cols:
+            test = cache[name]
+        test = cache['offset']
+    except:
+        return None
+
+    return cache
+
+#-----------------------------------------------------------------------------------------
+#-- empty_grat_cache: create a cache without any row                                    --
+#-----------------------------------------------------------------------------------------
+
+def empty_grat_cache():
+    """
+    create a cache without any row
+    input:  none
+    output: cache   --- see load_grat_cache
+    """
+
+    cache = {}
+    for [name, dtype] in cache_cols:
+        cache[name] = numpy.zeros(0, dtype=dtype)
+
+    cache['size']   = -1
+    cache['mtime']  = -1
+    cache['offset'] = 0
+    cache['tail']   = ''
+
+    return cache
+
+#-----------------------------------------------------------------------------------------
+#-- encode_names: convert a list of names to integer codes                              --
+#-----------------------------------------------------------------------------------------
 
-        time[j]       = 0.5 * (blist[j] + elist[j]) #--- take a mid point for the bin's time 
+def encode_names(names, codes):
+    """
+    convert a list of names to integer codes
+    input:  names   --- a list of names, e.g. ['INSR', 'RETR']
+            codes   --- a dictionary of name: code; unknown names get 0
+    output: numpy int8 array of the codes
+    """
+
+    return numpy.array([codes.get(x, 0) for x in names], dtype=numpy.int8)
+
+#-----------------------------------------------------------------------------------------
+#-- bin_grat_data: compute monthly mean angles and cumulative counts of grating moves   --
+#-----------------------------------------------------------------------------------------
+
+def bin_grat_data(direct, grating, start, hposa, fposa, blist, elist):
+    """
+    compute monthly mean angles and cumulative counts of grating moves
+    input:  direct  --- a list of move direction (INSR/RETR)
+            grating --- a list of grating name (HETG/LETG)
+            start   --- a list of move starting time in fractional year
+            hposa   --- a list of hposa values
+            fposa   --- a list of fposa values
+            blist   --- a list of bin starting time
+            elist   --- a list of bin stopping time
+    output: [time, h_in_ang, h_out_ang, l_in_ang, l_out_ang, h_in, h_out, l_in, l_out]
+            see get_grat_data for the descriptions. the first bin is kept empty.
+    """
+
+    direct  = encode_names(direct,  direct_codes)
+    grating = encode_names(grating, grating_codes)
+
+    sums = sum_grat_data(direct, grating, start, hposa, fposa, blist, elist)
+
+    return grat_means(sums, blist, elist)
+
+#-----------------------------------------------------------------------------------------
+#-- sum_grat_data: add grating moves to monthly angle sums and counts                   --
+#-----------------------------------------------------------------------------------------
+
+def sum_grat_data(direct, grating, start, hposa, fposa, blist, elist, sums=None):
+    """
+    add grating moves to monthly angle sums and counts
+    input:  direct  --- code of move direction; see direct_codes
+            grating --- code of grating; see grating_codes
+            start   --- move starting time in fractional year
+            hposa   --- hposa values
+            fposa   --- fposa values
+            blist   --- a list of bin starting time
+            elist   --- a list of bin stopping time
+            sums    --- the sums of the earlier moves to add to; if None, start from 0
+    output: sums    --- [h_ins, h_ret, h_cnt, l_ins, l_ret, l_cnt] numpy arrays of
+                        insertion angle sum, retraction angle sum and move count of 
+                        each bin. the first bin is kept empty.
+    """
+
+    blen     = len(blist)
+    if sums is None:
+        sums = [numpy.zeros(blen), numpy.zeros(blen), numpy.zeros(blen, dtype=numpy.int64)] * 2
 #
-#-- creating cummulative count; the current bin should have, at least, as the same as the 
-#-- previous bin
+#--- the store made in earlier months has fewer bins
 #
-        h_in[j]       = h_in[j-1]
-        h_out[j]      = h_out[j-1]
-        l_in[j]       = l_in[j-1]
-        l_out[j]      = l_out[j-1]
+    out = []
+    for k in range(0, 6):
+        arr = numpy.zeros(blen, dtype=sums[k].dtype)
+        nlen = min(blen, len(sums[k]))
+        arr[:nlen] = sums[k][:nlen]
+        out.append(arr)
 
-        h_in_ang_cnt  = 0
-        h_out_ang_cnt = 0
-        l_in_ang_cnt  = 0
-        l_out_ang_cnt = 0
+    if blen == 0 or len(start) == 0:
+        return out
 #
-#--- since the data are not ordered by date, go through begining to the end 
-#--- every bin cycle
+#--- the data are not ordered by date; instead of scanning all data for each bin,
+#--- find the bin of each move once. bins are contiguous, so one edge array is enough
 #
-        for i in range(0, len(start)):
+    edges    = numpy.array(list(blist) + [elist[-1]], dtype=numpy.float64)
+    start    = numpy.asarray(start, dtype=numpy.float64)
+    pos      = tbin.bin_index(edges, start)
+    inbin    = (pos >= 1) & (pos < blen)
+
+    direct   = numpy.asarray(direct)
+    grating  = numpy.asarray(grating)
+    hposa    = numpy.asarray(hposa, dtype=numpy.float64)
+    fposa    = numpy.asarray(fposa, dtype=numpy.float64)
 
-            if start[i] >= blist[j] and start[i] < elist[j]: 
-                if direct[i] == 'INSR':
-                    if grating[i] == 'HETG':
-                        h_in_ang[j]   += fposa[i]
-                        h_in_ang_cnt  += 1
-                        h_out_ang[j]  += hposa[i]
-                        h_out_ang_cnt += 1
-     
-                    if grating[i] == 'LETG':
-                        l_in_ang[j]   += fposa[i]
-                        l_in_ang_cnt  += 1
-                        l_out_ang[j]  += hposa[i]
-                        l_out_ang_cnt += 1
+    for k in range(0, 2):
+        gcode = [grating_codes['HETG'], grating_codes['LETG']][k]
+        mask  = inbin & (direct == direct_codes['INSR']) & (grating == gcode)
+        gpos  = pos[mask]
 #
-#--- taking monthly average
+#--- monthly sums are added in the file order; the same order as the original bin loop
 #
-        if h_in_ang_cnt> 0:
-            h_in_ang[j] /=  h_in_ang_cnt
+        numpy.add.at(out[3*k],   gpos, fposa[mask])
+        numpy.add.at(out[3*k+1], gpos, hposa[mask])
+        out[3*k+2] += numpy.bincount(gpos, minlength=blen)
+
+    return out
 
-        if h_out_ang_cnt> 0:
-            h_out_ang[j] /=  h_out_ang_cnt
+#-----------------------------------------------------------------------------------------
+#-- grat_means: compute monthly mean angles and cumulative counts from monthly sums    --
+#-----------------------------------------------------------------------------------------
 
-        if l_in_ang_cnt> 0:
-            l_in_ang[j] /=  l_in_ang_cnt
+def grat_means(sums, blist, elist):
+    """
+    compute monthly mean angles and cumulative counts from monthly sums
+    input:  sums    --- [h_ins, h_ret, h_cnt, l_ins, l_ret, l_cnt]; see sum_grat_data
+            blist   --- a list of bin starting time
+            elist   --- a list of bin stopping time
+    output: [time, h_in_ang, h_out_ang, l_in_ang, l_out_ang, h_in, h_out, l_in, l_out]
+            see get_grat_data for the descriptions. 
+    """
 
-        if l_out_ang_cnt> 0:
-            l_out_ang[j] /=  l_out_ang_cnt
+    blen     = len(blist)
+    time     = [0 for x in range(0, blen)]
+    for j in range(1, blen):
+        time[j] = 0.5 * (blist[j] + elist[j])   #--- take a mid point for the bin's time 
+
+    out      = []
+    for k in range(0, 2):
+        ins  = numpy.array(sums[3*k],   dtype=numpy.float64)
+        ret  = numpy.array(sums[3*k+1], dtype=numpy.float64)
+        cnt  = sums[3*k+2]
+#
+#--- taking monthly average
 #
-#--- adding in/out count for the month to appropriate bins
+        nz       = cnt > 0
+        ins[nz] /= cnt[nz]
+        ret[nz] /= cnt[nz]
 #
-        h_in[j]  += h_in_ang_cnt
-        h_out[j] += h_out_ang_cnt
-        l_in[j]  += l_in_ang_cnt
-        l_out[j] += l_out_ang_cnt
+#--- cummulative count; the current bin has, at least, as the same as the previous bin
+#
+        cum  = numpy.cumsum(cnt)
+
+        out.append([ins.tolist(), ret.tolist(), cum.tolist()])
+
+    [[h_in_ang, h_out_ang, h_in], [l_in_ang, l_out_ang, l_in]] = out
+    h_out = list(h_in)
+    l_out = list(l_in)
 
     return [time, h_in_ang, h_out_ang, l_in_ang, l_out_ang, h_in, h_out, l_in, l_out]
 
+#-----------------------------------------------------------------------------------------
+#-- tail_hash: compute md5 of the database bytes just before the given position        --
+#-----------------------------------------------------------------------------------------
+
+def tail_hash(offset):
+    """
+    compute md5 of the database bytes just before the given position
+    input:  offset  --- byte position
+    output: md5 hex digest of the last (up to) 4096 bytes before offset
+    """
+
+    start = max(0, offset - 4096)
+    f     = open(datafile, 'r')
+    f.seek(start)
+    text  = f.read(offset - start)
+    f.close()
+
+    return hashlib.md5(text).hexdigest()
+
+#-----------------------------------------------------------------------------------------
+#-- read_grat_store: read the monthly sums saved by the last run                        --
+#-----------------------------------------------------------------------------------------
+
+def read_grat_store():
+    """
+    read the monthly sums saved by the last run
+    input:  none, but read from storefile
+    output: [rows, sums]
+                rows    --- the number of the cached rows already in the sums
+                sums    --- see sum_grat_data
+            if there is no usable store, [0, None] is returned
+    """
+
+    try:
+        f    = open(storefile, 'r')
+        data = [line.strip() for line in f.readlines()]
+        f.close()
+
+        rows   = int(re.split('\s+', data[0])[1])
+
+        cols   = [[], [], [], [], [], []]
+        for ent in data[1:]:
+            atemp = re.split('\s+', ent)
+            for k in range(0, 6):
+                cols[k].append(atemp[k+1])
+#
+#--- the last two columns are cumulative counts; they are kept only for reading
+#
+        sums = []
+        for k in range(0, 6):
+            if k % 3 == 2:
+                sums.append(numpy.array([int(x) for x in cols[k]], dtype=numpy.int64))
+            else:
+                sums.append(numpy.array([float(x) for x in cols[k]], dtype=numpy.float64))
+    except:
+        return [0, None]
+
+    return [rows, sums]
+
+#-----------------------------------------------------------------------------------------
+#-- write_grat_store: save the monthly sums for the next run                            --
+#-----------------------------------------------------------------------------------------
+
+def write_grat_store(rows, sums):
+    """
+    save the monthly sums for the next run
+    input:  rows    --- the number of the cached rows in the sums
+            sums    --- see sum_grat_data
+    output: storefile. each bin line has: bin index, hetg insertion angle sum, 
+            hetg retraction angle sum, hetg count, letg insertion angle sum, 
+            letg retraction angle sum, letg count, hetg cumm count, letg cumm count
+    """
+
+    h_cum = numpy.cumsum(sums[2])
+    l_cum = numpy.cumsum(sums[5])
+
+    line = 'rows\t'   + str(rows)  + '\n'
+    for j in range(0, len(sums[0])):
+        line = line + str(j)
+        for k in range(0, 6):
+            if k % 3 == 2:
+                line = line + '\t' + str(int(sums[k][j]))
+            else:
+                line = line + '\t' + repr(float(sums[k][j]))
+        line = line + '\t' + str(int(h_cum[j])) + '\t' + str(int(l_cum[j])) + '\n'
+
+    tmp = storefile + '~'
+    fo  = open(tmp, 'w')
+    fo.write(line)
+    fo.close()
+    os.rename(tmp, storefile)
+
 #-----------------------------------------------------------------------------------------
 #-- convert_time: convert time format from <year><ydate>.<hh><mm><ss> to frac year     ---
 #-----------------------------------------------------------------------------------------
@@ -251,46 +665,19 @@ def create_monthly_bins(ystart, ystop, mstop):
             ystop   --- stopping year
             mstop   --- stopping month of the stopping month
     output: [blist, elist] a list of lists of starting and stoping period in fractional year
+            the edges are made by time_bins and kept for the next call
     """
 
-    interval1 = [0.0, 31.0, 59.0, 90.0, 120.0, 151.0, 181.0, 212.0, 243.0, 273.0, 304.0, 334.0, 365.0]
-    interval2 = [0.0, 31.0, 60.0, 91.0, 121.0, 152.0, 182.0, 213.0, 244.0, 274.0, 305.0, 335.0, 366.0]
+    edges = tbin.bin_edges('monthly', ystart, ystop, mstop)
 
-    blist = []
-    elist = []
-    
-    for year in range(ystart, ystop+1):
-#
-#--- check leap year
-#
-        if tcnv.isLeapYear(year) == 1:
-            interval = interval2
-            base = 366.0
-        else:
-            interval = interval1
-            base = 365.0
-#
-#--- go around 12 months
-#
-        for i in range(0, 12):
-            if year == ystop and i >= mstop:
-                break
-            begin = year + interval[i]   / base
-            end   = year + interval[i+1] / base
-            if int(end) > year:
-                end = year + 1
-
-            blist.append(begin)
-            elist.append(end)
-    
-    return [blist, elist]
+    return tbin.edge_lists(edges)
 
 
 #-----------------------------------------------------------------------------------------
 #-- : create insertion and retraction angle plots for hetig and letig                   --
 #-----------------------------------------------------------------------------------------
 
-def plot_steps(time, set1, set2, set3, set4):
+def plot_steps(time, set1, set2, set3, set4, outname='monthly_grat_ang.png'):
     """
     create insertion and retraction angle plots for hetig and letig
     input:  time    --- time in fractional year
@@ -299,7 +686,8 @@ def plot_steps(time, set1, set2, set3, set4):
             set3    --- mean letig insertion angle
             set4    --- mean letig retraction angle
             where "mean" means month average
-    output: monthly_grat_ang.png
+            outname --- output file name
+    output: outname (default: monthly_grat_ang.png)
     """
 #
 #--- setting plotting range
@@ -324,55 +712,36 @@ def plot_steps(time, set1, set2, set3, set4):
     marker = 'o'
     msize  = 2
 
-    plt.close("all")
-    mpl.rcParams['font.size'] = fsize
-    props = font_manager.FontProperties(size=fsize)
-    plt.subplots_adjust(hspace=0.11, wspace=0.11)  #--- spacing of panels 
-#
-#--- 'Mean HETG Inserted Angle
 #
-    a1 = plt.subplot(221)
-    plot_sub(a1, time, set1, xmin, xmax, ymin1, ymax1, color, lsize, marker, msize, tline='Mean HETG Inserted Angle')
-    a1.set_ylabel('Insertion Angle (Degree)', size=fsize)
+#--- panels: 'Mean HETG/LETG Inserted/Retracted Angle'
 #
-#--- 'Mean HETG Retracted Angle
+    spec = {'x': time, 'xrange': [xmin, xmax], 'hspace': 0.11, 'wspace': 0.11,       \
+            'fsize': fsize, 'lsize': lsize, 'color': color, 'marker': marker, 'msize': msize,\
+            'panels': [
+            {'pos': 221, 'y': set1, 'yrange': [ymin1, ymax1], 'label': 'Mean HETG Inserted Angle',  \
+             'ylabel': 'Insertion Angle (Degree)'},
+            {'pos': 223, 'y': set2, 'yrange': [ymin2, ymax2], 'label': 'Mean HETG Retracted Angle', \
+             'ylabel': 'Retraction Angle (Degree)', 'xlabel': 'Time (year)'},
+            {'pos': 222, 'y': set3, 'yrange': [ymin1, ymax1], 'label': 'Mean LETG Inserted Angle'}, \
+            {'pos': 224, 'y': set4, 'yrange': [ymin2, ymax2], 'label': 'Mean LETG Rectracted Angle',\
+             'xlabel': 'Time (year)'}]}
 #
-    a2 = plt.subplot(223)
-    plot_sub(a2, time, set2, xmin, xmax, ymin2, ymax2, color, lsize, marker,  msize, tline='Mean HETG Retracted Angle')
-    a2.set_xlabel('Time (year)', size=fsize)
-    a2.set_ylabel('Retraction Angle (Degree)', size=fsize)
+#--- create the plot
 #
-#--- 'Mean LETG Inserted Angle
-#
-    a3 = plt.subplot(222)
-    plot_sub(a3, time, set3, xmin, xmax, ymin1, ymax1, color, lsize, marker,  msize, tline='Mean LETG Inserted Angle')
-
-#
-#--- 'Mean LETG Retracted Angle
-#
-    a4 = plt.subplot(224)
-    plot_sub(a4, time, set4, xmin, xmax, ymin2, ymax2, color, lsize, marker,  msize, tline='Mean LETG Rectracted Angle')
-    a4.set_xlabel('Time (year)', size=fsize)
-#
-#--- save the plot
-#
-    fig = matplotlib.pyplot.gcf()
-    fig.set_size_inches(10.0, 5.0)
-
-    outname = 'monthly_grat_ang.png'
-    plt.savefig(outname, format='png', dpi=100)
+    srender.render_panels(spec, outname)
 
 #-----------------------------------------------------------------------------------------
 #-- plot_cum_grating: plot cummulative count rates of hetig and letig insertion         --
 #-----------------------------------------------------------------------------------------
 
-def plot_cum_grating(time, h_in, l_in):
+def plot_cum_grating(time, h_in, l_in, outname='monthly_grat.png'):
     """
     plot cummulative count rates of hetig and letig insertion. 
     input:  time    --- fractional year
             h_in    --- hetig insertion cummulative count rate (month step)
             l_in    --- letig insertion cummulative count rate 
-    output: monthly_grat.prn
+            outname --- output file name
+    output: outname (default: monthly_grat.png)
     """
 #
 #--- set x axis plotting range
@@ -399,66 +768,19 @@ def plot_cum_grating(time, h_in, l_in):
     color  = 'red'
     marker = 'o'
     msize  = 3
-    plt.close("all")
-    mpl.rcParams['font.size'] = fsize
-    props = font_manager.FontProperties(size=fsize)
-    plt.subplots_adjust(hspace=0.08, wspace=0.10)
-#
-#--- HETG Cumulative Count Plots
 #
-    a1 = plt.subplot(121)           #--- two panel plot: left
-    plot_sub(a1, time, h_in, xmin, xmax, ymin, ymax, color, lsize, marker,  msize, tline='HETG')
-
-    a1.set_xlabel('Time (year)', size=fsize)
-    a1.set_ylabel('Cumulative Insertion Counts', size=fsize)
-#
-#--- LETG Cumulative Count Plots
+#--- panels: HETG / LETG Cumulative Count Plots
 #
-    a1 = plt.subplot(122)           #--- two panel plot: right
-    plot_sub(a1, time, l_in, xmin, xmax, ymin, ymax, color, lsize, marker,  msize, tline='LETG')
-
-    a1.set_xlabel('Time (year)', size=fsize)
+    spec = {'x': time, 'xrange': [xmin, xmax], 'yrange': [ymin, ymax], 'hspace': 0.08,  \
+            'wspace': 0.10, 'fsize': fsize, 'lsize': lsize, 'color': color, 'marker': marker,\
+            'msize': msize, 'xlabel': 'Time (year)',                                    \
+            'panels': [
+            {'pos': 121, 'y': h_in, 'label': 'HETG', 'ylabel': 'Cumulative Insertion Counts'},\
+            {'pos': 122, 'y': l_in, 'label': 'LETG'}]}
 #
-#--- save the plot
+#--- create the plot
 #
-    fig = matplotlib.pyplot.gcf()
-    fig.set_size_inches(10.0, 5.0)
-    outname = 'monthly_grat.png'
-    plt.savefig(outname, format='png', dpi=100)
-
-#-----------------------------------------------------------------------------------------
-#-- plot_sub: plotting each panel                                                       --
-#-----------------------------------------------------------------------------------------
-
-def plot_sub(ap, x, y, xmin, xmax, ymin, ymax, color, lsize, marker, msize, tline=''):
-    """
-    plotting each panel
-    input   ap      --- panel name
-            x       --- x data list
-            y       --- y data list
-            xmin    --- xmin
-            xmax    --- xmax
-            ymin    --- ymin
-            ymax    --- ymax
-            color   --- color of data point
-            lsize   --- line size
-            marker  --- marker shape
-            msize   --- size of the marker
-            tlime   --- extra text line
-    """
-
-    ap.set_autoscale_on(False)
-    ap.set_xbound(xmin,xmax)
-    ap.set_xlim(xmin=xmin, xmax=xmax, auto=False)
-    ap.set_ylim(ymin=ymin, ymax=ymax, auto=False)
-
-    plt.plot(x, y , color=color, lw=lsize, marker=marker, markersize=msize)
-
-    if tline != '':
-        xpos = 0.05 * (xmax - xmin) + xmin
-        ypos = ymax -0.10 * (ymax - ymin)
-        text(xpos, ypos, tline, fontsize=11,style='italic', weight='bold')
-
+    srender.render_panels(spec, outname)
 
 #-----------------------------------------------------------------------------------------
 #-- TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST    ---
@@ -492,6 +814,72 @@ class TestFunctions(unittest.TestCase):
         self.assertEquals(l_in[100:105],      l_in_test)
         self.assertEquals(l_out[100:105],     l_out_test)
     
+#------------------------------------------------------------
+
+    def test_bin_grat_data(self):
+
+        direct  = ['INSR', 'INSR', 'RETR', 'INSR', 'INSR']
+        grating = ['HETG', 'LETG', 'HETG', 'HETG', 'HETG']
+        start   = [2000.35, 2000.15, 2000.15, 2000.12, 2000.05]
+        hposa   = [79.0, 78.0, 10.0, 77.0, 70.0]
+        fposa   = [6.0,  7.0,  1.0,  5.0,  9.0]
+        blist   = [2000.0, 2000.1, 2000.2, 2000.3]
+        elist   = [2000.1, 2000.2, 2000.3, 2000.4]
+
+        out = bin_grat_data(direct, grating, start, hposa, fposa, blist, elist)
+
+        self.assertEquals(out[1], [0.0, 5.0,  0.0, 6.0])
+        self.assertEquals(out[2], [0.0, 77.0, 0.0, 79.0])
+        self.assertEquals(out[3], [0.0, 7.0,  0.0, 0.0])
+        self.assertEquals(out[5], [0, 1, 1, 2])
+        self.assertEquals(out[7], [0, 1, 1, 1])
+
+#------------------------------------------------------------
+
+    def test_get_grat_data_months(self):
+#
+#--- the rows, not in time order, run past the end of the month of the first run; the
+#--- run of a later month must give the same values as binning all rows at once
+#
+        class MonthTime(object):
+            def __init__(self, year, month):
+                self.now = [year, month, 1, 0, 0, 0, 0, 0, 0]
+            def currentTime(self):
+                return self.now
+            def isLeapYear(self, year):
+                return int(fyr.year_base[int(year)] == 366.0)
+
+        global tcnv, datafile, cachefile, storefile
+        save = [tcnv, datafile, cachefile, storefile]
+        wdir = tempfile.mkdtemp()
+        try:
+            [datafile, cachefile, storefile] \
+                    = [os.path.join(wdir, x) for x in ['OTG_sorted.rdb', 'cache.npz', 'store']]
+            fo = open(datafile, 'w')
+            fo.write('\t'.join(['DIRN', 'GRATING', 'START_TIME', 'START_VCDU', 'STOP_TIME'] \
+                               + ['COL'] * 17) + '\n')
+            for k in range(0, 300):
+                day   = '2013%03d.120000' % ((k * 127) % 365 + 1)
+                line  = [['INSR', 'RETR'][k % 2], ['HETG', 'LETG'][(k // 2) % 2], day, '0', day] \
+                      + ['0'] * 13 + ['%.1f' % (70 + k % 9), '0', '%.1f' % (5 + k % 4), '0']
+                fo.write('\t'.join(line) + '\n')
+            fo.close()
+
+            tcnv = MonthTime(2013, 6)
+            get_grat_data()
+            tcnv = MonthTime(2014, 1)
+            incremental = get_grat_data()
+
+            os.remove(storefile)
+            full = get_grat_data()
+        finally:
+            [tcnv, datafile, cachefile, storefile] = save
+            shutil.rmtree(wdir)
+
+        for k in range(0, 9):
+            self.assertEquals(incremental[k], full[k])
+        self.assertEquals(full[5][-1] > 0, True)
+
 #------------------------------------------------------------
 
     def test_convert_time(self):
@@ -516,23 +904,28 @@ class TestFunctions(unittest.TestCase):
         self.assertEquals(elist, out2)
 
 #-----------------------------------------------------------------------------------------
-#
-#--- pylab plotting routine related modules
-#
-from pylab import *
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as font_manager
-import matplotlib.lines as lines
-
-chk = 0
-if len(sys.argv) == 2:
-    chk = 1
 
 if __name__ == '__main__':
 
-    if chk > 0:
+    chk = 0
+    if len(sys.argv) == 2:
+        chk = 1
+        if sys.argv[1] == 'replot':
+            chk = 2
+    elif len(sys.argv) == 3 and sys.argv[1] == 'bins':
+        chk = 3
+        resolution = sys.argv[2]
+        if resolution not in tbin.widths and resolution != 'monthly':
+            resolution = int(resolution)
+
+    if chk == 3:
+        out = get_grat_bins(resolution)
+        plot_steps(*out[0:5], outname=str(resolution) + '_grat_ang.png')
+        plot_cum_grating(out[0], out[5], out[7], outname=str(resolution) + '_grat.png')
+    elif chk == 2:
+        plot_grat_movement(replot=1)
+    elif chk > 0:
         plot_grat_movement()
     else:
         unittest.main()
 
-
@@ -0,0 +1,255 @@
+#!/usr/bin/env /proj/sot/ska/bin/python
+
+#############################################################################################
+#                                                                                           #
+#       month_store.py: monthly aorwspd values kept in a table keyed by year and month      #
+#                                                                                           #
+#           author: t. isobe (tisobe@cfa.harvard.edu)                                       #
+#                                                                                           #
+#           last update: Oct 18, 2026                                                       #
+#                                                                                           #
+#############################################################################################
+
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+#
+#--- sqlite locks the database while a transaction is open; other runs wait this long (sec)
+#
+lock_wait = 600
+
+#-----------------------------------------------------------------------------------------
+#-- MonthStore: monthly values of aorwspd1-6 keyed by (year, month)                     --
+#-----------------------------------------------------------------------------------------
+
+class MonthStore(object):
+    """
+    monthly values of aorwspd1-6 kept in a sqlite table keyed by (year, month).
+    a month is added or replaced in one locked transaction, and the text database
+    (<yyyy>.<mm> <av1> ... <av6>) is written out through a tmp file and rename,
+    so that it is never seen half written. when the table is created, the months
+    in the text database are read into it.
+    """
+
+    def __init__(self, dbfile, textfile):
+
+        self.dbfile   = dbfile
+        self.textfile = textfile
+        self.conn     = None
+
+#------------------------------------------------------------
+
+    def connect(self):
+        """
+        open the database; create the table and read the text database if it is new
+        input:  none
+        output: self.conn   --- sqlite3 connection
+        """
+
+        if self.conn is not None:
+            return self.conn
+
+        self.conn = sqlite3.connect(self.dbfile, timeout=lock_wait, isolation_level=None)
+        self.conn.execute('create table if not exists monthly_avg '     \
+                        + '(year integer, month integer, av1 real, av2 real, av3 real, ' \
+                        + 'av4 real, av5 real, av6 real, primary key (year, month))')
+#
+#--- the first run reads the text database in; the check is done under the lock so that
+#--- two runs do not read it twice
+#
+        self.conn.execute('begin immediate')
+        try:
+            cnt = self.conn.execute('select count(*) from monthly_avg').fetchone()[0]
+            if cnt == 0 and os.path.isfile(self.textfile):
+                self.conn.executemany('insert or replace into monthly_avg values (?,?,?,?,?,?,?,?)',\
+                                      read_text(self.textfile))
+            self.conn.execute('commit')
+        except:
+            self.conn.execute('rollback')
+            raise
+
+        return self.conn
+
+#------------------------------------------------------------
+
+    def has(self, year, month):
+        """
+        check whether the month is in the database
+        input:  year/month
+        output: True/False
+        """
+
+        return self.get(year, month) is not None
+
+#------------------------------------------------------------
+
+    def get(self, year, month):
+        """
+        give the values of the month
+        input:  year/month
+        output: [av1, av2, av3, av4, av5, av6] or None if the month is not in the database
+        """
+
+        out = self.connect().execute('select av1, av2, av3, av4, av5, av6 from monthly_avg ' \
+                                   + 'where year = ? and month = ?', (year, month)).fetchone()
+        if out is None:
+            return None
+
+        return list(out)
+
+#------------------------------------------------------------
+
+    def months(self):
+        """
+        give all months in time order
+        input:  none
+        output: a list of [year, month, [av1, av2, av3, av4, av5, av6]]
+        """
+
+        out = self.connect().execute('select * from monthly_avg order by year, month').fetchall()
+
+        return [[ent[0], ent[1], list(ent[2:])] for ent in out]
+
+#------------------------------------------------------------
+
+    def upsert(self, rows):
+        """
+        add or replace months and write out the text database
+        input:  rows    --- a list of [year, month, [av1, av2, av3, av4, av5, av6]]
+        output: updated database and text database
+        """
+
+        conn = self.connect()
+        conn.execute('begin immediate')
+        try:
+            conn.executemany('insert or replace into monthly_avg values (?,?,?,?,?,?,?,?)',\
+                             [[year, month] + list(vals) for [year, month, vals] in rows])
+            self.write_text()
+            conn.execute('commit')
+        except:
+            conn.execute('rollback')
+            raise
+
+#------------------------------------------------------------
+
+    def write_text(self):
+        """
+        write out the text database through a tmp file and rename
+        input:  none, but read from the database
+        output: self.textfile
+        """
+
+        tmp = self.textfile + '~'
+        fo  = open(tmp, 'w')
+        for [year, month, vals] in self.months():
+            fo.write(format_line(year, month, vals))
+        fo.close()
+        os.rename(tmp, self.textfile)
+
+#------------------------------------------------------------
+
+    def close(self):
+
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+#-----------------------------------------------------------------------------------------
+#-- read_text: read the text database                                                  ---
+#-----------------------------------------------------------------------------------------
+
+def read_text(textfile):
+
+    """
+    read the text database
+    input:  textfile    --- text database; each line is <yyyy>.<mm> <av1> ... <av6>
+    output: a list of [year, month, av1, av2, av3, av4, av5, av6]
+    """
+
+    f    = open(textfile, 'r')
+    data = [line.strip() for line in f.readlines()]
+    f.close()
+
+    out  = []
+    for ent in data:
+        atemp = re.split('\s+', ent)
+        try:
+            btemp = re.split('\.', atemp[0])
+            out.append([int(btemp[0]), int(btemp[1])] + [float(atemp[i]) for i in range(1, 7)])
+        except:
+            pass
+
+    return out
+
+#-----------------------------------------------------------------------------------------
+#-- format_line: create a line of the text database                                    ---
+#-----------------------------------------------------------------------------------------
+
+def format_line(year, month, vals):
+
+    """
+    create a line of the text database
+    input:  year/month
+            vals    --- [av1, av2, av3, av4, av5, av6]
+    output: line    --- <yyyy>.<mm>\t<av1>\t...\t<av6>\n
+    """
+
+    lyear = str(year)
+    lmon  = str(month)
+    if month < 10:
+        lmon = '0' + lmon
+    ltime = lyear + '.' + lmon
+
+    line  = ltime
+    for val in vals:
+        line = line + '\t' + str(val)
+
+    return line + '\n'
+
+#-----------------------------------------------------------------------------------------
+#-- TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST    ---
+#-----------------------------------------------------------------------------------------
+
+class TestFunctions(unittest.TestCase):
+    """
+    testing functions
+    """
+#------------------------------------------------------------
+
+    def test_month_store(self):
+
+        wdir     = tempfile.mkdtemp()
+        dbfile   = os.path.join(wdir, 'monthly_avg.db')
+        textfile = os.path.join(wdir, 'monthly_avg')
+        try:
+            fo = open(textfile, 'w')
+            fo.write(format_line(2013, 12, [1.5, 1, 1, 1, 1, 1]))
+            fo.write(format_line(2014,  2, [2.5, 1, 1, 1, 1, 1]))
+            fo.close()
+#
+#--- the text database is read in when the table is created
+#
+            store = MonthStore(dbfile, textfile)
+            self.assertEquals(store.get(2013, 12), [1.5, 1.0, 1.0, 1.0, 1.0, 1.0])
+            self.assertEquals(store.has(2014, 1), False)
+#
+#--- add a month and replace a month
+#
+            store.upsert([[2014, 1, [3.0] * 6], [2014, 2, [4.0] * 6]])
+            self.assertEquals([x[:2] for x in store.months()], [[2013, 12], [2014, 1], [2014, 2]])
+            self.assertEquals(store.get(2014, 2), [4.0] * 6)
+            store.close()
+
+            self.assertEquals(read_text(textfile)[1], [2014, 1] + [3.0] * 6)
+        finally:
+            shutil.rmtree(wdir)
+
+#-----------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env /proj/sot/ska/bin/python
+
+#############################################################################################
+#                                                                                           #
+#       product_cache.py:   save/read the computed data of each plot script                 #
+#                                                                                           #
+#           author: t. isobe (tisobe@cfa.harvard.edu)                                       #
+#                                                                                           #
+#           last update: Oct 18, 2026                                                       #
+#                                                                                           #
+#############################################################################################
+
+import os
+import numpy
+import unittest
+
+#
+#--- the products are kept here as <name>_product.npz
+#
+product_dir = '/data/mta/Script/Month/SIM/house_keeping/'
+
+#-----------------------------------------------------------------------------------------
+#-- write_product: save the computed data of a plot script                             ---
+#-----------------------------------------------------------------------------------------
+
+def write_product(name, schema, data):
+
+    """
+    save the computed data of a plot script
+    input:  name    --- name of the product, e.g. 'sim'
+            schema  --- schema version of the product; change it when the content changes
+            data    --- a dictionary of column name: list of values
+    output: <product_dir>/<name>_product.npz
+    """
+
+    out = {}
+    for key in data.keys():
+        out[key] = numpy.array(data[key])
+    out['schema'] = schema
+
+    pfile = product_file(name)
+    tmp   = pfile + '~'
+    fo    = open(tmp, 'wb')
+    numpy.savez(fo, **out)
+    fo.close()
+    os.rename(tmp, pfile)
+
+#-----------------------------------------------------------------------------------------
+#-- read_product: read the saved data of a plot script                                 ---
+#-----------------------------------------------------------------------------------------
+
+def read_product(name, schema):
+
+    """
+    read the saved data of a plot script
+    input:  name    --- name of the product, e.g. 'sim'
+            schema  --- expected schema version of the product
+    output: a dictionary of column name: list of values; None if there is no product
+            or its schema version is different
+    """
+
+    try:
+        npz = numpy.load(product_file(name))
+        if int(npz['schema']) != schema:
+            npz.close()
+            return None
+
+        data = {}
+        for key in npz.files:
+            if key != 'schema':
+                data[key] = npz[key].tolist()
+        npz.close()
+    except:
+        return None
+
+    return data
+
+#-----------------------------------------------------------------------------------------
+#-- product_file: give the file name of a product                                      ---
+#-----------------------------------------------------------------------------------------
+
+def product_file(name):
+
+    """
+    give the file name of a product
+    input:  name    --- name of the product
+    output: file name
+    """
+
+    return os.path.join(product_dir, name + '_product.npz')
+
+#-----------------------------------------------------------------------------------------
+#-- TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST    ---
+#-----------------------------------------------------------------------------------------
+
+class TestFunctions(unittest.TestCase):
+    """
+    testing functions
+    """
+#------------------------------------------------------------
+
+    def test_write_read_product(self):
+
+        global product_dir
+        save        = product_dir
+        product_dir = '/tmp/'
+
+        data = {'time': [0, 2000.5, 2000.6], 'val': [0.0, 1.5, 2.5]}
+        write_product('ztest', 1, data)
+
+        self.assertEquals(read_product('ztest', 1), data)
+        self.assertEquals(read_product('ztest', 2), None)
+
+        os.remove(product_file('ztest'))
+        product_dir = save
+
+#-----------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    unittest.main()
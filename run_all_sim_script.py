@@ -17,78 +17,189 @@ import string
 import math
 import numpy
 import unittest
+import timeit
+import traceback
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+#
+#--- the directory list is read and the mta modules are imported when they are first used,
+#--- so that the data functions can be imported without the directory list or matplotlib
+#
+import sim_config
+tcnv = sim_config.lazy_import('convertTimeFormat')     #--- MTA time conversion routines
+mcf  = sim_config.lazy_import('mta_common_functions')
+import aorwspd_plot         as aor
+import grating_plot         as grat
+import sim_plot             as sim
+import stage_monitor        as smon
 
-import matplotlib as mpl
 
-if __name__ == '__main__':
+#-----------------------------------------------------------------------------------------
+#-- run_all_sim_script: run grating, sim and aorwspd plotting scripts                   --
+#-----------------------------------------------------------------------------------------
+
+def run_all_sim_script(parallel=1, profile=0):
+    """
+    run grating, sim and aorwspd plotting scripts. they read different data and 
+    create different plots, so they are run in separate processes at the same time
+    input:  parallel    --- if 1, run them in parallel processes (default); if 2, run
+                            them in threads of this process (the figures are made
+                            without pyplot, see sim_render); otherwise one by one
+            profile     --- if 1, profile the stages with cProfile and print the stats
+                            of the slowest one
+    output: monthly_grat.png, monthly_grat_ang.png, monthly_sim.png, rotation.png
+            a json line of the run appended to the stage log (see stage_monitor)
+            return a list of [name, elapsed time in sec, error message ('' if none),
+                              stage record (see stage_monitor.StageMonitor.finish)].
+            in threads, the cpu times are None if only the cpu time of the whole
+            process is known (cpu_scope 'process')
+    """
+
+    run_start = smon.run_time()
+    start     = timeit.default_timer()
 
-    mpl.use('Agg')
+    [year, month, day, hours, min, sec, weekday, yday, dst] = tcnv.currentTime()
+    month -= 1
+    if month < 1:
+        month = 12
+        year -= 1
 
-from pylab import *
-import matplotlib.pyplot       as plt
-import matplotlib.font_manager as font_manager
-import matplotlib.lines        as lines
+    jobs = [['grating', 'grating_plot', 'plot_grat_movement', []],           \
+            ['sim',     'sim_plot',     'plot_sim_movement',  []],           \
+            ['aorwspd', 'aorwspd_plot', 'plot_aorwspd',       [year, month]]]
+    jobs = [job + [profile] for job in jobs]
+
+    if parallel == 1:
+        pool    = multiprocessing.Pool(len(jobs))
+        results = pool.map(run_pipeline, jobs)
+        pool.close()
+        pool.join()
+    elif parallel == 2:
+        pool    = ThreadPool(len(jobs))
+        results = pool.map(run_pipeline, jobs)
+        pool.close()
+        pool.join()
+    else:
+        results = [run_pipeline(job) for job in jobs]
 #
-#--- reading directory list
+#--- the cpu time of the whole process (e.g. python 2 without /proc) counts all the
+#--- threads running at the same time; it is not given as the cpu time of a pipeline
 #
-path = '/data/mta/Script/Month/SIM/house_keeping/dir_list_py'
-
-f    = open(path, 'r')
-data = [line.strip() for line in f.readlines()]
-f.close()
-
-for ent in data:
-    atemp = re.split(':', ent)
-    var  = atemp[1].strip()
-    line = atemp[0].strip()
-    exec "%s = %s" %(var, line)
-
+    if parallel == 2:
+        for record in [x[3] for x in results if x[3]['cpu_scope'] == 'process']:
+            record['cpu'] = None
+            for ent in record['stages']:
+                ent['cpu'] = None
 #
-#--- append a path to a private folder to python directory
+#--- report time spent and errors of each script
 #
-sys.path.append(bin_dir)
-sys.path.append(mta_dir)
+    for [name, elapsed, error, record] in results:
+        line = '%-8s %8.2f sec' % (name, elapsed)
+        if error != '':
+            line = line + '\tFAILED\n' + error
+        print(line)
+
+        for ent in record['stages']:
+            cpu = '     n/a'
+            if ent['cpu'] is not None:
+                cpu = '%8.2f' % ent['cpu']
+            print('    %-8s %8.2f sec %s cpu %10d rows %9d KB' \
+                    % (ent['stage'], ent['wall'], cpu, ent['rows'], ent['peak_rss_kb']))
 #
-#--- converTimeFormat contains MTA time conversion routines
+#--- save the measurements of the run
 #
-import convertTimeFormat    as tcnv
-import mta_common_functions as mcf
-import aorwspd_plot         as aor
-import grating_plot         as grat
-import sim_plot             as sim
+    modes = {0: 'serial', 1: 'processes', 2: 'threads'}
+    run   = {'start': run_start, 'mode': modes.get(parallel, 'serial'),  \
+             'wall': timeit.default_timer() - start, 'pipelines': [x[3] for x in results]}
+    try:
+        smon.write_log(run)
+    except:
+        print('cannot write the stage log: ' + smon.logfile)
+#
+#--- print the profile of the slowest stage of all pipelines
+#
+    if profile == 1:
+        print_slowest(results)
 
+    return results
 
 #-----------------------------------------------------------------------------------------
-#-- plot_sim_movement: read tsc and fa data and plot their cummulatinve movement        --
+#-- print_slowest: print the cProfile stats of the slowest stage                        --
 #-----------------------------------------------------------------------------------------
 
-def run_all_sim_script():
+def print_slowest(results):
+    """
+    print the cProfile stats of the slowest stage of all pipelines
+    input:  results --- a list of [name, elapsed time, error message, stage record]
+    output: printed stats
+    """
 
-    grat.plot_grat_movement()
-    sim.plot_sim_movement()
+    slow = None
+    for [name, elapsed, error, record] in results:
+        ent = smon.slowest_stage(record['stages'])
+        if record['profile'] != '' and (slow is None or ent['wall'] > slow[1]['wall']):
+            slow = [record, ent]
 
-    [year, month, day, hours, min, sec, weekday, yday, dst] = tcnv.currentTime()
-    month -= 1
-    if month < 1:
-        month = 12
-        year -= 1
+    if slow is None:
+        return
 
-    aor.plot_aorwspd(year, month)
+    [record, ent] = slow
+    print('\nslowest stage: %s %s (%.2f sec); stats saved in %s\n' \
+            % (record['pipeline'], ent['stage'], ent['wall'], record['profile']))
+    smon.print_profile(record['profile'])
 
 #-----------------------------------------------------------------------------------------
+#-- run_pipeline: run one of the plotting scripts                                       --
+#-----------------------------------------------------------------------------------------
+
+def run_pipeline(job):
+    """
+    run one of the plotting scripts
+    input:  job     --- [name, module name, function name, a list of arguments, profile]
+    output: [name, elapsed time in sec, error message ('' if none), stage record]
+    """
+
+    [name, mname, fname, args, profile] = job
 #
-#--- pylab plotting routine related modules
+#--- each stage of the script is measured; see stage_monitor
 #
+    smon.begin(name, profile)
 
-from pylab import *
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as font_manager
-import matplotlib.lines as lines
+    start = timeit.default_timer()
+    try:
+        module = sys.modules[mname]
+        getattr(module, fname)(*args)
+        error  = ''
+    except:
+        error  = traceback.format_exc()
+    elapsed = timeit.default_timer() - start
 
+    record = smon.end()
+    record['error'] = error != ''
 
-if __name__ == '__main__':
-
-    run_all_sim_script()
+    return [name, elapsed, error, record]
 
+#-----------------------------------------------------------------------------------------
 
+if __name__ == '__main__':
+#
+#--- "serial" as an argument runs the scripts one by one; "threads" runs them in
+#--- threads of this process. "--profile" prints the cProfile stats of the slowest stage
+#
+    args     = sys.argv[1:]
+    profile  = 0
+    if '--profile' in args:
+        profile = 1
+        args.remove('--profile')
+
+    parallel = 1
+    if len(args) == 1 and args[0] == 'serial':
+        parallel = 0
+    elif len(args) == 1 and args[0] == 'threads':
+        parallel = 2
+
+    results = run_all_sim_script(parallel, profile)
+
+    if len([x for x in results if x[2] != '']) > 0:
+        sys.exit(1)
 
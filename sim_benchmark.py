@@ -0,0 +1,450 @@
+#!/usr/bin/env /proj/sot/ska/bin/python
+
+#############################################################################################
+#                                                                                           #
+#       sim_benchmark.py:   time the data and plotting stages of the sim plot scripts       #
+#                                                                                           #
+#           author: t. isobe (tisobe@cfa.harvard.edu)                                       #
+#                                                                                           #
+#           last update: Oct 18, 2026                                                       #
+#                                                                                           #
+#############################################################################################
+
+import os
+import sys
+import re
+import json
+import shutil
+import tempfile
+import timeit
+import resource
+import multiprocessing
+import numpy
+import unittest
+
+import frac_year            as fyr
+import product_cache        as pcache
+import sim_plot             as sim
+import grating_plot         as grat
+import aorwspd_plot         as aor
+#
+#--- the sizes of the data at 1x; about the size of the production data
+#
+base_rows  = {'sim': 200000, 'grat': 4000, 'aorwspd': 200, 'samples': 8928}
+#
+#--- saved results; a stage is reported as a regression if its rows/s drops by more than
+#--- tolerance from the saved value. stages shorter than min_wall sec are too noisy to compare
+#
+baseline_file = '/data/mta/Script/Month/SIM/house_keeping/benchmark_baseline.json'
+tolerance     = 0.30
+min_wall      = 0.1
+#
+#--- the data and state files of the scripts set by set_paths: module, setting and file
+#--- name ('': the directory itself)
+#
+path_names    = [[sim,    'datafile',    'sim_data.out'],
+                 [sim,    'ckpfile',     'sim_checkpoint'],
+                 [sim,    'cachefile',   'sim_data.cache'],
+                 [sim,    'rollupfile',  'sim_day_rollup.db'],
+                 [sim,    'sortfile',    'sim_data.sorted'],
+                 [grat,   'datafile',    'OTG_sorted.rdb'],
+                 [grat,   'storefile',   'grat_store'],
+                 [grat,   'cachefile',   'grat_cache.npz'],
+                 [aor,    'datafile',    'monthly_avg'],
+                 [aor,    'dbfile',      'monthly_avg.db'],
+                 [pcache, 'product_dir', '']]
+
+#-----------------------------------------------------------------------------------------
+#-- run_benchmark: run all stages for each data size                                   ---
+#-----------------------------------------------------------------------------------------
+
+def run_benchmark(scales=[1, 10, 100], save=0):
+
+    """
+    run all stages for each data size, compare them with the baseline and print
+    input:  scales  --- a list of data sizes as multiples of base_rows
+            save    --- if 1, save the results as the new baseline
+    output: results --- a list of dictionaries of stage, scale, rows, wall (sec),
+                        rows_per_sec, peak_rss_kb and regression (1 if slower than
+                        the baseline)
+            baseline_file, if save == 1
+    """
+
+    baseline = read_baseline()
+    results  = []
+    for scale in scales:
+#
+#--- each size is run in a fresh process so that the peak rss is its own
+#
+        pool = multiprocessing.Pool(1)
+        out  = pool.apply(run_scale, (scale,))
+        pool.close()
+        pool.join()
+
+        for ent in out:
+            key  = '%s:%s' % (ent['stage'], scale)
+            ent['regression'] = 0
+            if key in baseline and ent['wall'] > min_wall \
+                    and ent['rows_per_sec'] < (1.0 - tolerance) * baseline[key]:
+                ent['regression'] = 1
+            results.append(ent)
+
+    for ent in results:
+        line = '%-16s %4dx %10d rows %9.3f sec %12.1f rows/s %9d KB' \
+                % (ent['stage'], ent['scale'], ent['rows'], ent['wall'], \
+                   ent['rows_per_sec'], ent['peak_rss_kb'])
+        if ent['regression'] == 1:
+            line = line + '\tREGRESSION'
+        print(line)
+
+    if save == 1:
+        for ent in results:
+            baseline['%s:%s' % (ent['stage'], ent['scale'])] = ent['rows_per_sec']
+        write_baseline(baseline)
+
+    return results
+
+#-----------------------------------------------------------------------------------------
+#-- run_scale: create data of the given size and time each stage                       ---
+#-----------------------------------------------------------------------------------------
+
+def run_scale(scale):
+
+    """
+    create data of the given size in a temp directory and time each stage
+    input:  scale   --- data size as a multiple of base_rows
+    output: a list of dictionaries of stage, scale, rows, wall, rows_per_sec, peak_rss_kb
+    """
+
+    wdir  = tempfile.mkdtemp(prefix='sim_bench_')
+    cwd   = os.getcwd()
+    saved = set_paths(wdir)
+    try:
+        os.chdir(wdir)
+
+        nsim  = base_rows['sim']     * scale
+        ngrat = base_rows['grat']    * scale
+        nmon  = base_rows['aorwspd'] * scale
+        nsamp = base_rows['samples'] * scale
+
+        make_sim_data(sim.datafile, nsim)
+        make_grat_data(grat.datafile, ngrat)
+        [year, month] = make_monthly_avg(aor.datafile, nmon)
+        samples = make_samples(nsamp)
+
+        out = []
+#
+#--- sim: read/parse into the cache, bin, plot
+#
+        out.append(time_stage('sim.cache',  scale, nsim,  sim.update_sim_cache))
+        sdata = []
+        out.append(time_stage('sim.bin',    scale, nsim,  lambda: sdata.extend(sim.get_sim_data())))
+        out.append(time_stage('sim.render', scale, len(sdata[0]), lambda: sim.plot_steps(*sdata)))
+#
+#--- grating: read/parse into the cache, bin, plot
+#
+        out.append(time_stage('grat.cache', scale, ngrat, grat.update_grat_cache))
+        gdata = []
+        out.append(time_stage('grat.bin',   scale, ngrat, lambda: gdata.extend(grat.get_grat_data())))
+        out.append(time_stage('grat.render', scale, len(gdata[0]), \
+                   lambda: [grat.plot_steps(*gdata[0:5]), grat.plot_cum_grating(gdata[0], gdata[5], gdata[7])]))
+#
+#--- aorwspd: read the database, monthly sums of 5 min samples, plot
+#
+        adata = []
+        out.append(time_stage('aorwspd.read',   scale, nmon,  \
+                   lambda: adata.extend(aor.read_data(year, month))))
+        out.append(time_stage('aorwspd.sum',    scale, nsamp, lambda: aor.monthly_sums(samples)))
+        out.append(time_stage('aorwspd.render', scale, nmon,  lambda: aor.plot_data(*adata)))
+
+        return out
+
+    finally:
+        os.chdir(cwd)
+        restore_paths(saved)
+        shutil.rmtree(wdir, ignore_errors=True)
+
+#-----------------------------------------------------------------------------------------
+#-- time_stage: run a stage and measure it                                             ---
+#-----------------------------------------------------------------------------------------
+
+def time_stage(stage, scale, rows, func):
+
+    """
+    run a stage and measure it
+    input:  stage   --- name of the stage
+            scale   --- data size
+            rows    --- the number of rows processed
+            func    --- the function to run
+    output: a dictionary of stage, scale, rows, wall, rows_per_sec, peak_rss_kb
+    """
+
+    start = timeit.default_timer()
+    func()
+    wall  = timeit.default_timer() - start
+
+    out = {'stage': stage, 'scale': scale, 'rows': rows, 'wall': wall}
+    out['rows_per_sec'] = rows / max(wall, 1.0e-9)
+    out['peak_rss_kb']  = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return out
+
+#-----------------------------------------------------------------------------------------
+#-- set_paths: point the data and state files of the scripts to a directory            ---
+#-----------------------------------------------------------------------------------------
+
+def set_paths(wdir):
+
+    """
+    point the data and state files of the scripts to a directory
+    input:  wdir    --- directory
+    output: updated module settings of sim_plot, grating_plot, aorwspd_plot and
+            product_cache
+            saved   --- the settings before; pass it to restore_paths
+    """
+
+    saved = [[mod, name, getattr(mod, name)] for [mod, name, fname] in path_names]
+
+    for [mod, name, fname] in path_names:
+        setattr(mod, name, os.path.join(wdir, fname))
+
+    return saved
+
+#-----------------------------------------------------------------------------------------
+#-- restore_paths: put back the settings changed by set_paths                           ---
+#-----------------------------------------------------------------------------------------
+
+def restore_paths(saved):
+
+    """
+    put back the settings changed by set_paths
+    input:  saved   --- the list given by set_paths
+    output: module settings of sim_plot, grating_plot, aorwspd_plot and product_cache
+    """
+
+    for [mod, name, value] in saved:
+        setattr(mod, name, value)
+
+#-----------------------------------------------------------------------------------------
+#-- make_sim_data: create a sim_data.out like file                                     ---
+#-----------------------------------------------------------------------------------------
+
+def make_sim_data(fname, rows):
+
+    """
+    create a sim_data.out like file: <yyyy>:<ddd>:<hh>:<mm>:<ss.sss> <tsc> <fa>
+    input:  fname   --- output file name
+            rows    --- the number of lines
+    output: fname
+    """
+
+    rng  = numpy.random.RandomState(rows)
+    time = numpy.sort(rng.uniform(2000.0, 2014.0, rows))
+    [year, ydate, hours, mins, secs] = split_time(time)
+#
+#--- tsc/fa move in steps; some lines repeat the previous position
+#
+    tsc  = numpy.cumsum(rng.randint(-2000, 2001, rows) * (rng.uniform(size=rows) > 0.1))
+    fa   = numpy.cumsum(rng.randint(-500,  501,  rows) * (rng.uniform(size=rows) > 0.1))
+
+    fo   = open(fname, 'w')
+    for k in range(0, rows, 100000):
+        part = zip(year[k:k+100000], ydate[k:k+100000], hours[k:k+100000], mins[k:k+100000], \
+                   secs[k:k+100000], tsc[k:k+100000], fa[k:k+100000])
+        fo.write(''.join(['%d:%03d:%02d:%02d:%06.3f\t%d\t%d\n' % ent for ent in part]))
+    fo.close()
+
+#-----------------------------------------------------------------------------------------
+#-- make_grat_data: create an OTG_sorted.rdb like file                                 ---
+#-----------------------------------------------------------------------------------------
+
+def make_grat_data(fname, rows):
+
+    """
+    create an OTG_sorted.rdb like file: direction, grating, start and stop time in
+    <yyyy><ddd>.<hh><mm><ss> and hposa/hposb/fposa/fposb in the columns 18-21
+    input:  fname   --- output file name
+            rows    --- the number of lines
+    output: fname
+    """
+
+    rng   = numpy.random.RandomState(rows)
+    start = numpy.sort(rng.uniform(2000.0, 2014.0, rows))
+    stop  = start + 0.0001
+
+    fo    = open(fname, 'w')
+    fo.write('\t'.join(['DIRN', 'GRATING', 'START_TIME', 'START_VCDU', 'STOP_TIME'] \
+                     + ['COL%d' % k for k in range(5, 18)]                          \
+                     + ['HPOSA', 'HPOSB', 'FPOSA', 'FPOSB']) + '\n')
+
+    [y1, d1, h1, m1, s1] = split_time(start)
+    [y2, d2, h2, m2, s2] = split_time(stop)
+    direct  = rng.randint(0, 2, rows)
+    grating = rng.randint(0, 2, rows)
+    for k in range(0, rows):
+        if direct[k] == 0:
+            angle = [rng.uniform(6.0, 9.0), rng.uniform(6.0, 9.0)]
+        else:
+            angle = [rng.uniform(77.0, 80.0), rng.uniform(77.0, 80.0)]
+
+        line = ['INSR' if direct[k] == 0 else 'RETR', 'HETG' if grating[k] == 0 else 'LETG', \
+                '%d%03d.%02d%02d%02d' % (y1[k], d1[k], h1[k], m1[k], int(s1[k])), '0',        \
+                '%d%03d.%02d%02d%02d' % (y2[k], d2[k], h2[k], m2[k], int(s2[k]))]             \
+             + ['0'] * 13 + ['%.4f' % angle[0], '%.4f' % angle[1], '%.4f' % angle[0], '%.4f' % angle[1]]
+        fo.write('\t'.join(line) + '\n')
+    fo.close()
+
+#-----------------------------------------------------------------------------------------
+#-- make_monthly_avg: create a monthly_avg like file                                   ---
+#-----------------------------------------------------------------------------------------
+
+def make_monthly_avg(fname, months):
+
+    """
+    create a monthly_avg like file: <yyyy>.<mm> <av1> ... <av6>, one line a month from 1999
+    input:  fname   --- output file name
+            months  --- the number of lines
+    output: fname
+            [year, month]   --- the last month
+    """
+
+    rng  = numpy.random.RandomState(months)
+    vals = rng.uniform(4000.0, 7000.0, (months, 6))
+
+    fo   = open(fname, 'w')
+    for k in range(0, months):
+        year  = 1999 + k // 12
+        month = k % 12 + 1
+        fo.write(aor.mstore.format_line(year, month, vals[k].tolist()))
+    fo.close()
+
+    return [year, month]
+
+#-----------------------------------------------------------------------------------------
+#-- make_samples: create 5 min samples of aorwspd1-6                                   ---
+#-----------------------------------------------------------------------------------------
+
+def make_samples(rows):
+
+    """
+    create 5 min samples of aorwspd1-6
+    input:  rows    --- the number of samples
+    output: numpy array of (rows, 6)
+    """
+
+    rng = numpy.random.RandomState(rows)
+
+    return rng.uniform(-300.0, 300.0, (rows, 6))
+
+#-----------------------------------------------------------------------------------------
+#-- split_time: split fractional year into year, ydate, hours, mins and secs           ---
+#-----------------------------------------------------------------------------------------
+
+def split_time(time):
+
+    """
+    split fractional year into year, ydate, hours, mins and secs
+    input:  time    --- numpy array of fractional year
+    output: [year, ydate, hours, mins, secs]   --- numpy arrays
+    """
+
+    year  = numpy.floor(time).astype(int)
+    days  = (time - year) * fyr.year_base[year]
+    ydate = numpy.floor(days).astype(int) + 1
+    secs  = (days - numpy.floor(days)) * 86400.0
+    hours = (secs // 3600).astype(int)
+    mins  = ((secs - hours * 3600) // 60).astype(int)
+    secs  = secs - hours * 3600 - mins * 60
+
+    return [year, ydate, hours, mins, secs]
+
+#-----------------------------------------------------------------------------------------
+#-- read_baseline: read the saved results                                              ---
+#-----------------------------------------------------------------------------------------
+
+def read_baseline():
+
+    """
+    read the saved results
+    input:  none, but read from baseline_file
+    output: a dictionary of <stage>:<scale> : rows/s
+    """
+
+    try:
+        f   = open(baseline_file, 'r')
+        out = json.load(f)
+        f.close()
+    except:
+        out = {}
+
+    return out
+
+#-----------------------------------------------------------------------------------------
+#-- write_baseline: save the results                                                   ---
+#-----------------------------------------------------------------------------------------
+
+def write_baseline(baseline):
+
+    """
+    save the results
+    input:  baseline    --- a dictionary of <stage>:<scale> : rows/s
+    output: baseline_file
+    """
+
+    tmp = baseline_file + '~'
+    fo  = open(tmp, 'w')
+    json.dump(baseline, fo, indent=1, sort_keys=True)
+    fo.close()
+    os.rename(tmp, baseline_file)
+
+#-----------------------------------------------------------------------------------------
+#-- TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST    ---
+#-----------------------------------------------------------------------------------------
+
+class TestFunctions(unittest.TestCase):
+    """
+    testing functions
+    """
+#------------------------------------------------------------
+
+    def test_fixtures(self):
+
+        wdir  = tempfile.mkdtemp(prefix='ztest_bench_')
+        saved = set_paths(wdir)
+        try:
+            make_sim_data(sim.datafile, 100)
+            [time, tsc, fa, noffset] = list(sim.read_sim_chunks())[-1]
+            self.assertEquals(noffset, os.path.getsize(sim.datafile))
+            self.assertEquals(numpy.all((time > 2000) & (time < 2015)), True)
+
+            make_grat_data(grat.datafile, 50)
+            out = grat.read_grat_data()
+            self.assertEquals(len(out[0]), 50)
+
+            self.assertEquals(make_monthly_avg(aor.datafile, 13), [2000, 1])
+        finally:
+            restore_paths(saved)
+            shutil.rmtree(wdir)
+
+        self.assertEquals(sim.datafile.startswith(wdir), False)
+        self.assertEquals(pcache.product_dir, saved[-1][2])
+
+#-----------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+#
+#--- "run" times the stages; "save" also saves the results as the baseline. the data sizes
+#--- (multiples of base_rows) may follow, e.g. run 1 10
+#
+    if len(sys.argv) > 1 and sys.argv[1] in ['run', 'save']:
+        scales = [int(x) for x in sys.argv[2:]]
+        if len(scales) == 0:
+            scales = [1, 10, 100]
+
+        save    = 1 if sys.argv[1] == 'save' else 0
+        results = run_benchmark(scales, save)
+
+        if len([x for x in results if x['regression'] == 1]) > 0:
+            sys.exit(1)
+    else:
+        unittest.main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env /proj/sot/ska/bin/python
+
+#############################################################################################
+#                                                                                           #
+#       sim_config.py:  directory settings and mta modules shared by the sim scripts        #
+#                                                                                           #
+#           author: t. isobe (tisobe@cfa.harvard.edu)                                       #
+#                                                                                           #
+#           last update: Oct 18, 2026                                                       #
+#                                                                                           #
+#############################################################################################
+
+import os
+import sys
+import re
+import threading
+import unittest
+
+#
+#--- directory list; each line is: <python expression of the value> : <variable name>
+#
+dir_list = '/data/mta/Script/Month/SIM/house_keeping/dir_list_py'
+
+#-----------------------------------------------------------------------------------------
+#-- SimConfig: directory settings read from the directory list                          --
+#-----------------------------------------------------------------------------------------
+
+class SimConfig(object):
+    """
+    directory settings read from the directory list. the list is read only once,
+    when one of the settings is used for the first time, e.g. config.bin_dir
+    """
+
+    def __init__(self, path):
+
+        self.path   = path
+        self.loaded = 0
+        self.lock   = threading.Lock()
+
+#------------------------------------------------------------
+
+    def load(self):
+        """
+        read the directory list and add bin_dir and mta_dir to the python path
+        input:  none, but read from self.path
+        output: the settings as attributes of this object
+        """
+
+        if self.loaded == 1:
+            return self
+#
+#--- the plot scripts may be run in threads; read the list only once
+#
+        self.lock.acquire()
+        try:
+            if self.loaded == 0:
+                self.read_list()
+        finally:
+            self.lock.release()
+
+        return self
+
+#------------------------------------------------------------
+
+    def read_list(self):
+        """
+        read the directory list
+        input:  none, but read from self.path
+        output: the settings as attributes of this object
+        """
+
+        f    = open(self.path, 'r')
+        data = [line.strip() for line in f.readlines()]
+        f.close()
+
+        for ent in data:
+            if ent == '':
+                continue
+            atemp = re.split(':', ent)
+            var  = atemp[1].strip()
+            line = atemp[0].strip()
+            setattr(self, var, eval(line))
+#
+#--- append a path to a private folder to python directory
+#
+        for name in ['bin_dir', 'mta_dir']:
+            if name in self.__dict__ and self.__dict__[name] not in sys.path:
+                sys.path.append(self.__dict__[name])
+
+        self.loaded = 1
+
+#------------------------------------------------------------
+
+    def __getattr__(self, name):
+#
+#--- this is called only when the attribute is not set yet
+#
+        if name.startswith('__') or self.__dict__.get('loaded', 1) == 1:
+            raise AttributeError(name)
+
+        self.load()
+
+        return getattr(self, name)
+
+#-----------------------------------------------------------------------------------------
+#-- LazyModule: a module which is imported when it is used for the first time          ---
+#-----------------------------------------------------------------------------------------
+
+class LazyModule(object):
+    """
+    a module which is imported when it is used for the first time. the directory
+    list is read before the import, so that mta modules in bin_dir/mta_dir are found
+    """
+
+    def __init__(self, name):
+
+        self.__dict__['_name']   = name
+        self.__dict__['_module'] = None
+
+#------------------------------------------------------------
+
+    def __getattr__(self, attr):
+
+        if attr.startswith('__'):
+            raise AttributeError(attr)
+
+        if self._module is None:
+            config.load()
+            self.__dict__['_module'] = __import__(self._name)
+
+        return getattr(self._module, attr)
+
+#-----------------------------------------------------------------------------------------
+#-- lazy_import: give a module which is imported when it is used for the first time    ---
+#-----------------------------------------------------------------------------------------
+
+def lazy_import(name):
+
+    """
+    give a module which is imported when it is used for the first time
+    input:  name    --- module name, e.g. 'convertTimeFormat'
+    output: LazyModule object
+    """
+
+    return LazyModule(name)
+
+#
+#--- the settings shared by all scripts
+#
+config = SimConfig(dir_list)
+
+#-----------------------------------------------------------------------------------------
+#-- TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST    ---
+#-----------------------------------------------------------------------------------------
+
+class TestFunctions(unittest.TestCase):
+    """
+    testing functions
+    """
+#------------------------------------------------------------
+
+    def test_sim_config(self):
+
+        tfile = '/tmp/ztest_dir_list'
+        fo    = open(tfile, 'w')
+        fo.write("'/tmp/ztest_bin/'   : bin_dir\n")
+        fo.write("'/tmp/ztest_mta/'   : mta_dir\n")
+        fo.close()
+
+        conf = SimConfig(tfile)
+        self.assertEquals(conf.loaded, 0)
+        self.assertEquals(conf.bin_dir, '/tmp/ztest_bin/')
+        self.assertEquals(conf.loaded, 1)
+        self.assertTrue('/tmp/ztest_mta/' in sys.path)
+
+        os.remove(tfile)
+        sys.path.remove('/tmp/ztest_bin/')
+        sys.path.remove('/tmp/ztest_mta/')
+
+#------------------------------------------------------------
+
+    def test_lazy_import(self):
+
+        save          = config.loaded
+        config.loaded = 1                   #--- do not read the directory list
+
+        mod = lazy_import('string')
+        self.assertEquals(mod._module, None)
+        self.assertEquals(mod.digits, '0123456789')
+
+        config.loaded = save
+
+#-----------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    unittest.main()
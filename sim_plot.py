@@ -15,63 +15,89 @@ import sys
 import re
 import string
 import math
+import hashlib
+import shutil
+import tempfile
 import numpy
+import multiprocessing
 import unittest
-
-import matplotlib as mpl
-
-if __name__ == '__main__':
-
-    mpl.use('Agg')
-
-from pylab import *
-import matplotlib.pyplot       as plt
-import matplotlib.font_manager as font_manager
-import matplotlib.lines        as lines
 #
-#--- reading directory list
+#--- the directory list is read and the mta modules are imported when they are first used,
+#--- so that the data functions can be imported without the directory list or matplotlib
 #
-path = '/data/mta/Script/Month/SIM/house_keeping/dir_list_py'
-
-f    = open(path, 'r')
-data = [line.strip() for line in f.readlines()]
-f.close()
-
-for ent in data:
-    atemp = re.split(':', ent)
-    var  = atemp[1].strip()
-    line = atemp[0].strip()
-    exec "%s = %s" %(var, line)
+import sim_config
+tcnv = sim_config.lazy_import('convertTimeFormat')     #--- MTA time conversion routines
+mcf  = sim_config.lazy_import('mta_common_functions')
+import frac_year            as fyr
+import product_cache        as pcache
+import sim_render           as srender
+import stage_monitor        as smon
+import time_bins            as tbin
+import day_rollup           as droll
+import sim_sort             as ssort
 
+datafile = "/home/brad/Tscpos/sim_data.out"
+datafile = "/data/mta_www/mta_sim/Scripts/sim_data.out"
 #
-#--- append a path to a private folder to python directory
+#--- the state of the last run; used to read only newly appended data
 #
-sys.path.append(bin_dir)
-sys.path.append(mta_dir)
+ckpfile  = '/data/mta/Script/Month/SIM/house_keeping/sim_checkpoint'
 #
-#--- converTimeFormat contains MTA time conversion routines
+#--- binary cache of the data file: fractional year time, tsc and fa as float64 columns.
+#--- cachefile + '.info' keeps the state of the data file at the last update
 #
-import convertTimeFormat    as tcnv
-import mta_common_functions as mcf
-
-datafile = "/home/brad/Tscpos/sim_data.out"
-datafile = "/data/mta_www/mta_sim/Scripts/sim_data.out"
+cachefile   = '/data/mta/Script/Month/SIM/house_keeping/sim_data.cache'
+cache_dtype = numpy.dtype([('time', '<f8'), ('tsc', '<f8'), ('fa', '<f8')])
+#
+#--- new parts of the data file larger than parse_bytes are parsed in parse_workers 
+#--- processes (0: the number of cores), a byte range of about range_bytes at a time
+#
+parse_workers = 0
+parse_bytes   = 32 * 1024 * 1024
+range_bytes   = 8  * 1024 * 1024
+#
+#--- per-day sums of the movement of the cached samples; see day_rollup
+#
+rollupfile  = '/data/mta/Script/Month/SIM/house_keeping/sim_day_rollup.db'
+#
+#--- the cached samples sorted by time without duplicates, made when the data go back 
+#--- in time; sortfile + '.info' keeps the number of the cached samples in it
+#
+sortfile    = '/data/mta/Script/Month/SIM/house_keeping/sim_data.sorted'
+#
+#--- schema version of the saved monthly data (time, tsc, fa); see product_cache
+#
+product_schema = 1
 
 #-----------------------------------------------------------------------------------------
 #-- plot_sim_movement: read tsc and fa data and plot their cummulatinve movement        --
 #-----------------------------------------------------------------------------------------
 
-def plot_sim_movement():
+def plot_sim_movement(replot=0):
 
     """
     read tsc and fa data and plot their cummulatinve movement
-    input: none
+    input:  replot  --- if 1, plot the data saved by the last run, if there is
     output: monthly_sim.png
+            the computed data are saved in the product file (see product_cache)
     """
 #
+#--- read the saved data
+#
+    data = None
+    if replot == 1:
+        data = pcache.read_product('sim', product_schema)
+
+    if data is not None:
+        [time, month_tsc_mm, month_fa_mm] = [data['time'], data['tsc'], data['fa']]
+    else:
+#
 #--- read data
 #
-    [time, month_tsc_mm, month_fa_mm] = get_sim_data()
+        [time, month_tsc_mm, month_fa_mm] = get_sim_data()
+
+        pcache.write_product('sim', product_schema, \
+                             {'time': time, 'tsc': month_tsc_mm, 'fa': month_fa_mm})
 #
 #--- plot data
 #
@@ -85,110 +111,871 @@ def plot_sim_movement():
 def get_sim_data():
 
     """
-    read data and compute tsc and fa values
-    input: none, but read from /data/mta_www/mta_sim/Scripts/sim_data.out
+    read data and compute tsc and fa values. the data are read from the binary cache
+    of the data file, and only the samples added since the last run are binned; the 
+    finalized monthly values are kept in the checkpoint
+    input: none, but read from /data/mta_www/mta_sim/Scripts/sim_data.out, cachefile
+           and ckpfile
     output: [avg_time, month_tsc_mm, month_fa_mm]
                 avg_time     --- fractional year
                 month_tsc_mm --- TSC value in 1.0e-4 mm size
                 month_fa_mm  --- FA value in mm size
     """
+#
+#--- create start and end time list of monthly bins
+#
+    t_list         = tcnv.currentTime()
+    [blist, elist] =  create_monthly_bins(2000, t_list[0], t_list[1])
+#
+#--- bring the cache up to date with the data file
+#
+    update_sim_cache()
+#
+#--- the samples are binned from the sorted copy of the cache without duplicates
+#
+    data = sort_sim_cache(open_sim_cache())
+#
+#--- read the checkpoint; it keeps the number of the sorted samples already binned
+#
+    [offset, last, base, final] = read_checkpoint()
 
+    if len(data) < offset:
+        [offset, last, base, final] = [0, [], [0.0, 0.0], []]
 #
-#--- get data
+#--- the samples at or after the end of the last bin are left for the next run; the data
+#--- file is in UTC while the bins end at the current month of the local time
 #
-    f    = open(datafile, 'r')
-    data = [line.strip() for line in f.readlines()]
-    f.close()
+    stop = len(data)
+    if len(elist) > 0:
+        stop = max(offset, int(numpy.searchsorted(data['time'], elist[-1], side='left')))
+#
+#--- if the per-day sums end at the same sample as the checkpoint, the chunks sorted
+#--- for the bins are added to them as well
+#
+    store  = droll.DayRollup(rollupfile)
+    rollup = None
+    if store.state() == [offset, list(last)]:
+        rollup = store
+
+    token = smon.start('bin')
+    try:
+        [avg_time, month_tsc_mm, month_fa_mm, nlast] \
+                    = fold_sim_data(data[:stop], offset, last, base, blist, elist, rollup=rollup)
+    finally:
+        store.close()
+#
+#--- bring the per-day sums up to date with the cache, if they are not yet
+#
+    update_sim_rollup(data)
+    smon.stop(token, stop - offset)
+#
+#--- the finalized months are taken from the checkpoint
+#
+    nfin = min(len(final), len(blist))
+    for j in range(0, nfin):
+        month_tsc_mm[j] = final[j][0]
+        month_fa_mm[j]  = final[j][1]
+#
+#--- save the new checkpoint; a month is finalized once a sample after its end is read
+#
+    if len(nlast) > 0:
+        nfin = numpy.searchsorted(numpy.array(elist), nlast[0], side='right')
+        if len(blist) > 0:
+            base = [month_tsc_mm[-1], month_fa_mm[-1]]
+        final = [[month_tsc_mm[j], month_fa_mm[j]] for j in range(0, nfin)]
+
+        write_checkpoint(stop, nlast, base, final)
+
+    return [avg_time, month_tsc_mm, month_fa_mm]
+
+#-----------------------------------------------------------------------------------------
+#-- fold_sim_data: add the movement of the cached samples after the given one to the bins 
+#-----------------------------------------------------------------------------------------
+
+def fold_sim_data(data, offset, last, base, blist, elist, chunk=100000, rollup=None):
+
+    """
+    add the movement of the cached samples after the given one to the bins. the samples
+    are binned a chunk at a time, so that the memory use does not grow with the data
+    input:  data    --- the sorted samples; see sort_sim_cache
+            offset  --- the index of the first sample to bin
+            last    --- [time, tsc, fa] of the sample just before offset; [] if none
+            base    --- [tsc, fa] cumulative values at that sample
+            blist   --- a list of bin starting time
+            elist   --- a list of bin stopping time
+            chunk   --- the number of samples to bin at a time; 0 bins all at once
+            rollup  --- day_rollup.DayRollup object which ends at the same sample;
+                        if given, each chunk is added to it, too
+    output: [avg_time, month_tsc_mm, month_fa_mm, last]
+                avg_time     --- fractional year
+                month_tsc_mm --- TSC value in 1.0e-4 mm size
+                month_fa_mm  --- FA value in mm size
+                last         --- [time, tsc, fa] of the last sample
+            ValueError is raised if a chunk goes back before the samples already binned
+    """
+
+    blen         = len(blist)
+    edges        = numpy.array(list(blist) + elist[-1:], dtype=numpy.float64)
+    avg_time     = [0 for x in range(0, blen)]
+    for j in range(1, blen):
+        avg_time[j] = 0.5 *  (blist[j] + elist[j])
+    month_tsc_mm = [base[0] for x in range(0, blen)]
+    month_fa_mm  = [base[1] for x in range(0, blen)]
+
+    if chunk <= 0:
+        chunk = max(1, len(data) - offset)
+
+    for k in range(offset, len(data), chunk):
+        [time, tsc_mm, fa_mm] = sort_sim_chunk(data[k:k+chunk])
+        if len(last) > 0 and time[0] < last[0]:
+            raise ValueError('sim data are not in time order')
 
-    time   = []
-    tsc_mm = []
-    fa_mm  = []
-    prev   = ''
-    for ent in data:
+        if rollup is not None:
+            rollup.add(time, tsc_mm, fa_mm, last, k + len(time))
 #
-#--- skip the data line which is same as one before
+#--- the last sample of the previous chunk is needed to get the movement of the first 
+#--- sample of this chunk
 #
-##        if ent == prev:
-##            continue
-##        else:
-##            prev = ent
+        if len(last) > 0:
+            time   = numpy.concatenate([[last[0]], time])
+            tsc_mm = numpy.concatenate([[last[1]], tsc_mm])
+            fa_mm  = numpy.concatenate([[last[2]], fa_mm])
 
-        atemp = re.split('\s+', ent)
-        try:
-            if float(atemp[1]) == 0 and float(atemp[2]) == 0:
-                continue
-        except:
-            continue
+        [atime, ctsc, cfa] = bin_cumulative(time, tsc_mm, fa_mm, blist, elist, base)
 #
-#--- converting time to fractional year
+#--- the bins before this chunk keep the values from the earlier chunks
 #
-        try:
-            time.append(convert_time(atemp[0]))
-        except:
-            continue
+        j = max(0, tbin.bin_index(edges, time[0]))
+        month_tsc_mm[j:] = ctsc[j:]
+        month_fa_mm[j:]  = cfa[j:]
+
+        last = [time[-1], tsc_mm[-1], fa_mm[-1]]
+        if blen > 0:
+            base = [month_tsc_mm[-1], month_fa_mm[-1]]
+
+    return [avg_time, month_tsc_mm, month_fa_mm, last]
+
+#-----------------------------------------------------------------------------------------
+#-- update_sim_rollup: add the cached samples not in the per-day sums yet              ---
+#-----------------------------------------------------------------------------------------
+
+def update_sim_rollup(data, chunk=100000):
+
+    """
+    add the sorted samples not in the per-day sums yet, a chunk at a time
+    input:  data    --- the sorted samples; see sort_sim_cache
+            chunk   --- the number of samples to add at a time
+    output: rollupfile updated
+            return the number of samples added
+    """
+
+    store = droll.DayRollup(rollupfile)
+    try:
+        [offset, last] = store.state()
+        if offset > len(data):
+            store.clear()
+            [offset, last] = [0, []]
+
+        for k in range(offset, len(data), chunk):
+            [time, tsc_mm, fa_mm] = sort_sim_chunk(data[k:k+chunk])
+            store.add(time, tsc_mm, fa_mm, last, k + len(time))
+            last = [time[-1], tsc_mm[-1], fa_mm[-1]]
+    finally:
+        store.close()
+
+    return len(data) - offset
+
+#-----------------------------------------------------------------------------------------
+#-- get_rollup_bins: build cumulative tsc and fa movement of bins from the per-day sums  -
+#-----------------------------------------------------------------------------------------
+
+def get_rollup_bins(blist, elist):
+
+    """
+    build cumulative tsc and fa movement of bins from the per-day sums
+    input:  blist   --- a list of bin starting time; see day_rollup.bin_days
+            elist   --- a list of bin stopping time
+    output: [avg_time, bin_tsc_mm, bin_fa_mm]; see bin_cumulative
+    """
+
+    store = droll.DayRollup(rollupfile)
+    try:
+        days = store.days()
+    finally:
+        store.close()
+
+    return droll.bin_days(days, blist, elist)
+
+#-----------------------------------------------------------------------------------------
+#-- get_sim_bins: compute cumulative tsc and fa movement in bins of a resolution       ---
+#-----------------------------------------------------------------------------------------
+
+def get_sim_bins(resolution):
+
+    """
+    compute cumulative tsc and fa movement in bins of a resolution from 2000 to the
+    current month, built from the per-day sums. the cache and the per-day sums are 
+    updated first
+    input:  resolution  --- 'monthly', 'weekly', 'daily' or a bin width in days
+    output: [avg_time, bin_tsc_mm, bin_fa_mm]; see bin_cumulative
+    """
+
+    update_sim_cache()
+    update_sim_rollup(sort_sim_cache(open_sim_cache()))
+
+    t_list = tcnv.currentTime()
+    edges  = tbin.bin_edges(resolution, 2000, t_list[0], t_list[1])
+
+    return get_rollup_bins(*tbin.edge_lists(edges))
+
+#-----------------------------------------------------------------------------------------
+#-- print_rollup: print cumulative tsc and fa movement in bins of the given days       ---
+#-----------------------------------------------------------------------------------------
+
+def print_rollup(resolution):
+
+    """
+    print cumulative tsc and fa movement in bins of the given resolution from 2000, 
+    built from the per-day sums
+    input:  resolution  --- 'monthly', 'weekly', 'daily' or a bin width in days
+    output: printed <mid time>\t<tsc in 1.0e4 mm>\t<fa in mm> of each bin
+    """
+
+    [avg_time, bin_tsc_mm, bin_fa_mm] = get_sim_bins(resolution)
+
+    for k in range(1, len(avg_time)):
+        print('%.6f\t%.6f\t%.6f' % (avg_time[k], bin_tsc_mm[k], bin_fa_mm[k]))
+
+#-----------------------------------------------------------------------------------------
+#-- sort_sim_cache: give the cached samples sorted by time without duplicates          ---
+#-----------------------------------------------------------------------------------------
+
+def sort_sim_cache(data):
+
+    """
+    give the cached samples sorted by time without duplicate lines. the samples added
+    to the cache since the last run are added to the end of sortfile; if some of them
+    go back before its end, the entire cache is sorted again out of memory (see sim_sort)
+    and the checkpoint and the per-day sums, which are made from sortfile, are removed
+    input:  data    --- the cached samples; see open_sim_cache
+    output: numpy memmap of the sorted samples in sortfile
+            sortfile + '.info' keeps the number of the cached samples in sortfile and
+            the number of the sorted samples
+    """
+
+    [rows, nrec] = [-1, 0]
+    try:
+        f    = open(sortfile + '.info', 'r')
+        info = f.read().split()
+        f.close()
+        [rows, nrec] = [int(info[1]), int(info[3])]
+    except:
+        pass
+
+    if rows > len(data) or not os.path.isfile(sortfile):
+        [rows, nrec] = [-1, 0]
+
+    if rows != len(data):
+        token = smon.start('sort')
+        nadd  = -1
+        if rows >= 0:
+            nadd = ssort.append_records(data[rows:], sortfile, nrec)
+
+        if nadd >= 0:
+            nrec += nadd
+        else:
 #
-#--- computing TSC value
+#--- the sorted samples are made again from the beginning; in time order, they are just
+#--- added to an empty file
 #
-        try:
-            tval = float(atemp[1])
-            tsc_mm.append(-0.0025143153 * tval)
-        except:
-            tsc_mm.append(0.0)
+            mcf.rm_file(sortfile + '.info')
+            mcf.rm_file(ckpfile)
+            mcf.rm_file(rollupfile)
+
+            nrec = ssort.append_records(data, sortfile, 0)
+            if nrec < 0:
+                nrec = ssort.sort_records(data, sortfile)
+        smon.stop(token, len(data) - max(rows, 0))
+
+        tmp = sortfile + '.info~'
+        fo  = open(tmp, 'w')
+        fo.write('rows\t' + str(len(data)) + '\nrecords\t' + str(nrec) + '\n')
+        fo.close()
+        os.rename(tmp, sortfile + '.info')
+
+    if nrec == 0:
+        return numpy.zeros(0, dtype=cache_dtype)
+
+    return numpy.memmap(sortfile, dtype=cache_dtype, mode='r', shape=(nrec,))
+
+#-----------------------------------------------------------------------------------------
+#-- sort_sim_chunk: convert a chunk of cached samples to mm and sort it by time        ---
+#-----------------------------------------------------------------------------------------
+
+def sort_sim_chunk(data):
+
+    """
+    convert a chunk of cached samples to mm and sort it by time
+    input:  data    --- a slice of the cached samples; see open_sim_cache
+    output: [time, tsc_mm, fa_mm] numpy arrays sorted by time
+                time    --- time in fractional year
+                tsc_mm  --- TSC position in mm
+                fa_mm   --- FA position in mm
+    """
+
+    time           = numpy.array(data['time'], dtype=numpy.float64)
+    tsc_mm         = -0.0025143153 * numpy.array(data['tsc'], dtype=numpy.float64)
 #
-#--- computing FA value
+#--- math.pow is kept here; numpy.power can differ from it in the last digit. it is given
+#--- python floats, which are much faster to pass than the elements of a memmap
 #
-        try:
-            fval = float(atemp[2])
-            fa_mm.append(compute_fa_val(fval))
-        except:
-            fa_mm.append(0.0)
+    fa_list        = numpy.array(data['fa'], dtype=numpy.float64).tolist()
+    fa_mm          = numpy.array([compute_fa_val(x) for x in fa_list], dtype=numpy.float64)
 #
-#--- sort the list according to time
+#--- a stable sort; the samples of the same time keep their order in the sorted file
 #
-    sorted_index   = numpy.argsort(time)
-    time           = [time[i]   for i in sorted_index]
-    tsc_mm         = [tsc_mm[i] for i in sorted_index]
-    fa_mm          = [fa_mm[i]  for i in sorted_index]
+    sorted_index   = numpy.argsort(time, kind='mergesort')
+
+    return [time[sorted_index], tsc_mm[sorted_index], fa_mm[sorted_index]]
+
+#-----------------------------------------------------------------------------------------
+#-- update_sim_cache: append the new part of the data file to the binary cache         ---
+#-----------------------------------------------------------------------------------------
+
+def update_sim_cache():
+
+    """
+    append the new part of the data file to the binary cache. if the cache is stale
+    (the data file is rewritten, not appended to), it is rebuilt from the beginning
+    input:  none, but read from datafile, cachefile and cachefile + '.info'
+    output: cachefile and cachefile + '.info' updated
+            return the number of samples in the cache
+    """
+
+    [status, [fsize, mtime, offset, rows, tail]] = check_sim_cache()
+
+    if status == 'current':
+        return rows
+
+    if status == 'stale':
+        offset = 0
+        rows   = 0
 #
-#--- create start and end time list of monthly bins
+#--- the binned values in the checkpoint and the rollup are based on the old cache
 #
-    t_list         = tcnv.currentTime()
-    [blist, elist] =  create_monthly_bins(2000, t_list[0], t_list[1])
-    blen           = len(blist)
+        mcf.rm_file(ckpfile)
+        mcf.rm_file(rollupfile)
+        mcf.rm_file(sortfile + '.info')
+#
+#--- drop anything written after the last update recorded in the info file
+#
+    fo = open(cachefile, 'ab')
+    fo.truncate(rows * cache_dtype.itemsize)
+
+    for [time, tsc, fa, noffset] in read_new_chunks(offset):
+        arr         = numpy.zeros(len(time), dtype=cache_dtype)
+        arr['time'] = time
+        arr['tsc']  = tsc
+        arr['fa']   = fa
+        arr.tofile(fo)
+        rows       += len(arr)
+        offset      = noffset
+    fo.close()
+
+    stat = os.stat(datafile)
+    write_cache_info(stat.st_size, stat.st_mtime, offset, rows, tail_hash(offset))
+
+    return rows
+
+#-----------------------------------------------------------------------------------------
+#-- rebuild_sim_cache: rebuild the binary cache from the entire data file              ---
+#-----------------------------------------------------------------------------------------
+
+def rebuild_sim_cache():
+
+    """
+    rebuild the binary cache from the entire data file
+    input:  none, but read from datafile
+    output: cachefile and cachefile + '.info'. the checkpoint is removed
+    """
+
+    mcf.rm_file(cachefile + '.info')
+
+    return update_sim_cache()
+
+#-----------------------------------------------------------------------------------------
+#-- check_sim_cache: check whether the binary cache is up to date with the data file   ---
+#-----------------------------------------------------------------------------------------
+
+def check_sim_cache():
+
+    """
+    check whether the binary cache is up to date with the data file
+    input:  none, but read from datafile and cachefile + '.info'
+    output: [status, info]
+                status  --- 'current': the cache has all the data file
+                            'append' : the data file has new lines after the cached part
+                            'stale'  : the data file is rewritten; the cache must be rebuilt
+                info    --- [fsize, mtime, offset, rows, tail]; see read_cache_info
+    """
+
+    info = read_cache_info()
+    [fsize, mtime, offset, rows, tail] = info
+
+    stat = os.stat(datafile)
+    try:
+        csize = os.path.getsize(cachefile)
+    except:
+        csize = -1
+
+    if csize < rows * cache_dtype.itemsize or fsize < 0:
+        return ['stale', info]
+
+    if fsize == stat.st_size and mtime == stat.st_mtime:
+        return ['current', info]
+
+    if stat.st_size < offset or tail != tail_hash(offset):
+        return ['stale', info]
+
+    return ['append', info]
+
+#-----------------------------------------------------------------------------------------
+#-- open_sim_cache: open the binary cache as a memory mapped array                     ---
+#-----------------------------------------------------------------------------------------
+
+def open_sim_cache():
+
+    """
+    open the binary cache as a memory mapped array
+    input:  none, but read from cachefile and cachefile + '.info'
+    output: numpy record array (memmap) with fields:
+                time    --- time in fractional year
+                tsc     --- TSC value as in the data file
+                fa      --- FA value as in the data file
+            samples are in the order of the data file; (0, 0) lines are not included
+    """
+
+    rows = read_cache_info()[3]
+    if rows <= 0:
+        return numpy.zeros(0, dtype=cache_dtype)
+
+    return numpy.memmap(cachefile, dtype=cache_dtype, mode='r', shape=(rows,))
+
+#-----------------------------------------------------------------------------------------
+#-- read_cache_info: read the information of the cached part of the data file         ---
+#-----------------------------------------------------------------------------------------
+
+def read_cache_info():
+
+    """
+    read the information of the cached part of the data file
+    input:  none, but read from cachefile + '.info'
+    output: [fsize, mtime, offset, rows, tail]
+                fsize   --- size of the data file at the last update
+                mtime   --- modification time of the data file at the last update
+                offset  --- byte position of the data file cached so far
+                rows    --- the number of samples in the cache
+                tail    --- md5 of the 4096 bytes before offset
+            if there is no usable info, [-1, -1, 0, 0, ''] is returned
+    """
 
-    month_tsc_mm   = [0 for x in range(0, blen)]
-    month_fa_mm    = [0 for x in range(0, blen)]
-    avg_time       = [0 for x in range(0, blen)]
-    test       = [0 for x in range(0, blen)]
+    try:
+        f    = open(cachefile + '.info', 'r')
+        data = [line.strip() for line in f.readlines()]
+        f.close()
+
+        fsize  = int(re.split('\s+', data[0])[1])
+        mtime  = float(re.split('\s+', data[1])[1])
+        offset = int(re.split('\s+', data[2])[1])
+        rows   = int(re.split('\s+', data[3])[1])
+        tail   = re.split('\s+', data[4])[1]
+    except:
+        return [-1, -1, 0, 0, '']
+
+    return [fsize, mtime, offset, rows, tail]
+
+#-----------------------------------------------------------------------------------------
+#-- write_cache_info: save the information of the cached part of the data file        ---
+#-----------------------------------------------------------------------------------------
+
+def write_cache_info(fsize, mtime, offset, rows, tail):
+
+    """
+    save the information of the cached part of the data file
+    input:  fsize   --- size of the data file
+            mtime   --- modification time of the data file
+            offset  --- byte position of the data file cached so far
+            rows    --- the number of samples in the cache
+            tail    --- md5 of the 4096 bytes before offset
+    output: cachefile + '.info'
+    """
+
+    line = 'size\t'   + str(fsize)  + '\n'
+    line = line + 'mtime\t'  + repr(float(mtime)) + '\n'
+    line = line + 'offset\t' + str(offset) + '\n'
+    line = line + 'rows\t'   + str(rows)   + '\n'
+    line = line + 'tail\t'   + tail   + '\n'
+
+    tmp = cachefile + '.info~'
+    fo  = open(tmp, 'w')
+    fo.write(line)
+    fo.close()
+    os.rename(tmp, cachefile + '.info')
+
+#-----------------------------------------------------------------------------------------
+#-- tail_hash: compute md5 of the data file bytes just before the given position       ---
+#-----------------------------------------------------------------------------------------
+
+def tail_hash(offset):
+    """
+    compute md5 of the data file bytes just before the given position
+    input:  offset  --- byte position
+    output: md5 hex digest of the last (up to) 4096 bytes before offset
+    """
+
+    start = max(0, offset - 4096)
+    f     = open(datafile, 'r')
+    f.seek(start)
+    text  = f.read(offset - start)
+    f.close()
+
+    return hashlib.md5(text).hexdigest()
+
+#-----------------------------------------------------------------------------------------
+#-- read_new_chunks: read tsc and fa data from the given position in one or more processes 
+#-----------------------------------------------------------------------------------------
+
+def read_new_chunks(offset=0):
+
+    """
+    read tsc and fa data from the given position of the data file. if the part to read
+    is larger than parse_bytes, it is split into byte ranges which are parsed in 
+    parallel processes
+    input:  offset  --- byte position to start reading; default: 0
+    output: a generator of [time, tsc, fa, noffset] in the order of the data file; 
+            see read_sim_chunks
+    """
+
+    nworker = parse_workers
+    if nworker <= 0:
+        nworker = multiprocessing.cpu_count()
 #
-#--- fill the monthly bin values
+#--- a process started by a process pool (e.g. run_all_sim_script) can not start its own
 #
-    k = 1
-    for j in range(1, blen):
+    size = os.path.getsize(datafile)
+    if nworker < 2 or size - offset < parse_bytes or multiprocessing.current_process().daemon:
+        for out in read_sim_chunks(offset):
+            yield out
+        return
+#
+#--- the ranges are stitched back in the order of the file; the cache keeps the samples
+#--- in that order, and |delta| between the samples is taken when they are binned, so
+#--- it is not affected by where the ranges are cut
+#
+    ranges  = split_byte_ranges(offset, size, range_bytes)
+    pool    = multiprocessing.Pool(min(nworker, len(ranges)))
+    try:
+        results = pool.imap(parse_sim_range, [[datafile] + x for x in ranges])
+        for k in range(0, len(ranges)):
+#
+#--- the time waiting for the workers is measured as the parse stage
+#
+            token = smon.start('parse')
+            out   = results.next()
+            smon.stop(token, len(out[0]))
+            yield out
+    finally:
+        pool.close()
+        pool.join()
+
+#-----------------------------------------------------------------------------------------
+#-- split_byte_ranges: split a part of the data file into ranges of whole lines        ---
+#-----------------------------------------------------------------------------------------
+
+def split_byte_ranges(start, stop, width, fname=''):
+
+    """
+    split a part of the data file into byte ranges which start at the beginning of a line
+    input:  start   --- byte position of the beginning of a line
+            stop    --- byte position of the end of the part
+            width   --- approximate size of a range in bytes
+            fname   --- data file; default: datafile
+    output: a list of [start, stop] of the ranges
+    """
+
+    if fname == '':
+        fname = datafile
+
+    ranges = []
+    f = open(fname, 'rb')
+    while start < stop:
+        end = start + width
+        if end >= stop:
+            end = stop
+        else:
 #
-#--- cummulative value of bin i is at least the value of the i-i bin
+#--- move the end to the beginning of the next line
 #
-        month_tsc_mm[j]   = month_tsc_mm[j-1]
-        month_fa_mm[j]    = month_fa_mm[j-1]
-        avg_time[j]       = 0.5 *  (blist[j] + elist[j])
+            f.seek(end - 1)
+            f.readline()
+            end = min(f.tell(), stop)
+
+        ranges.append([start, end])
+        start = end
+    f.close()
+
+    return ranges
+
+#-----------------------------------------------------------------------------------------
+#-- parse_sim_range: read tsc and fa data in a byte range of the data file             ---
+#-----------------------------------------------------------------------------------------
+
+def parse_sim_range(job):
+
+    """
+    read tsc and fa data in a byte range of the data file; run in a worker process
+    input:  job     --- [data file, start, stop]; start is the beginning of a line
+    output: [time, tsc, fa, noffset]; see read_sim_chunks
+    """
+
+    [fname, start, stop] = job
+
+    out = [[], [], [], start]
+    for [time, tsc, fa, noffset] in read_sim_chunks(start, stop=stop, fname=fname):
+        out[0].append(time)
+        out[1].append(tsc)
+        out[2].append(fa)
+        out[3] = noffset
+
+    return [numpy.concatenate(out[k]) for k in range(0, 3)] + [out[3]]
+
+#-----------------------------------------------------------------------------------------
+#-- read_sim_chunks: read tsc and fa data from the given position, a chunk at a time   ---
+#-----------------------------------------------------------------------------------------
+
+def read_sim_chunks(offset=0, chunk=100000, stop=-1, fname=''):
+
+    """
+    read tsc and fa data from the given position of the data file, a chunk at a time
+    input:  offset  --- byte position to start reading; default: 0
+            chunk   --- the number of lines in a chunk
+            stop    --- byte position to stop reading; it must be the beginning of
+                        a line. default: -1 (to the end of the file)
+            fname   --- data file; default: datafile
+    output: a generator of [time, tsc, fa, noffset]
+                time    --- numpy array of time in fractional year
+                tsc     --- numpy array of TSC value
+                fa      --- numpy array of FA value
+                noffset --- byte position after the last line of the chunk. an incomplete
+                            last line is left for the next run
+    """
+
+    tlist   = []
+    tsc     = []
+    fa      = []
+    noffset = offset
+    prev    = ''
+
+    if fname == '':
+        fname = datafile
+
+    f = open(fname, 'r')
+    f.seek(offset)
+#
+#--- reading lines and parsing them are measured as separate stages (see stage_monitor)
+#
+    token = smon.start('read')
+    for line in f:
+        if not line.endswith('\n') or noffset == stop:
+            break
+        noffset += len(line)
+#
+#--- skip the data line which is same as one before
+#
+##        if line == prev:
+##            continue
+##        else:
+##            prev = line
+
+        atemp = line.split()
+        if len(atemp) < 3:
+            continue
+
+        tlist.append(atemp[0])
+        tsc.append(atemp[1])
+        fa.append(atemp[2])
+
+        if len(tlist) == chunk:
+            smon.stop(token, len(tlist))
+            yield parse_sim_fields(tlist, tsc, fa) + [noffset]
+            tlist = []
+            tsc   = []
+            fa    = []
+            token = smon.start('read')
+    f.close()
+    smon.stop(token, len(tlist))
+
+    yield parse_sim_fields(tlist, tsc, fa) + [noffset]
+
+#-----------------------------------------------------------------------------------------
+#-- parse_sim_fields: convert the columns of the data file to time, tsc and fa values  ---
+#-----------------------------------------------------------------------------------------
+
+def parse_sim_fields(tlist, tsc, fa):
+
+    """
+    convert the columns of the data file to time, tsc and fa values
+    input:  tlist   --- a list of time in <year>:<ydate>:<hours>:<mins>:<sec>
+            tsc     --- a list of TSC value strings
+            fa      --- a list of FA value strings
+    output: [time, tsc, fa] numpy arrays of the usable lines
+                time    --- time in fractional year
+                tsc     --- TSC value
+                fa      --- FA value
+            lines with bad values or time, or with both TSC and FA 0 are dropped
+    """
+
+    if len(tlist) == 0:
+        return [numpy.zeros(0), numpy.zeros(0), numpy.zeros(0)]
+
+    token = smon.start('parse')
+
+    tsc  = fyr.to_float(numpy.array(tsc))
+    fa   = fyr.to_float(numpy.array(fa))
+    keep = ~(numpy.isnan(tsc) | numpy.isnan(fa))
+    keep = keep & ~((tsc == 0) & (fa == 0))
+#
+#--- converting time to fractional year
+#
+    time = fyr.colon_time_batch(numpy.array(tlist)[keep])
+    tsc  = tsc[keep]
+    fa   = fa[keep]
+
+    keep = ~numpy.isnan(time)
+
+    smon.stop(token, len(tlist))
+
+    return [time[keep], tsc[keep], fa[keep]]
+
+#-----------------------------------------------------------------------------------------
+#-- read_checkpoint: read the saved state of the previous run                          ---
+#-----------------------------------------------------------------------------------------
+
+def read_checkpoint():
+
+    """
+    read the saved state of the previous run
+    input:  none, but read from ckpfile
+    output: [offset, last, base, final]
+                offset  --- the number of the sorted samples already binned
+                last    --- [time, tsc, fa] of the last sample binned; [] if none
+                base    --- [tsc, fa] cumulative values at the last sample
+                final   --- a list of [tsc, fa] of the finalized monthly bins
+            if there is no usable checkpoint, [0, [], [0.0, 0.0], []] is returned
+    """
+
+    try:
+        f    = open(ckpfile, 'r')
+        data = [line.strip() for line in f.readlines()]
+        f.close()
+
+        offset = int(re.split('\s+', data[0])[1])
+        last   = [float(x) for x in re.split('\s+', data[1])[1:4]]
+        base   = [float(x) for x in re.split('\s+', data[2])[1:3]]
+        final  = []
+        for ent in data[3:]:
+            atemp = re.split('\s+', ent)
+            final.append([float(atemp[1]), float(atemp[2])])
+    except:
+        return [0, [], [0.0, 0.0], []]
+
+    return [offset, last, base, final]
+
+#-----------------------------------------------------------------------------------------
+#-- write_checkpoint: save the state of this run for the next run                      ---
+#-----------------------------------------------------------------------------------------
+
+def write_checkpoint(offset, last, base, final):
+
+    """
+    save the state of this run for the next run
+    input:  offset  --- the number of the sorted samples already binned
+            last    --- [time, tsc, fa] of the last sample binned
+            base    --- [tsc, fa] cumulative values at the last sample
+            final   --- a list of [tsc, fa] of the finalized monthly bins
+    output: ckpfile. it is written to a temp file first and then renamed so that 
+            a crash never leaves a half written checkpoint
+    """
+
+    line = 'offset\t' + str(offset) + '\n'
+    line = line + 'last\t'  + '\t'.join([repr(float(x)) for x in last]) + '\n'
+    line = line + 'base\t'  + '\t'.join([repr(float(x)) for x in base]) + '\n'
+    for j in range(0, len(final)):
+        line = line + str(j) + '\t' + repr(float(final[j][0])) + '\t' + repr(float(final[j][1])) + '\n'
+
+    tmp = ckpfile + '~'
+    fo  = open(tmp, 'w')
+    fo.write(line)
+    fo.close()
+    os.rename(tmp, ckpfile)
+
+#-----------------------------------------------------------------------------------------
+#-- bin_cumulative: compute cumulative tsc and fa movement in each bin                 ---
+#-----------------------------------------------------------------------------------------
+
+def bin_cumulative(time, tsc_mm, fa_mm, blist, elist, base=[0.0, 0.0]):
+
+    """
+    compute cumulative tsc and fa movement in each bin
+    input:  time    --- numpy array of time in fractional year (sorted)
+            tsc_mm  --- numpy array of tsc position in mm
+            fa_mm   --- numpy array of fa position in mm
+            blist   --- a list of bin starting time
+            elist   --- a list of bin stopping time
+            base    --- [tsc, fa] cumulative values before the first sample; default: [0.0, 0.0]
+    output: [avg_time, month_tsc_mm, month_fa_mm]
+                avg_time     --- a list of the mid point of each bin; 0 for the first bin
+                month_tsc_mm --- cumulative TSC movement in 1.0e4 mm
+                month_fa_mm  --- cumulative FA movement in mm
+    note:   the first bin is used only as a starting point and never gets any movement, 
+            and the movement of each sample is measured from the sample before it
+    """
 
-        for i in range(k, len(time)):
+    blen     = len(blist)
+    avg_time = [0 for x in range(0, blen)]
+    for j in range(1, blen):
+        avg_time[j] = 0.5 *  (blist[j] + elist[j])
 
-            if time[i] < blist[j]:
-                continue
-            elif time[i] >=  elist[j]:
-                k = i - 5
-                if k < 1:
-                    k = 1
-                break
-            else:
+    if blen == 0:
+        return [avg_time, [], []]
+#
+#--- bins are contiguous; find which bin each sample falls in with one pass.
+#--- the first sample does not have a previous sample so it cannot move
+#
+    edges    = numpy.array(list(blist) + [elist[-1]], dtype=numpy.float64)
+    pos      = tbin.bin_index(edges, time[1:])
+    mask     = (pos >= 1) & (pos < blen)
+    pos      = pos[mask]
 #
 #---for tsc, the plot take 1.0e-4 size on y axis
 #
-                month_tsc_mm[j] += abs(tsc_mm[i] - tsc_mm[i-1]) /1.0e4
-                month_fa_mm[j]  += abs(fa_mm[i]  - fa_mm[i-1])
+    tsc_step = numpy.abs(numpy.diff(tsc_mm))[mask] / 1.0e4
+    fa_step  = numpy.abs(numpy.diff(fa_mm))[mask]
+#
+#--- a running sum in the time order gives the cumulative values; each bin takes 
+#--- the value at its last sample, or the value of the previous bin if it is empty
+#
+    last     = numpy.cumsum(numpy.bincount(pos, minlength=blen)) - 1
+    filled   = last >= 0
+    last     = last[filled]
 
-    return [avg_time, month_tsc_mm, month_fa_mm]
+    month_tsc_mm = numpy.zeros(blen) + base[0]
+    month_fa_mm  = numpy.zeros(blen) + base[1]
+    if len(pos) > 0:
+        month_tsc_mm[filled] = numpy.cumsum(numpy.concatenate([[base[0]], tsc_step]))[1:][last]
+        month_fa_mm[filled]  = numpy.cumsum(numpy.concatenate([[base[1]], fa_step]))[1:][last]
+
+    return [avg_time, month_tsc_mm.tolist(), month_fa_mm.tolist()]
 
 
 #-----------------------------------------------------------------------------------------
@@ -252,14 +1039,15 @@ def compute_fa_val(val):
 #-- plot_steps: plot tsc and fa movement                                                --
 #-----------------------------------------------------------------------------------------
 
-def plot_steps(time, set1, set2):
+def plot_steps(time, set1, set2, outname='monthly_sim.png'):
 
     """
     plot tsc and fa movement
     input:  time    --- a list of time in fractional year
             set1    --- a list of tsc value
             set2    --- a list of fa value
-    output: monthly_sim.png
+            outname --- output file name
+    output: outname (default: monthly_sim.png)
     """
 
 #
@@ -285,33 +1073,20 @@ def plot_steps(time, set1, set2):
     color  = 'red'
     marker = 'o'
     msize  = 3
-    plt.close("all")
-    mpl.rcParams['font.size'] = fsize
-    props = font_manager.FontProperties(size=fsize)
-#
-#--- TSC plot
-#
-    a1 = plt.subplot(121)
-    plot_sub(a1, time, set1, xmin, xmax, ymin, ymax1, color, lsize, marker, msize, tline='TSC')
-
-    a1.set_xlabel('Time (year)', size=fsize)
-    a1.set_ylabel('TSC Cummulative Moter Dist (x10^4 mm)', size=fsize)
 #
-#-- FA plot
+#--- panels: TSC and FA plots
 #
-    a2 = plt.subplot(122)
-    plot_sub(a2, time, set2, xmin, xmax, ymin, ymax2, color, lsize, marker, msize, tline='FA')
-
-    a2.set_xlabel('Time (year)', size=fsize)
-    a2.set_ylabel('FA Cummulative Moter Dist (mm)', size=fsize)
+    spec = {'x': time, 'xrange': [xmin, xmax], 'fsize': fsize, 'lsize': lsize, 'color': color,\
+            'marker': marker, 'msize': msize, 'xlabel': 'Time (year)',                      \
+            'panels': [
+            {'pos': 121, 'y': set1, 'yrange': [ymin, ymax1], 'label': 'TSC',                   \
+             'ylabel': 'TSC Cummulative Moter Dist (x10^4 mm)'},
+            {'pos': 122, 'y': set2, 'yrange': [ymin, ymax2], 'label': 'FA',                    \
+             'ylabel': 'FA Cummulative Moter Dist (mm)'}]}
 #
-#--- save the plot
+#--- create the plot
 #
-    fig = matplotlib.pyplot.gcf()
-    fig.set_size_inches(10.0, 5.0)
-
-    outname = 'monthly_sim.png'
-    plt.savefig(outname, format='png', dpi=100)
+    srender.render_panels(spec, outname)
 
 #-----------------------------------------------------------------------------------------
 #-- create_monthly_bins: create a month wide bin for given periods                     ---
@@ -324,73 +1099,12 @@ def create_monthly_bins(ystart, ystop, mstop):
             ystop   --- stopping year
             mstop   --- stopping month of the stopping month
     output: [blist, elist] a list of lists of starting and stoping period in fractional year
+            the edges are made by time_bins and kept for the next call
     """
 
-    interval1 = [0.0, 31.0, 59.0, 90.0, 120.0, 151.0, 181.0, 212.0, 243.0, 273.0, 304.0, 334.0, 365.0]
-    interval2 = [0.0, 31.0, 60.0, 91.0, 121.0, 152.0, 182.0, 213.0, 244.0, 274.0, 305.0, 335.0, 366.0]
-
-    blist = []
-    elist = []
-    
-    for year in range(ystart, ystop+1):
-#
-#--- check leap year
-#
-        if tcnv.isLeapYear(year) == 1:
-            interval = interval2
-            base = 366.0
-        else:
-            interval = interval1
-            base = 365.0
-#
-#--- go around 12 months
-#
-        for i in range(0, 12):
-            if year == ystop and i >= mstop:
-                break
-            begin = year + interval[i]   / base
-            end   = year + interval[i+1] / base
-            if int(end) > year:
-                end = year + 1
+    edges = tbin.bin_edges('monthly', ystart, ystop, mstop)
 
-            blist.append(begin)
-            elist.append(end)
-    
-    return [blist, elist]
-
-
-#-----------------------------------------------------------------------------------------
-#-- plot_sub: plotting each panel                                                       --
-#-----------------------------------------------------------------------------------------
-
-def plot_sub(ap, x, y, xmin, xmax, ymin, ymax, color, lsize, marker, msize, tline=''):
-    """
-    plotting each panel
-    input   ap      --- panel name
-            x       --- x data list
-            y       --- y data list
-            xmin    --- xmin
-            xmax    --- xmax
-            ymin    --- ymin
-            ymax    --- ymax
-            color   --- color of data point
-            lsize   --- line size
-            marker  --- marker shape
-            msize   --- size of the marker
-            tlime   --- extra text line
-    """
-
-    ap.set_autoscale_on(False)
-    ap.set_xbound(xmin,xmax)
-    ap.set_xlim(xmin=xmin, xmax=xmax, auto=False)
-    ap.set_ylim(ymin=ymin, ymax=ymax, auto=False)
-
-    plt.plot(x, y , color=color, lw=lsize, marker=marker, markersize=msize)
-
-    if tline != '':
-        xpos = 0.05 * (xmax - xmin) + xmin
-        ypos = ymax -0.10 * (ymax - ymin)
-        text(xpos, ypos, tline, fontsize=11,style='italic', weight='bold')
+    return tbin.edge_lists(edges)
 
 
 #-----------------------------------------------------------------------------------------
@@ -412,6 +1126,154 @@ class TestFunctions(unittest.TestCase):
         self.assertEquals(month_tsc_mm[100:105], tsc_test)
         self.assertEquals(month_fa_mm[100:105],  fa_test)
     
+#------------------------------------------------------------
+
+    def test_bin_cumulative(self):
+
+        time   = numpy.array([2000.05, 2000.10, 2000.15, 2000.30, 2000.35])
+        tsc_mm = numpy.array([0.0, 1.0e4, 3.0e4, 2.0e4, 6.0e4])
+        fa_mm  = numpy.array([0.0, 1.0, 0.5, 2.5, 2.0])
+        blist  = [2000.0, 2000.1, 2000.2, 2000.3]
+        elist  = [2000.1, 2000.2, 2000.3, 2000.4]
+
+        [avg_time, month_tsc_mm, month_fa_mm] = bin_cumulative(time, tsc_mm, fa_mm, blist, elist)
+
+        self.assertEquals(month_tsc_mm, [0.0, 3.0, 3.0, 8.0])
+        self.assertEquals(month_fa_mm,  [0.0, 1.5, 1.5, 4.0])
+        self.assertEquals(avg_time[0],  0)
+
+#------------------------------------------------------------
+
+    def test_parse_sim_fields(self):
+
+        tlist = ['2014:059:12:23:33.1', '2014:059:12:23:34.1', ':2014:059:12:23:35', 'xx']
+        tsc   = ['1000',  '0', 'x', '1']
+        fa    = ['-2000', '0', '1', '1']
+        [time, tsc, fa] = parse_sim_fields(tlist, tsc, fa)
+
+        self.assertEquals(len(time), 1)
+        self.assertEquals(round(time[0], 7), 2014.1630585)
+        self.assertEquals(tsc[0], 1000.0)
+        self.assertEquals(fa[0], -2000.0)
+
+#------------------------------------------------------------
+
+    def test_get_sim_data_months(self):
+#
+#--- the data run past the end of the month of the first run; the run of a later month
+#--- must give the same values as binning the entire data at once
+#
+        class MonthTime(object):
+            def __init__(self, year, month):
+                self.now = [year, month, 1, 0, 0, 0, 0, 0, 0]
+            def currentTime(self):
+                return self.now
+            def isLeapYear(self, year):
+                return int(fyr.year_base[int(year)] == 366.0)
+
+        global tcnv, datafile, cachefile, ckpfile, rollupfile, sortfile
+        save = [tcnv, datafile, cachefile, ckpfile, rollupfile, sortfile]
+        wdir = tempfile.mkdtemp()
+        try:
+            [datafile, cachefile, ckpfile, rollupfile, sortfile] \
+                    = [os.path.join(wdir, x) for x in ['sim_data.out', 'cache', 'ckp', 'db', 'sorted']]
+            fo = open(datafile, 'w')
+            for k in range(0, 2000):
+                fo.write('2010:%03d:%02d:00:00.0 %d %d\n' % (150 + k // 40, k % 24, (k * 37) % 500, -(k % 13)))
+            fo.close()
+
+            tcnv = MonthTime(2010, 6)
+            get_sim_data()
+            tcnv = MonthTime(2010, 8)
+            incremental = get_sim_data()
+
+            mcf.rm_file(ckpfile)
+            full = get_sim_data()
+        finally:
+            [tcnv, datafile, cachefile, ckpfile, rollupfile, sortfile] = save
+            shutil.rmtree(wdir)
+
+        self.assertEquals(incremental[0], full[0])
+        for k in [1, 2]:
+            self.assertEquals(numpy.allclose(incremental[k], full[k], rtol=1.0e-12, atol=0), True)
+        self.assertEquals(full[1][-1] > 0, True)
+
+#------------------------------------------------------------
+
+    def test_read_new_chunks(self):
+
+        global datafile, parse_workers, parse_bytes, range_bytes
+        save  = [datafile, parse_workers, parse_bytes, range_bytes]
+        wdir  = tempfile.mkdtemp()
+        tfile = os.path.join(wdir, 'sim_data.out')
+        try:
+            fo = open(tfile, 'w')
+            for k in range(0, 1000):
+                fo.write('2014:%03d:12:23:33.1 %d %d\n' % (k % 365 + 1, k * 100, -k))
+                if k % 97 == 0:
+                    fo.write('bad line\n')
+            fo.write('2014:059:12:23')              #--- incomplete last line
+            fo.close()
+            size = os.path.getsize(tfile)
+#
+#--- parse the file in one process and in two, split into ranges of about 1000 bytes
+#
+            datafile = tfile
+            serial   = list(read_sim_chunks(0))
+            [parse_workers, parse_bytes, range_bytes] = [2, 0, 1000]
+            parallel = list(read_new_chunks(0))
+        finally:
+            [datafile, parse_workers, parse_bytes, range_bytes] = save
+            shutil.rmtree(wdir)
+
+        self.assertEquals(len(parallel) > 10, True)
+        for k in range(0, 3):
+            self.assertEquals(numpy.concatenate([x[k] for x in parallel]).tolist(), \
+                              numpy.concatenate([x[k] for x in serial]).tolist())
+        self.assertEquals(parallel[-1][3], serial[-1][3])
+        self.assertEquals(parallel[-1][3], size - 14)
+
+#------------------------------------------------------------
+
+    def test_sort_sim_cache(self):
+#
+#--- the same lines cached in two runs, in time order and going back in time; both give
+#--- the same sorted samples and bins, without the duplicated line
+#
+        global sortfile, ckpfile, rollupfile
+        save  = [sortfile, ckpfile, rollupfile]
+        wdir  = tempfile.mkdtemp()
+        data  = numpy.array([(2000.05, 100, 1), (2000.10, 300, 2), (2000.20, 200, 1), \
+                             (2000.20, 200, 1), (2000.35, 500, 3)], dtype=cache_dtype)
+        back  = numpy.concatenate([data[2:], data[:2]])
+        blist = [2000.0, 2000.1, 2000.2, 2000.3]
+        elist = [2000.1, 2000.2, 2000.3, 2000.4]
+        try:
+            [sortfile, ckpfile, rollupfile] = [os.path.join(wdir, x) for x in ['sorted', 'ckp', 'db']]
+            out = []
+            for cache in [data, back]:
+                mcf.rm_file(sortfile + '.info')
+                sort_sim_cache(cache[:3])
+                open(ckpfile, 'w').close()
+                sdata = sort_sim_cache(cache)
+                out.append([sdata.tolist(), os.path.isfile(ckpfile), \
+                            fold_sim_data(sdata, 0, [], [0.0, 0.0], blist, elist)])
+        finally:
+            [sortfile, ckpfile, rollupfile] = save
+            shutil.rmtree(wdir)
+#
+#--- the lines in time order are added to the sorted file; the checkpoint is kept
+#
+        self.assertEquals(out[0][0], ssort.sort_block(data).tolist())
+        self.assertEquals(out[1][0], out[0][0])
+        self.assertEquals([out[0][1], out[1][1]], [True, False])
+        self.assertEquals(out[1][2], out[0][2])
+
+        [time, tsc_mm, fa_mm] = sort_sim_chunk(numpy.delete(data, 3))
+        [atime, ctsc, cfa]    = bin_cumulative(time, tsc_mm, fa_mm, blist, elist)
+        self.assertEquals(out[0][2][1], ctsc)
+        self.assertEquals(out[0][2][2], cfa)
+
 #------------------------------------------------------------
 
     def test_convert_time(self):
@@ -436,24 +1298,33 @@ class TestFunctions(unittest.TestCase):
         self.assertEquals(elist, out2)
 
 #-----------------------------------------------------------------------------------------
-#
-#--- pylab plotting routine related modules
-#
-from pylab import *
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as font_manager
-import matplotlib.lines as lines
-
-chk = 0
-if len(sys.argv) == 2:
-    chk = 1
 
 if __name__ == '__main__':
 
-    if chk > 0:
+    chk = 0
+    if len(sys.argv) == 2:
+        chk = 1
+        if sys.argv[1] == 'rebuild':
+            chk = 2
+        elif sys.argv[1] == 'replot':
+            chk = 3
+    elif len(sys.argv) == 3 and sys.argv[1] in ['rollup', 'bins']:
+        chk = 4
+        resolution = sys.argv[2]
+        if resolution not in tbin.widths and resolution != 'monthly':
+            resolution = int(resolution)
+
+    if chk == 4 and sys.argv[1] == 'rollup':
+        print_rollup(resolution)
+    elif chk == 4:
+        [time, bin_tsc_mm, bin_fa_mm] = get_sim_bins(resolution)
+        plot_steps(time, bin_tsc_mm, bin_fa_mm, outname=str(resolution) + '_sim.png')
+    elif chk == 2:
+        rebuild_sim_cache()
+    elif chk == 3:
+        plot_sim_movement(replot=1)
+    elif chk > 0:
         plot_sim_movement()
     else:
         unittest.main()
 
-
-
@@ -0,0 +1,259 @@
+#!/usr/bin/env /proj/sot/ska/bin/python
+
+#############################################################################################
+#                                                                                           #
+#       sim_render.py:  create and save the figures of the sim plot scripts                 #
+#                                                                                           #
+#           author: t. isobe (tisobe@cfa.harvard.edu)                                       #
+#                                                                                           #
+#           last update: Oct 18, 2026                                                       #
+#                                                                                           #
+#############################################################################################
+
+import os
+import sys
+import threading
+import timeit
+import unittest
+
+import stage_monitor        as smon
+#
+#--- the style shared by all figures; it is set once, when the first figure is created
+#
+style = {'font.size': 9}
+
+style_done = 0
+style_lock = threading.Lock()
+#
+#--- drawing into the agg buffer is done one figure at a time
+#
+draw_lock  = threading.Lock()
+#
+#--- default values of the panel spec entries; see render_panels
+#
+spec_default = {'size': [10.0, 5.0], 'dpi': 100, 'hspace': None, 'wspace': None, \
+                'color': 'red', 'lsize': 0, 'marker': 'o', 'msize': 3,        \
+                'label': '', 'label_pos': 'top', 'xlabel': '', 'ylabel': '',   \
+                'xticks': 1, 'yticks': 1, 'fsize': 9}
+#
+#--- the position of the panel label as fractions of the axis ranges
+#
+label_pos = {'top': [0.05, 0.90], 'bottom': [0.05, 0.15]}
+
+#-----------------------------------------------------------------------------------------
+#-- render_panels: create a figure from a panel spec and save it                       ---
+#-----------------------------------------------------------------------------------------
+
+def render_panels(spec, outname):
+
+    """
+    create a figure from a panel spec and save it
+    input:  spec    --- a dictionary of the figure:
+                        panels  --- a list of dictionaries of the panels. each has
+                                    pos (subplot position, e.g. 221), y and yrange
+                                    ([ymin, ymax]), and may have x, xrange, label,
+                                    xlabel, ylabel and any of the entries below
+                        other entries are shared by all panels unless a panel has
+                        its own: x, xrange, size ([width, height] in inch), dpi,
+                        hspace, wspace, color, lsize, marker, msize (data point
+                        style), label_pos ('top'/'bottom'), xticks/yticks (0 to
+                        hide the tick labels), fsize (axis label font size)
+            outname --- output file name
+    output: outname
+            ptime   --- a list of time spent to set up each panel in sec
+    """
+
+    token = smon.start('render')
+
+    fig = new_figure(*entry(spec, {}, 'size'))
+    fig.subplots_adjust(hspace=entry(spec, {}, 'hspace'), wspace=entry(spec, {}, 'wspace'))
+
+    from matplotlib.lines import Line2D
+
+    ptime = []
+    for panel in spec['panels']:
+        start = timeit.default_timer()
+
+        [xmin, xmax] = entry(spec, panel, 'xrange')
+        [ymin, ymax] = entry(spec, panel, 'yrange')
+
+        ap = fig.add_subplot(panel['pos'])
+        ap.set_autoscale_on(False)
+        ap.set_xlim(xmin, xmax)
+        ap.set_ylim(ymin, ymax)
+#
+#--- the data points are added as a line artist; they are drawn when the figure is saved
+#
+        ap.add_line(Line2D(entry(spec, panel, 'x'), panel['y'], color=entry(spec, panel, 'color'),\
+                           lw=entry(spec, panel, 'lsize'), marker=entry(spec, panel, 'marker'),  \
+                           markersize=entry(spec, panel, 'msize')))
+
+        tline = entry(spec, panel, 'label')
+        if tline != '':
+            [xr, yr] = label_pos[entry(spec, panel, 'label_pos')]
+            xpos = xmin + xr * (xmax - xmin)
+            ypos = ymin + yr * (ymax - ymin)
+            ap.text(xpos, ypos, tline, fontsize=11, style='italic', weight='bold')
+
+        fsize = entry(spec, panel, 'fsize')
+        if entry(spec, panel, 'xlabel') != '':
+            ap.set_xlabel(entry(spec, panel, 'xlabel'), size=fsize)
+        if entry(spec, panel, 'ylabel') != '':
+            ap.set_ylabel(entry(spec, panel, 'ylabel'), size=fsize)
+
+        if entry(spec, panel, 'xticks') == 0:
+            for label in ap.get_xticklabels():
+                label.set_visible(False)
+        if entry(spec, panel, 'yticks') == 0:
+            for label in ap.get_yticklabels():
+                label.set_visible(False)
+
+        ptime.append(timeit.default_timer() - start)
+
+    smon.stop(token, len(spec['panels']))
+
+    save_figure(fig, outname, dpi=entry(spec, {}, 'dpi'))
+
+    return ptime
+
+#-----------------------------------------------------------------------------------------
+#-- entry: give a value of a panel spec                                                ---
+#-----------------------------------------------------------------------------------------
+
+def entry(spec, panel, key):
+
+    """
+    give a value of a panel spec: the panel value, the figure value or the default
+    input:  spec    --- a dictionary of the figure
+            panel   --- a dictionary of the panel
+            key     --- name of the entry
+    output: the value
+    """
+
+    if key in panel:
+        return panel[key]
+    if key in spec:
+        return spec[key]
+
+    return spec_default[key]
+
+#-----------------------------------------------------------------------------------------
+#-- new_figure: create a figure with an agg canvas                                     ---
+#-----------------------------------------------------------------------------------------
+
+def new_figure(width=10.0, height=5.0):
+
+    """
+    create a figure with an agg canvas. pyplot is not used, so that figures do not
+    share any state and can be created in worker threads
+    input:  width   --- width of the figure in inch
+            height  --- height of the figure in inch
+    output: fig     --- matplotlib Figure object
+    """
+
+    setup_style()
+
+    from matplotlib.figure              import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(width, height))
+    FigureCanvasAgg(fig)
+
+    return fig
+
+#-----------------------------------------------------------------------------------------
+#-- save_figure: save a figure in a png file                                           ---
+#-----------------------------------------------------------------------------------------
+
+def save_figure(fig, outname, dpi=100):
+
+    """
+    save a figure in a png file
+    input:  fig     --- matplotlib Figure object created by new_figure
+            outname --- output file name
+            dpi     --- resolution
+    output: outname
+    """
+
+    token = smon.start('save')
+    draw_lock.acquire()
+    try:
+        fig.savefig(outname, format='png', dpi=dpi)
+    finally:
+        draw_lock.release()
+    smon.stop(token, 1)
+
+#-----------------------------------------------------------------------------------------
+#-- setup_style: set the style shared by all figures                                   ---
+#-----------------------------------------------------------------------------------------
+
+def setup_style():
+
+    """
+    set the style shared by all figures; this is done only once
+    input:  none, but read from style
+    output: updated matplotlib rcParams
+    """
+
+    global style_done
+
+    if style_done == 1:
+        return
+
+    style_lock.acquire()
+    try:
+        if style_done == 0:
+            import matplotlib as mpl
+            for key in style.keys():
+                mpl.rcParams[key] = style[key]
+            style_done = 1
+    finally:
+        style_lock.release()
+
+#-----------------------------------------------------------------------------------------
+#-- TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST    ---
+#-----------------------------------------------------------------------------------------
+
+class TestFunctions(unittest.TestCase):
+    """
+    testing functions
+    """
+#------------------------------------------------------------
+
+    def test_new_figure(self):
+
+        outname = '/tmp/ztest_render.png'
+
+        fig = new_figure(4.0, 2.0)
+        ap  = fig.add_subplot(111)
+        ap.plot([0, 1], [0, 1])
+        save_figure(fig, outname, dpi=50)
+
+        self.assertEquals(os.path.isfile(outname), True)
+        self.assertEquals('matplotlib.pyplot' in sys.modules, False)
+
+        os.remove(outname)
+
+#------------------------------------------------------------
+
+    def test_render_panels(self):
+
+        outname = '/tmp/ztest_render.png'
+        spec    = {'x': [2000.5, 2001.5], 'xrange': [2000, 2002], 'size': [4.0, 2.0], \
+                   'panels': [{'pos': 121, 'y': [1, 2], 'yrange': [0, 3], 'label': 'A'},\
+                              {'pos': 122, 'y': [2, 1], 'yrange': [0, 3], 'yticks': 0}]}
+
+        ptime = render_panels(spec, outname)
+
+        self.assertEquals(len(ptime), 2)
+        self.assertEquals(os.path.isfile(outname), True)
+        self.assertEquals(entry(spec, spec['panels'][1], 'yticks'), 0)
+        self.assertEquals(entry(spec, spec['panels'][1], 'color'), 'red')
+
+        os.remove(outname)
+
+#-----------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,349 @@
+#!/usr/bin/env /proj/sot/ska/bin/python
+
+#############################################################################################
+#                                                                                           #
+#       sim_sort.py:    sort sim data records and drop duplicates without reading all       #
+#                                                                                           #
+#           author: t. isobe (tisobe@cfa.harvard.edu)                                       #
+#                                                                                           #
+#           last update: Oct 18, 2026                                                       #
+#                                                                                           #
+#############################################################################################
+
+import os
+import sys
+import shutil
+import tempfile
+import numpy
+import unittest
+
+#
+#--- records: time (fractional year), tsc and fa, as in the binary cache of sim_plot
+#
+rec_dtype  = numpy.dtype([('time', '<f8'), ('tsc', '<f8'), ('fa', '<f8')])
+#
+#--- the number of records sorted in memory at a time, and read from each run at a time
+#--- when the runs are merged
+#
+run_rows   = 2000000
+block_rows = 100000
+
+#-----------------------------------------------------------------------------------------
+#-- sort_records: sort records by time and drop duplicates, a part at a time           ---
+#-----------------------------------------------------------------------------------------
+
+def sort_records(data, outfile, nrun=0, nblock=0):
+
+    """
+    sort records by time and drop exact duplicates and records with both tsc and fa 0.
+    the records are sorted nrun at a time and written in run files, and the runs are
+    merged, so that the memory use does not grow with the data
+    input:  data    --- records (e.g. numpy memmap of the cache); see rec_dtype
+            outfile --- output file
+            nrun    --- the number of records sorted in memory; default: run_rows
+            nblock  --- the number of records read from a run at a time; default: block_rows
+    output: outfile --- the sorted records in rec_dtype binary, written through a tmp file
+            return the number of records written
+    """
+
+    if nrun <= 0:
+        nrun = run_rows
+    if nblock <= 0:
+        nblock = block_rows
+#
+#--- the runs are kept next to the output, where there is room for a copy of the data
+#
+    wdir = tempfile.mkdtemp(prefix='sim_sort_', dir=os.path.dirname(os.path.abspath(outfile)))
+    try:
+        runs = make_runs(data, wdir, nrun)
+
+        tmp = outfile + '~'
+        fo  = open(tmp, 'wb')
+        try:
+            nrec = merge_runs(runs, fo, nblock)
+        finally:
+            fo.close()
+        os.rename(tmp, outfile)
+    finally:
+        shutil.rmtree(wdir, ignore_errors=True)
+
+    return nrec
+
+#-----------------------------------------------------------------------------------------
+#-- append_records: add records after the end of a sorted file                         ---
+#-----------------------------------------------------------------------------------------
+
+def append_records(data, outfile, size, nrun=0):
+
+    """
+    add records after the end of a sorted file, nrun at a time, sorted and without
+    duplicates, so that the file is the same as sort_records of all the records. it
+    stops if a record belongs before the end of the file
+    input:  data    --- records to add; see rec_dtype
+            outfile --- sorted file made by sort_records or append_records
+            size    --- the number of records in outfile; anything after them (e.g.
+                        left by a failed run) is dropped
+            nrun    --- the number of records sorted in memory; default: run_rows
+    output: outfile --- appended
+            return the number of records added; -1 if a record belongs before the end
+            of outfile. the file must be made again with sort_records in that case
+    """
+
+    if nrun <= 0:
+        nrun = run_rows
+#
+#--- the last record of the file
+#
+    last = None
+    if size > 0:
+        f = open(outfile, 'rb')
+        f.seek((size - 1) * rec_dtype.itemsize)
+        rec = numpy.fromfile(f, dtype=rec_dtype, count=1)
+        f.close()
+        if len(rec) == 0:
+            return -1
+        last = rec_key(rec[0])
+
+    fo = open(outfile, 'ab')
+    fo.truncate(size * rec_dtype.itemsize)
+    nrec = 0
+    try:
+        for k in range(0, len(data), nrun):
+            part = sort_block(numpy.array(data[k:k+nrun], dtype=rec_dtype))
+            if len(part) == 0:
+                continue
+#
+#--- the part has no duplicates in itself; only its first record can be the same as
+#--- the last record of the file
+#
+            if last is not None and rec_key(part[0]) == last:
+                part = part[1:]
+                if len(part) == 0:
+                    continue
+
+            if last is not None and rec_key(part[0]) < last:
+                return -1
+
+            part.tofile(fo)
+            nrec += len(part)
+            last  = rec_key(part[-1])
+    finally:
+        fo.close()
+
+    return nrec
+
+#-----------------------------------------------------------------------------------------
+#-- rec_key: give the sort key of a record                                             ---
+#-----------------------------------------------------------------------------------------
+
+def rec_key(rec):
+
+    """
+    give the sort key of a record
+    input:  rec     --- a record; see rec_dtype
+    output: (time, tsc, fa)
+    """
+
+    return (float(rec['time']), float(rec['tsc']), float(rec['fa']))
+
+#-----------------------------------------------------------------------------------------
+#-- make_runs: sort the records a part at a time and write each part in a run file     ---
+#-----------------------------------------------------------------------------------------
+
+def make_runs(data, wdir, nrun):
+
+    """
+    sort the records a part at a time and write each part in a run file
+    input:  data    --- records; see rec_dtype
+            wdir    --- directory of the run files
+            nrun    --- the number of records in a part
+    output: <wdir>/run_<k>
+            return a list of the run files
+    """
+
+    runs = []
+    for k in range(0, len(data), nrun):
+        part  = sort_block(numpy.array(data[k:k+nrun], dtype=rec_dtype))
+        rfile = os.path.join(wdir, 'run_' + str(len(runs)))
+        part.tofile(rfile)
+        runs.append(rfile)
+
+    return runs
+
+#-----------------------------------------------------------------------------------------
+#-- merge_runs: merge the sorted runs and drop duplicates                              ---
+#-----------------------------------------------------------------------------------------
+
+def merge_runs(runs, fo, nblock):
+
+    """
+    merge the sorted runs and drop duplicates. a block of each run is kept in memory; all
+    records earlier than the end of every block can be sorted and written out together,
+    since later blocks have only later records
+    input:  runs    --- a list of the run files
+            fo      --- output file object
+            nblock  --- the number of records read from a run at a time
+    output: the merged records written in fo
+            return the number of records written
+    """
+
+    files = [open(rfile, 'rb') for rfile in runs]
+    bufs  = [numpy.zeros(0, dtype=rec_dtype) for rfile in runs]
+    done  = [0 for rfile in runs]
+    nrec  = 0
+    try:
+        while True:
+#
+#--- fill the blocks; a block of one time only is extended, so that its end is later
+#--- than its beginning
+#
+            for k in range(0, len(files)):
+                while done[k] == 0 and (len(bufs[k]) == 0 or \
+                                        bufs[k]['time'][0] == bufs[k]['time'][-1]):
+                    block = numpy.fromfile(files[k], dtype=rec_dtype, count=nblock)
+                    if len(block) == 0:
+                        done[k] = 1
+                    bufs[k] = numpy.concatenate([bufs[k], block])
+
+            active = [k for k in range(0, len(files)) if len(bufs[k]) > 0]
+            if len(active) == 0:
+                break
+#
+#--- all records of a time earlier than bound are in the blocks now
+#
+            ends  = [bufs[k]['time'][-1] for k in active if done[k] == 0]
+            if len(ends) == 0:
+                bound = numpy.inf
+            else:
+                bound = min(ends)
+
+            out = []
+            for k in active:
+                if bound == numpy.inf:
+                    pos = len(bufs[k])
+                else:
+                    pos = numpy.searchsorted(bufs[k]['time'], bound, side='left')
+                out.append(bufs[k][:pos])
+                bufs[k] = bufs[k][pos:]
+
+            out = sort_block(numpy.concatenate(out))
+            out.tofile(fo)
+            nrec += len(out)
+    finally:
+        for f in files:
+            f.close()
+
+    return nrec
+
+#-----------------------------------------------------------------------------------------
+#-- sort_block: sort records in memory and drop duplicates                             ---
+#-----------------------------------------------------------------------------------------
+
+def sort_block(data):
+
+    """
+    sort records in memory by time (then tsc and fa) and drop exact duplicates and
+    records with both tsc and fa 0
+    input:  data    --- numpy array of records; see rec_dtype
+    output: numpy array of the sorted records
+    """
+
+    data = data[~((data['tsc'] == 0) & (data['fa'] == 0))]
+    if len(data) == 0:
+        return data
+#
+#--- records already in strictly increasing time (as the data file usually is) have no
+#--- duplicates and need no sort
+#
+    if numpy.all(data['time'][1:] > data['time'][:-1]):
+        return data
+
+    data = data[numpy.lexsort((data['fa'], data['tsc'], data['time']))]
+#
+#--- duplicates are next to each other after the sort
+#
+    keep     = numpy.ones(len(data), dtype=bool)
+    keep[1:] = (data['time'][1:] != data['time'][:-1]) | (data['tsc'][1:] != data['tsc'][:-1]) \
+             | (data['fa'][1:]   != data['fa'][:-1])
+
+    return data[keep]
+
+#-----------------------------------------------------------------------------------------
+#-- TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST    ---
+#-----------------------------------------------------------------------------------------
+
+class TestFunctions(unittest.TestCase):
+    """
+    testing functions
+    """
+#------------------------------------------------------------
+
+    def test_sort_block(self):
+
+        data = numpy.array([(2000.3, 1, 1), (2000.1, 2, 2), (2000.3, 1, 1), (2000.2, 0, 0), \
+                            (2000.1, 1, 5)], dtype=rec_dtype)
+        out  = sort_block(data)
+
+        self.assertEquals(out.tolist(), [(2000.1, 1, 5), (2000.1, 2, 2), (2000.3, 1, 1)])
+
+#------------------------------------------------------------
+
+    def test_sort_records(self):
+
+        wdir    = tempfile.mkdtemp()
+        outfile = os.path.join(wdir, 'sorted')
+        try:
+#
+#--- times repeat across the runs and some records appear in more than one run
+#
+            numpy.random.seed(1)
+            time = numpy.round(2000.0 + numpy.random.random(5000), 2)
+            data = numpy.zeros(5000, dtype=rec_dtype)
+            data['time'] = time
+            data['tsc']  = numpy.random.randint(0, 3, 5000)
+            data['fa']   = numpy.random.randint(0, 2, 5000)
+
+            nrec = sort_records(data, outfile, nrun=700, nblock=50)
+            out  = numpy.fromfile(outfile, dtype=rec_dtype)
+
+            self.assertEquals(nrec, len(out))
+            self.assertEquals(out.tolist(), sort_block(data).tolist())
+#
+#--- the run files are made next to the output and removed
+#
+            self.assertEquals(os.listdir(wdir), ['sorted'])
+        finally:
+            shutil.rmtree(wdir)
+
+#------------------------------------------------------------
+
+    def test_append_records(self):
+
+        wdir    = tempfile.mkdtemp()
+        outfile = os.path.join(wdir, 'sorted')
+        try:
+            data = numpy.array([(2000.1, 1, 1), (2000.3, 2, 2), (2000.2, 1, 1), (2000.3, 2, 2), \
+                                (2000.3, 3, 1), (2000.4, 1, 0), (2000.4, 1, 0), (2000.5, 0, 0)], \
+                               dtype=rec_dtype)
+#
+#--- parts in time order; the record repeated across the parts is dropped
+#
+            nrec  = append_records(data[:4], outfile, 0, nrun=3)
+            nrec += append_records(data[4:], outfile, nrec, nrun=3)
+            out   = numpy.fromfile(outfile, dtype=rec_dtype)
+
+            self.assertEquals(out.tolist(), sort_block(data).tolist())
+            self.assertEquals(nrec, len(out))
+#
+#--- a record before the end of the file
+#
+            self.assertEquals(append_records(data[2:3], outfile, nrec), -1)
+            self.assertEquals(append_records(data[-2:], outfile, nrec), 0)
+        finally:
+            shutil.rmtree(wdir)
+
+#-----------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    unittest.main()
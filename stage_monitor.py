@@ -0,0 +1,494 @@
+#!/usr/bin/env /proj/sot/ska/bin/python
+
+#############################################################################################
+#                                                                                           #
+#       stage_monitor.py:   time, cpu, memory and row counts of each stage of the scripts   #
+#                                                                                           #
+#           author: t. isobe (tisobe@cfa.harvard.edu)                                       #
+#                                                                                           #
+#           last update: Oct 18, 2026                                                       #
+#                                                                                           #
+#############################################################################################
+
+import os
+import sys
+import time
+import json
+import shutil
+import tempfile
+import timeit
+import resource
+import threading
+import cProfile
+import pstats
+import unittest
+
+#
+#--- one json line is appended for each run of run_all_sim_script
+#
+logfile     = '/data/mta/Script/Month/SIM/house_keeping/stage_log.jsonl'
+#
+#--- cProfile stats of the slowest stage are kept here as profile_<pipeline>_<stage>.prof
+#
+profile_dir = '/data/mta/Script/Month/SIM/house_keeping/'
+#
+#--- the stages are: read, parse, sort, bin, fetch, render and save
+#
+stage_names = ['read', 'parse', 'sort', 'bin', 'fetch', 'render', 'save']
+#
+#--- the monitor of the pipeline running in this thread; none if it is not monitored
+#
+current     = threading.local()
+#
+#--- cpu time of this thread: from getrusage if the system gives it (python 3 on linux),
+#--- otherwise from thread_stat (linux; in clock ticks of 10 ms). if neither works, the
+#--- cpu time of the whole process is used and the records say cpu_scope 'process'
+#
+rusage_who  = getattr(resource, 'RUSAGE_THREAD', None)
+thread_stat = '/proc/thread-self/stat'
+cpu_source  = None                      #--- 'rusage', 'proc' or 'process'; see cpu_time
+
+#-----------------------------------------------------------------------------------------
+#-- StageMonitor: the measurements of the stages of one pipeline                        --
+#-----------------------------------------------------------------------------------------
+
+class StageMonitor(object):
+    """
+    the measurements of the stages of one pipeline. a stage may be run many times
+    (e.g. once for each chunk); its wall time, cpu time and rows are added up. if
+    profile is 1, each stage is run under its own cProfile profiler, and the stats of
+    the slowest one are saved when the pipeline is finished
+    """
+
+    def __init__(self, pipeline, profile=0):
+
+        self.pipeline = pipeline
+        self.profile  = profile
+        self.stages   = {}
+        self.order    = []
+        self.prof     = {}
+        self.active   = 0
+        self.start0   = [timeit.default_timer(), cpu_time()]
+
+#------------------------------------------------------------
+
+    def start(self, name):
+        """
+        start a stage
+        input:  name    --- name of the stage
+        output: token   --- [name, wall start, cpu start, profiler or None]
+        """
+#
+#--- a stage started inside another stage is not profiled; only one profiler can run
+#
+        prof = None
+        if self.profile == 1 and self.active == 0:
+            if name not in self.prof:
+                self.prof[name] = cProfile.Profile()
+            prof = self.prof[name]
+            prof.enable()
+
+        self.active += 1
+
+        return [name, timeit.default_timer(), cpu_time(), prof]
+
+#------------------------------------------------------------
+
+    def stop(self, token, rows=0):
+        """
+        stop a stage and add the measurements to it
+        input:  token   --- the token given by start
+                rows    --- the number of rows processed
+        output: updated self.stages
+        """
+
+        [name, wall, cpu, prof] = token
+        if prof is not None:
+            prof.disable()
+
+        wall = timeit.default_timer() - wall
+        cpu  = cpu_time() - cpu
+        self.active -= 1
+
+        if name not in self.stages:
+            self.stages[name] = {'stage': name, 'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'rows': 0}
+            self.order.append(name)
+
+        ent = self.stages[name]
+        ent['calls'] += 1
+        ent['wall']  += wall
+        ent['cpu']   += cpu
+        ent['rows']  += int(rows)
+        ent['peak_rss_kb'] = peak_rss()
+
+#------------------------------------------------------------
+
+    def finish(self):
+        """
+        finish the pipeline and give its record
+        input:  none
+        output: a dictionary of pipeline, wall, cpu, cpu_scope, peak_rss_kb, stages (a
+                list of dictionaries of stage, calls, wall, cpu, rows, peak_rss_kb) and
+                profile (the stats file of the slowest stage; '' if not profiled).
+                cpu_scope is 'thread', or 'process' if the cpu times are of the whole
+                process, which includes the other threads running at the same time
+            <profile_dir>/profile_<pipeline>_<stage>.prof, if profiled
+        """
+
+        out = {'pipeline': self.pipeline}
+        out['wall']        = timeit.default_timer() - self.start0[0]
+        out['cpu']         = cpu_time() - self.start0[1]
+        out['cpu_scope']   = cpu_scope()
+        out['peak_rss_kb'] = peak_rss()
+        out['stages']      = [self.stages[name] for name in self.order]
+        out['profile']     = ''
+#
+#--- the profilers can not be passed between processes; the stats are saved here
+#
+        slow = slowest_stage(out['stages'])
+        if slow is not None and slow['stage'] in self.prof:
+            pfile = os.path.join(profile_dir, 'profile_' + self.pipeline + '_' + slow['stage'] + '.prof')
+            self.prof[slow['stage']].dump_stats(pfile)
+            out['profile'] = pfile
+
+        return out
+
+#-----------------------------------------------------------------------------------------
+#-- begin: start monitoring the pipeline run in this thread                             --
+#-----------------------------------------------------------------------------------------
+
+def begin(pipeline, profile=0):
+
+    """
+    start monitoring the pipeline run in this thread
+    input:  pipeline    --- name of the pipeline
+            profile     --- if 1, profile each stage with cProfile
+    output: StageMonitor object
+    """
+
+    current.monitor = StageMonitor(pipeline, profile)
+
+    return current.monitor
+
+#-----------------------------------------------------------------------------------------
+#-- end: stop monitoring the pipeline run in this thread                                --
+#-----------------------------------------------------------------------------------------
+
+def end():
+
+    """
+    stop monitoring the pipeline run in this thread
+    input:  none
+    output: the record of the pipeline; see StageMonitor.finish. None if not monitored
+    """
+
+    monitor = getattr(current, 'monitor', None)
+    current.monitor = None
+
+    if monitor is None:
+        return None
+
+    return monitor.finish()
+
+#-----------------------------------------------------------------------------------------
+#-- start: start a stage                                                                --
+#-----------------------------------------------------------------------------------------
+
+def start(name):
+
+    """
+    start a stage. nothing is done if the pipeline is not monitored
+    input:  name    --- name of the stage; one of stage_names
+    output: token   --- pass it to stop; None if not monitored
+    """
+
+    monitor = getattr(current, 'monitor', None)
+    if monitor is None:
+        return None
+
+    return [monitor, monitor.start(name)]
+
+#-----------------------------------------------------------------------------------------
+#-- stop: stop a stage                                                                  --
+#-----------------------------------------------------------------------------------------
+
+def stop(token, rows=0):
+
+    """
+    stop a stage
+    input:  token   --- the token given by start
+            rows    --- the number of rows processed in the stage
+    output: the measurements are added to the monitor of the pipeline
+    """
+
+    if token is None:
+        return
+
+    token[0].stop(token[1], rows)
+
+#-----------------------------------------------------------------------------------------
+#-- slowest_stage: find the stage with the longest wall time                            --
+#-----------------------------------------------------------------------------------------
+
+def slowest_stage(stages):
+
+    """
+    find the stage with the longest wall time
+    input:  stages  --- a list of stage records; see StageMonitor.finish
+    output: the stage record; None if the list is empty
+    """
+
+    slow = None
+    for ent in stages:
+        if slow is None or ent['wall'] > slow['wall']:
+            slow = ent
+
+    return slow
+
+#-----------------------------------------------------------------------------------------
+#-- write_log: append a record to the log                                               --
+#-----------------------------------------------------------------------------------------
+
+def write_log(record, lfile=''):
+
+    """
+    append a record to the log as a json line
+    input:  record  --- a dictionary
+            lfile   --- log file; default: logfile
+    output: lfile
+    """
+
+    if lfile == '':
+        lfile = logfile
+
+    line = json.dumps(record, sort_keys=True) + '\n'
+#
+#--- one write of a line; runs appending at the same time do not mix their lines
+#
+    fd = os.open(lfile, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line.encode('ascii'))
+    finally:
+        os.close(fd)
+
+#-----------------------------------------------------------------------------------------
+#-- print_profile: print the saved cProfile stats                                       --
+#-----------------------------------------------------------------------------------------
+
+def print_profile(pfile, limit=25):
+
+    """
+    print the saved cProfile stats, sorted by the cumulative time
+    input:  pfile   --- stats file
+            limit   --- the number of functions to print
+    output: printed stats
+    """
+
+    stats = pstats.Stats(pfile)
+    stats.sort_stats('cumulative').print_stats(limit)
+
+#-----------------------------------------------------------------------------------------
+#-- cpu_time: give the cpu time used so far                                             --
+#-----------------------------------------------------------------------------------------
+
+def cpu_time():
+
+    """
+    give the user + system cpu time used so far by this thread, or by this process
+    if the system does not give the time of a thread (see cpu_scope)
+    input:  none
+    output: cpu time in sec
+    """
+
+    global cpu_source
+
+    if cpu_source is None:
+        cpu_source = 'process'
+        if rusage_who is not None:
+            cpu_source = 'rusage'
+        else:
+            try:
+                thread_cpu_time()
+                cpu_source = 'proc'
+            except:
+                pass
+
+    if cpu_source == 'rusage':
+        use = resource.getrusage(rusage_who)
+    elif cpu_source == 'proc':
+        return thread_cpu_time()
+    else:
+        use = resource.getrusage(resource.RUSAGE_SELF)
+
+    return use.ru_utime + use.ru_stime
+
+#-----------------------------------------------------------------------------------------
+#-- cpu_scope: tell whether cpu_time gives the time of this thread                      --
+#-----------------------------------------------------------------------------------------
+
+def cpu_scope():
+
+    """
+    tell whether cpu_time gives the time of this thread
+    input:  none
+    output: 'thread', or 'process' if it gives the time of the whole process
+    """
+
+    cpu_time()
+    if cpu_source == 'process':
+        return 'process'
+
+    return 'thread'
+
+#-----------------------------------------------------------------------------------------
+#-- thread_cpu_time: read the cpu time of this thread from /proc                        --
+#-----------------------------------------------------------------------------------------
+
+def thread_cpu_time():
+
+    """
+    read the user + system cpu time of this thread from thread_stat
+    input:  none, but read from thread_stat
+    output: cpu time in sec; an exception is raised if it cannot be read
+    """
+
+    f    = open(thread_stat, 'r')
+    line = f.read()
+    f.close()
+#
+#--- the fields after the command name (in parentheses) start with the state (3rd field);
+#--- utime and stime are the 14th and 15th fields
+#
+    vals = line[line.rindex(')') + 1:].split()
+
+    return (float(vals[11]) + float(vals[12])) / os.sysconf('SC_CLK_TCK')
+
+#-----------------------------------------------------------------------------------------
+#-- peak_rss: give the peak resident memory of this process                             --
+#-----------------------------------------------------------------------------------------
+
+def peak_rss():
+
+    """
+    give the peak resident memory of this process so far
+    input:  none
+    output: peak rss in KB
+    """
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+#-----------------------------------------------------------------------------------------
+#-- run_time: give the current time for the log                                         --
+#-----------------------------------------------------------------------------------------
+
+def run_time():
+
+    """
+    give the current time for the log
+    input:  none
+    output: time in <yyyy>-<mm>-<dd>T<hh>:<mm>:<ss>
+    """
+
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime())
+
+#-----------------------------------------------------------------------------------------
+#-- TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST    ---
+#-----------------------------------------------------------------------------------------
+
+class TestFunctions(unittest.TestCase):
+    """
+    testing functions
+    """
+#------------------------------------------------------------
+
+    def test_stage_monitor(self):
+#
+#--- nothing is recorded if the pipeline is not monitored
+#
+        self.assertEquals(start('read'), None)
+        stop(None, 10)
+
+        begin('test')
+        for k in range(0, 3):
+            token = start('parse')
+            stop(token, 100)
+        token = start('bin')
+        stop(token, 300)
+        out = end()
+
+        self.assertEquals(out['pipeline'], 'test')
+        self.assertEquals([x['stage'] for x in out['stages']], ['parse', 'bin'])
+        self.assertEquals(out['stages'][0]['calls'], 3)
+        self.assertEquals(out['stages'][0]['rows'], 300)
+        self.assertEquals(out['profile'], '')
+        self.assertEquals(out['cpu_scope'] in ['thread', 'process'], True)
+        self.assertEquals(end(), None)
+
+#------------------------------------------------------------
+
+    def test_profile(self):
+
+        global profile_dir
+        save        = profile_dir
+        wdir        = tempfile.mkdtemp()
+        try:
+            profile_dir = wdir
+
+            begin('ztest', profile=1)
+            token = start('bin')
+            sum([x * x for x in range(0, 100000)])
+            stop(token, 100000)
+            token = start('save')
+            stop(token)
+            out = end()
+
+            self.assertEquals(out['profile'], os.path.join(wdir, 'profile_ztest_bin.prof'))
+            self.assertEquals(os.path.isfile(out['profile']), True)
+        finally:
+            profile_dir = save
+            shutil.rmtree(wdir)
+
+#------------------------------------------------------------
+
+    def test_thread_cpu_time(self):
+#
+#--- the time of this thread only; another busy thread does not add to it
+#
+        if not os.path.isfile(thread_stat):
+            return
+
+        def busy():
+            end = time.time() + 0.5
+            while time.time() < end:
+                pass
+
+        cpu0 = thread_cpu_time()
+        job  = threading.Thread(target=busy)
+        job.start()
+        job.join()
+
+        self.assertEquals(thread_cpu_time() - cpu0 < 0.2, True)
+
+#------------------------------------------------------------
+
+    def test_write_log(self):
+
+        wdir  = tempfile.mkdtemp()
+        lfile = os.path.join(wdir, 'stage_log.jsonl')
+        try:
+            write_log({'run': 1}, lfile)
+            write_log({'run': 2}, lfile)
+
+            f    = open(lfile, 'r')
+            data = [json.loads(line) for line in f.readlines()]
+            f.close()
+        finally:
+            shutil.rmtree(wdir)
+
+        self.assertEquals(data, [{'run': 1}, {'run': 2}])
+
+#-----------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,538 @@
+#!/usr/bin/env /proj/sot/ska/bin/python
+
+#############################################################################################
+#                                                                                           #
+#       telemetry_source.py:    read 5 min averages of aorwspd1-6 telemetry                 #
+#                                                                                           #
+#           author: t. isobe (tisobe@cfa.harvard.edu)                                       #
+#                                                                                           #
+#           last update: Oct 18, 2026                                                       #
+#                                                                                           #
+#############################################################################################
+
+import os
+import sys
+import re
+import json
+import shutil
+import tempfile
+import time as systime
+import numpy
+import unittest
+from multiprocessing.pool import ThreadPool
+#
+#--- the columns read; 5 min averages of the reaction wheel speed
+#
+aorwspd_cols = ['AORWSPD1_AVG', 'AORWSPD2_AVG', 'AORWSPD3_AVG',\
+                'AORWSPD4_AVG', 'AORWSPD5_AVG', 'AORWSPD6_AVG']
+#
+#--- local archive of the telemetry; if this directory exists, it is used in place of dataseeker
+#
+archive_dir = '/data/mta/Script/Month/SIM/house_keeping/aorwspd_archive'
+#
+#--- dataseeker login info. pyfits, Ska.Shell and the ascds environment are needed only
+#--- when data are extracted with dataseeker (see get_ascds_env)
+#
+loginfile = '/data/mta/Script/Month/SIM/house_keeping/loginfile'
+ascdsenv  = None
+envfile   = '/data/mta/Script/Month/SIM/house_keeping/ascds_env'
+envttl    = 86400                       #--- the saved environment is used for a day
+#
+#--- dataseeker extraction: the number of concurrent jobs, the number of retries of a
+#--- failed job and the time limit of a job in sec
+#
+workers   = 4
+retries   = 2
+timeout   = 1800
+#
+#--- the data cover an interval if they have samples within this (sec; one 5 min sample)
+#--- of both ends of it
+#
+cover_margin = 300.0
+#
+#--- the source in use; see get_source
+#
+source = None
+
+#-----------------------------------------------------------------------------------------
+#-- TelemetrySource: the interface of the telemetry sources                             --
+#-----------------------------------------------------------------------------------------
+
+class TelemetrySource(object):
+    """
+    the interface of the telemetry sources. a source gives the 5 min averages of
+    aorwspd1-6 in a time interval as numpy array of (N, 6), or None if it could not
+    read the interval (the extraction failed, or the data do not cover it yet)
+    """
+
+    def fetch(self, tstart, tstop):
+        """
+        give the 5 min averages of aorwspd1-6 in the interval
+        input:  tstart  --- start time in seconds from 1998.1.1
+                tstop   --- stop time in seconds from 1998.1.1
+        output: numpy float64 array of (N, 6); None if the interval could not be read
+        """
+
+        raise NotImplementedError
+
+#------------------------------------------------------------
+
+    def fetch_many(self, intervals):
+        """
+        give the 5 min averages of aorwspd1-6 for each of the intervals
+        input:  intervals   --- a list of [tstart, tstop]
+        output: a list of numpy float64 array of (N, 6); None for an interval
+                which could not be read
+        """
+
+        return [self.fetch(tstart, tstop) for [tstart, tstop] in intervals]
+
+#-----------------------------------------------------------------------------------------
+#-- DataseekerSource: extract the telemetry with dataseeker.pl                          --
+#-----------------------------------------------------------------------------------------
+
+class DataseekerSource(TelemetrySource):
+    """
+    extract the telemetry with dataseeker.pl. each extraction runs in its own temp
+    directory (dataseeker needs "test", "param" and the output fits file in the
+    current directory), so that several months can be extracted at the same time.
+    """
+
+    def __init__(self, nworker=None, nretry=None, tlimit=None):
+#
+#--- the module settings (workers, retries, timeout) are used if not given
+#
+        self.nworker = workers if nworker is None else nworker
+        self.nretry  = retries if nretry  is None else nretry
+        self.tlimit  = timeout if tlimit  is None else tlimit
+
+#------------------------------------------------------------
+
+    def fetch(self, tstart, tstop):
+
+        out = self.run_job([tstart, tstop])
+        if out is None or len(out[1]) == 0:
+            return None
+
+        return out[1]
+
+#------------------------------------------------------------
+
+    def fetch_many(self, intervals):
+#
+#--- the intervals are extracted in a pool of nworker threads; with one worker,
+#--- one dataseeker run covers all intervals and each interval is cut out by time
+#
+        if len(intervals) == 0:
+            return []
+
+        get_ascds_env()                 #--- set up the environment once for all jobs
+
+        if self.nworker <= 1:
+            tstart = min([x[0] for x in intervals])
+            tstop  = max([x[1] for x in intervals])
+            out    = self.run_job([tstart, tstop])
+            if out is None:
+                return [None] * len(intervals)
+
+            [time, data] = out
+            order = numpy.argsort(time, kind='mergesort')
+
+            return cut_intervals(time[order], data[order], intervals)
+
+        pool = ThreadPool(min(self.nworker, len(intervals)))
+        out  = pool.map(self.run_job, intervals)
+        pool.close()
+        pool.join()
+
+        return [None if x is None or len(x[1]) == 0 else x[1] for x in out]
+
+#------------------------------------------------------------
+
+    def run_job(self, interval):
+        """
+        extract the data of an interval; retry nretry times if it fails
+        input:  interval    --- [tstart, tstop]
+        output: [time, data] or None if all tries failed; the last error is printed
+        """
+
+        [tstart, tstop] = interval
+
+#
+#--- the errors are e.g. IOError if dataseeker gave no output (a bad loginfile or the
+#--- time limit), ImportError if pyfits or Ska.Shell is not available
+#
+        last = None
+        for k in range(0, self.nretry + 1):
+            try:
+                return self.extract(tstart, tstop)
+            except Exception as err:
+                last = err
+
+        print('dataseeker failed for ' + str(tstart) + ' - ' + str(tstop) + ' after '  \
+              + str(self.nretry + 1) + ' tries: ' + repr(last))
+
+        return None
+
+#------------------------------------------------------------
+
+    def extract(self, tstart, tstop):
+        """
+        run dataseeker in a temp directory and read the output
+        input:  tstart  --- start time in seconds from 1998.1.1
+                tstop   --- stop time in seconds from 1998.1.1
+        output: [time, data]    --- time array and (N, 6) array of aorwspd1-6
+                an exception is raised if dataseeker did not create the output
+        """
+
+        wdir = tempfile.mkdtemp(prefix='aorwspd_')
+        try:
+            f    = open(os.path.join(wdir, 'test'), 'w')    #-- we need an empty "test" file
+            f.close()
+            os.mkdir(os.path.join(wdir, 'param'))           #-- and an empty param directory
+
+            line = 'columns=_aorwspd1_avg,'
+            line = line + '_aorwspd2_avg,'
+            line = line + '_aorwspd3_avg,'
+            line = line + '_aorwspd4_avg,'
+            line = line + '_aorwspd5_avg,'
+            line = line + '_aorwspd6_avg'
+            line = line + ' timestart=' + str(tstart)
+            line = line + ' timestop='  + str(tstop)
+
+            cmd = 'cd ' + wdir + "; /usr/bin/env PERL5LIB='' timeout " + str(self.tlimit)
+            cmd = cmd + ' dataseeker.pl infile=test outfile=ztemp.fits search_crit="'
+            cmd = cmd + line + '"  loginFile="' + loginfile + '"'
+#
+#--- run dataseeker
+#
+            from Ska.Shell import bash
+
+            bash(cmd, env=get_ascds_env())
+#
+#--- read fits file
+#
+            fits = os.path.join(wdir, 'ztemp.fits')
+            if not os.path.isfile(fits):
+                raise IOError('dataseeker did not create the output; check loginfile ' \
+                              + loginfile + ' and the time limit of ' + str(self.tlimit) + ' sec')
+
+            return read_fits_file(fits)
+
+        finally:
+            shutil.rmtree(wdir, ignore_errors=True)
+
+#-----------------------------------------------------------------------------------------
+#-- ArchiveSource: read the telemetry from a directory of fits/csv files                --
+#-----------------------------------------------------------------------------------------
+
+class ArchiveSource(TelemetrySource):
+    """
+    read the telemetry from a directory of fits (*.fits, *.fits.gz) or csv (*.csv)
+    files of 5 min averages. each file has a time column (TIME, seconds from 1998.1.1)
+    and AORWSPD1_AVG - AORWSPD6_AVG columns; the first line of a csv file is the
+    column names. all files are read once and kept in memory, so that any number of
+    intervals are cut out without reading the files again.
+    """
+
+    def __init__(self, path):
+
+        self.path = path
+        self.time = None
+        self.data = None
+
+#------------------------------------------------------------
+
+    def load(self):
+        """
+        read all files of the archive
+        input:  none, but read from self.path
+        output: self.time   --- numpy array of time, sorted
+                self.data   --- numpy array of (N, 6) of aorwspd1-6
+        """
+
+        if self.time is not None:
+            return
+
+        tlist = []
+        dlist = []
+        for name in sorted(os.listdir(self.path)):
+            fname = os.path.join(self.path, name)
+            if name.endswith('.csv'):
+                [time, data] = read_csv_file(fname)
+            elif name.endswith('.fits') or name.endswith('.fits.gz'):
+                [time, data] = read_fits_file(fname)
+            else:
+                continue
+
+            tlist.append(time)
+            dlist.append(data)
+
+        if len(tlist) == 0:
+            self.time = numpy.zeros(0)
+            self.data = numpy.zeros((0, len(aorwspd_cols)))
+            return
+
+        time  = numpy.concatenate(tlist)
+        data  = numpy.concatenate(dlist)
+        order = numpy.argsort(time, kind='mergesort')
+
+        self.time = time[order]
+        self.data = data[order]
+
+#------------------------------------------------------------
+
+    def fetch(self, tstart, tstop):
+
+        self.load()
+
+        return cut_intervals(self.time, self.data, [[tstart, tstop]])[0]
+
+#-----------------------------------------------------------------------------------------
+#-- get_source: give the telemetry source in use                                        --
+#-----------------------------------------------------------------------------------------
+
+def get_source():
+
+    """
+    give the telemetry source in use: the local archive if archive_dir exists,
+    otherwise dataseeker
+    input:  none
+    output: source  --- TelemetrySource object
+    """
+
+    global source
+
+    if source is None:
+        if os.path.isdir(archive_dir):
+            source = ArchiveSource(archive_dir)
+        else:
+            source = DataseekerSource()
+
+    return source
+
+#-----------------------------------------------------------------------------------------
+#-- set_source: set the telemetry source to be used                                     --
+#-----------------------------------------------------------------------------------------
+
+def set_source(new_source):
+
+    """
+    set the telemetry source to be used
+    input:  new_source  --- TelemetrySource object; None to go back to the default
+    output: none
+    """
+
+    global source
+
+    source = new_source
+
+#-----------------------------------------------------------------------------------------
+#-- cut_intervals: cut the data in each interval out                                    --
+#-----------------------------------------------------------------------------------------
+
+def cut_intervals(time, data, intervals):
+
+    """
+    cut the data in each interval out
+    input:  time        --- numpy array of time, sorted
+            data        --- numpy array of (N, 6) of aorwspd1-6
+            intervals   --- a list of [tstart, tstop]; both ends are included
+    output: a list of numpy array of (n, 6); None for an interval which the data do
+            not cover (see cover_margin), or in which there are no data
+    """
+
+    out = []
+    for [tstart, tstop] in intervals:
+        i = numpy.searchsorted(time, tstart, side='left')
+        j = numpy.searchsorted(time, tstop,  side='right')
+        if j <= i or time[0] > tstart + cover_margin or time[-1] < tstop - cover_margin:
+            out.append(None)
+        else:
+            out.append(data[i:j])
+
+    return out
+
+#-----------------------------------------------------------------------------------------
+#-- read_fits_file: read time and aorwspd1-6 columns from a fits file                   --
+#-----------------------------------------------------------------------------------------
+
+def read_fits_file(fname):
+
+    """
+    read time and aorwspd1-6 columns from a fits file
+    input:  fname   --- fits file name
+    output: [time, data]    --- time array and (N, 6) array of aorwspd1-6
+    """
+
+    import pyfits
+
+    dout = pyfits.getdata(fname)
+    data = numpy.column_stack([numpy.asarray(dout.field(col), dtype=numpy.float64) \
+                               for col in aorwspd_cols])
+    try:
+        time = numpy.asarray(dout.field('TIME'), dtype=numpy.float64)
+    except:
+        time = numpy.zeros(len(data))
+
+    return [time, data]
+
+#-----------------------------------------------------------------------------------------
+#-- read_csv_file: read time and aorwspd1-6 columns from a csv file                     --
+#-----------------------------------------------------------------------------------------
+
+def read_csv_file(fname):
+
+    """
+    read time and aorwspd1-6 columns from a csv file
+    input:  fname   --- csv file name; the first line is the column names
+    output: [time, data]    --- time array and (N, 6) array of aorwspd1-6
+    """
+
+    f    = open(fname, 'r')
+    head = [x.strip().upper() for x in f.readline().split(',')]
+    f.close()
+
+    pos  = [head.index('TIME')] + [head.index(col) for col in aorwspd_cols]
+    vals = numpy.loadtxt(fname, delimiter=',', skiprows=1, usecols=pos, ndmin=2)
+
+    return [vals[:, 0], vals[:, 1:]]
+
+#-----------------------------------------------------------------------------------------
+#-- get_ascds_env: get the ascds environment needed to run dataseeker                   --
+#-----------------------------------------------------------------------------------------
+
+def get_ascds_env():
+
+    """
+    get the ascds environment needed to run dataseeker. sourcing .ascrc takes a few
+    seconds, so the environment is saved in envfile and reused for envttl seconds
+    input:  none, but read from envfile
+    output: ascdsenv    --- a dictionary of the environment variables
+    """
+
+    global ascdsenv
+
+    if ascdsenv is not None:
+        return ascdsenv
+#
+#--- use the saved environment if it is new enough
+#
+    try:
+        if systime.time() - os.path.getmtime(envfile) < envttl:
+            f        = open(envfile, 'r')
+            saved    = json.load(f)
+            f.close()
+#
+#--- json gives unicode; the environment for the subprocess must be plain strings
+#
+            ascdsenv = dict([(str(k), str(v)) for (k, v) in saved.items()])
+            return ascdsenv
+    except:
+        pass
+
+    from Ska.Shell import getenv
+
+    ascdsenv = getenv('source /home/ascds/.ascrc -r release', shell='tcsh')
+
+    try:
+        tmp = envfile + '~'
+        fo  = open(tmp, 'w')
+        os.chmod(tmp, 0o600)
+        json.dump(ascdsenv, fo)
+        fo.close()
+        os.rename(tmp, envfile)
+    except:
+        pass
+
+    return ascdsenv
+
+#-----------------------------------------------------------------------------------------
+#-- TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST    ---
+#-----------------------------------------------------------------------------------------
+
+class TestFunctions(unittest.TestCase):
+    """
+    testing functions
+    """
+#------------------------------------------------------------
+
+    def test_archive_source(self):
+
+        tdir = tempfile.mkdtemp()
+        try:
+#
+#--- two files; the rows are not in time order across the files
+#
+            fo = open(tdir + '/b.csv', 'w')
+            fo.write('time,aorwspd1_avg,aorwspd2_avg,aorwspd3_avg,aorwspd4_avg,aorwspd5_avg,aorwspd6_avg\n')
+            fo.write('300,3,3,3,3,3,-3\n')
+            fo.write('400,4,4,4,4,4,-4\n')
+            fo.close()
+            fo = open(tdir + '/a.csv', 'w')
+            fo.write('AORWSPD6_AVG,AORWSPD5_AVG,AORWSPD4_AVG,AORWSPD3_AVG,AORWSPD2_AVG,AORWSPD1_AVG,TIME\n')
+            fo.write('-1,1,1,1,1,1,100\n')
+            fo.write('-2,2,2,2,2,2,200\n')
+            fo.close()
+
+            src  = ArchiveSource(tdir)
+            data = src.fetch(200, 300)
+
+            self.assertEquals(data.shape, (2, 6))
+            self.assertEquals(data[:, 0].tolist(), [2.0, 3.0])
+            self.assertEquals(data[:, 5].tolist(), [-2.0, -3.0])
+
+            out = src.fetch_many([[0, 150], [800, 900]])
+            self.assertEquals(len(out[0]), 1)
+            self.assertEquals(out[1], None)
+#
+#--- the archive does not reach the end of the interval
+#
+            self.assertEquals(src.fetch(300, 1000), None)
+        finally:
+            shutil.rmtree(tdir)
+
+#------------------------------------------------------------
+
+    def test_dataseeker_jobs(self):
+#
+#--- dataseeker is replaced by a job which fails on the first try of each interval
+#
+        class FlakySource(DataseekerSource):
+            def extract(self, tstart, tstop):
+                if tstart not in self.tried:
+                    self.tried.append(tstart)
+                    raise IOError('failed')
+                return [numpy.array([tstart]), numpy.zeros((1, 6)) + tstart]
+
+        global ascdsenv
+        save     = ascdsenv
+        ascdsenv = {}
+
+        src       = FlakySource(nworker=3, nretry=1)
+        src.tried = []
+        out       = src.fetch_many([[1, 2], [3, 4], [5, 6]])
+        self.assertEquals([x[0, 0] for x in out], [1.0, 3.0, 5.0])
+
+        src       = FlakySource(nworker=3, nretry=0)
+        src.tried = []
+        self.assertEquals(src.fetch_many([[1, 2], [3, 4]]), [None, None])
+
+        src.tried = []
+        self.assertEquals(src.fetch(1, 2), None)
+#
+#--- an interrupt is not taken as a failed try
+#
+        class StopSource(DataseekerSource):
+            def extract(self, tstart, tstop):
+                raise KeyboardInterrupt
+
+        self.assertRaises(KeyboardInterrupt, StopSource(nretry=2).run_job, [1, 2])
+
+        ascdsenv = save
+
+#-----------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    unittest.main()
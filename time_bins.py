@@ -0,0 +1,254 @@
+#!/usr/bin/env /proj/sot/ska/bin/python
+
+#############################################################################################
+#                                                                                           #
+#       time_bins.py:   monthly, weekly, daily or custom time bins of the sim scripts       #
+#                                                                                           #
+#           author: t. isobe (tisobe@cfa.harvard.edu)                                       #
+#                                                                                           #
+#           last update: Oct 18, 2026                                                       #
+#                                                                                           #
+#############################################################################################
+
+import os
+import sys
+import threading
+import numpy
+import unittest
+
+import frac_year            as fyr
+#
+#--- the first day of each month (and the day after the year) in day of year from 0
+#
+month_days      = [0.0, 31.0, 59.0, 90.0, 120.0, 151.0, 181.0, 212.0, 243.0, 273.0, 304.0, 334.0, 365.0]
+leap_month_days = [0.0, 31.0, 60.0, 91.0, 121.0, 152.0, 182.0, 213.0, 244.0, 274.0, 305.0, 335.0, 366.0]
+#
+#--- bin widths in days of the named resolutions; 'monthly' follows the calendar
+#
+widths     = {'daily': 1, 'weekly': 7}
+#
+#--- edges already made: (resolution, ystart, ystop, mstop): numpy array
+#
+edge_cache = {}
+cache_lock = threading.Lock()
+
+#-----------------------------------------------------------------------------------------
+#-- bin_edges: give the bin edges of a resolution                                      ---
+#-----------------------------------------------------------------------------------------
+
+def bin_edges(resolution, ystart, ystop, mstop=12):
+
+    """
+    give the bin edges of a resolution. the edges of each resolution and period are
+    made only once; do not change the array
+    input:  resolution  --- 'monthly', 'weekly', 'daily' or a bin width in days
+            ystart      --- the first year
+            ystop       --- the last year
+            mstop       --- the last month of the last year
+    output: numpy array of the bin edges in fractional year from <ystart>.0 to the end
+            of the month <mstop> of <ystop>. a day boundary is <year> + <days>/<365 or
+            366>; the last bin of a custom width may be shorter
+    """
+
+    key = (resolution, ystart, ystop, mstop)
+    if key in edge_cache:
+        return edge_cache[key]
+
+    if resolution == 'monthly':
+        edges = month_edges(ystart, ystop, mstop)
+    else:
+        width = widths.get(resolution, resolution)
+        edges = width_edges(ystart, ystop, mstop, int(width))
+
+    edges.flags.writeable = False
+
+    cache_lock.acquire()
+    try:
+        edge_cache[key] = edges
+    finally:
+        cache_lock.release()
+
+    return edges
+
+#-----------------------------------------------------------------------------------------
+#-- month_edges: make the month boundaries                                             ---
+#-----------------------------------------------------------------------------------------
+
+def month_edges(ystart, ystop, mstop=12):
+
+    """
+    make the month boundaries
+    input:  ystart  --- the first year
+            ystop   --- the last year
+            mstop   --- the last month of the last year
+    output: numpy array of the month boundaries in fractional year
+    """
+
+    out = [[float(ystart)]]
+    for year in range(ystart, ystop + 1):
+        base = fyr.year_base[year]
+        if base == 366.0:
+            days = leap_month_days
+        else:
+            days = month_days
+
+        nmon = 12
+        if year == ystop:
+            nmon = mstop
+#
+#--- the end of december is <year + 1>.0 exactly
+#
+        bound = year + numpy.array(days[1:nmon+1]) / base
+        if nmon == 12:
+            bound[-1] = year + 1.0
+        out.append(bound)
+
+    return numpy.concatenate(out)
+
+#-----------------------------------------------------------------------------------------
+#-- width_edges: make bin boundaries of a number of days                               ---
+#-----------------------------------------------------------------------------------------
+
+def width_edges(ystart, ystop, mstop=12, width=1):
+
+    """
+    make bin boundaries of a number of days
+    input:  ystart  --- the first year
+            ystop   --- the last year
+            mstop   --- the last month of the last year
+            width   --- bin width in days
+    output: numpy array of the bin boundaries in fractional year
+    """
+
+    out = []
+    for year in range(ystart, ystop + 1):
+        base = fyr.year_base[year]
+        if base == 366.0:
+            days = leap_month_days
+        else:
+            days = month_days
+
+        nday = int(days[12])
+        if year == ystop:
+            nday = int(days[mstop])
+
+        out.append(year + numpy.arange(0, nday) / base)
+#
+#--- the end of the period
+#
+    base = fyr.year_base[ystop]
+    if mstop == 12:
+        out.append([ystop + 1.0])
+    elif base == 366.0:
+        out.append([ystop + leap_month_days[mstop] / base])
+    else:
+        out.append([ystop + month_days[mstop] / base])
+
+    days  = numpy.concatenate(out)
+    edges = days[::width]
+    if edges[-1] < days[-1]:
+        edges = numpy.concatenate([edges, days[-1:]])
+
+    return edges
+
+#-----------------------------------------------------------------------------------------
+#-- edge_lists: give the bin edges as lists of the bin start and stop time             ---
+#-----------------------------------------------------------------------------------------
+
+def edge_lists(edges):
+
+    """
+    give the bin edges as lists of the bin start and stop time
+    input:  edges   --- numpy array of the bin edges
+    output: [blist, elist] lists of the bin starting and stopping time
+    """
+
+    return [edges[:-1].tolist(), edges[1:].tolist()]
+
+#-----------------------------------------------------------------------------------------
+#-- bin_index: find the bin of each time                                               ---
+#-----------------------------------------------------------------------------------------
+
+def bin_index(edges, time):
+
+    """
+    find the bin of each time
+    input:  edges   --- numpy array of the bin edges
+            time    --- numpy array of time
+    output: numpy array of the bin index; -1 if before the first bin, and the number of
+            the bins if at or after the end of the last bin
+    """
+
+    return numpy.searchsorted(edges, time, side='right') - 1
+
+#-----------------------------------------------------------------------------------------
+#-- bin_sums: sum values in each bin                                                   ---
+#-----------------------------------------------------------------------------------------
+
+def bin_sums(edges, time, weights=None, first=0):
+
+    """
+    sum values in each bin
+    input:  edges   --- numpy array of the bin edges
+            time    --- numpy array of time
+            weights --- numpy array of the values; if None, count the entries
+            first   --- the first bin to sum; the values in the bins before it are dropped
+    output: numpy array of the sums of the bins
+    """
+
+    blen = len(edges) - 1
+    if blen <= 0:
+        return numpy.zeros(0)
+
+    pos  = bin_index(edges, numpy.asarray(time, dtype=numpy.float64))
+    mask = (pos >= first) & (pos < blen)
+
+    if weights is None:
+        return numpy.bincount(pos[mask], minlength=blen)
+
+    return numpy.bincount(pos[mask], weights=numpy.asarray(weights)[mask], minlength=blen)
+
+#-----------------------------------------------------------------------------------------
+#-- TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST TEST    ---
+#-----------------------------------------------------------------------------------------
+
+class TestFunctions(unittest.TestCase):
+    """
+    testing functions
+    """
+#------------------------------------------------------------
+
+    def test_bin_edges(self):
+
+        out = [2013.0, 2013.0849315068492, 2013.1616438356164, 2013.2465753424658, 2013.3287671232877, 2013.4136986301369, 2013.495890410959, 2013.5808219178082, 2013.6657534246576, 2013.7479452054795, 2013.8328767123287, 2013.9150684931508, 2014.0, 2014.0849315068492, 2014.1616438356164]
+
+        edges = bin_edges('monthly', 2013, 2014, 2)
+        self.assertEquals(edges.tolist(), out)
+        self.assertEquals(bin_edges('monthly', 2013, 2014, 2) is edges, True)
+
+        days  = bin_edges('daily', 2013, 2014, 2)
+        self.assertEquals(len(days), 365 + 59 + 1)
+        self.assertEquals(days[31], out[1])
+        self.assertEquals(days[-1], out[-1])
+
+        weeks = bin_edges('weekly', 2013, 2014, 2)
+        self.assertEquals(weeks.tolist(), days[::7].tolist() + [out[-1]])
+        self.assertEquals(bin_edges(10, 2012, 2012)[-1], 2013.0)
+
+#------------------------------------------------------------
+
+    def test_bin_sums(self):
+
+        edges = numpy.array([2000.0, 2000.1, 2000.2, 2000.3])
+        time  = numpy.array([1999.9, 2000.05, 2000.1, 2000.15, 2000.25, 2000.3])
+        vals  = numpy.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+
+        self.assertEquals(bin_index(edges, time).tolist(), [-1, 0, 1, 1, 2, 3])
+        self.assertEquals(bin_sums(edges, time).tolist(), [1, 2, 1])
+        self.assertEquals(bin_sums(edges, time, vals, first=1).tolist(), [0.0, 7.0, 5.0])
+
+#-----------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    unittest.main()